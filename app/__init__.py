@@ -1,6 +1,7 @@
 # config.py
 import json
 import os
+from functools import cached_property
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
@@ -27,19 +28,47 @@ class Config:
         self.config_path = config_path
         self.stock_symbols_path = stock_symbols_path
         self.PERIOD: int = config_data["period"]
+        # History the technical indicators run over, their state is kept per symbol
+        self.INDICATOR_PERIOD: str = config_data.get("indicator_period", "1y")
         self.NUM_NEWS: int = config_data["num_news"]
         self.FROM_EMAIL: str = config_data["from_email"]
         self.TO_EMAILS: List[str] = config_data["to_emails"]
         self.SMTP_SERVER: str = config_data["smtp_server"]
+        self.SMTP_PORT: int = config_data.get("smtp_port", 465)
+        self.SMTP_SSL: bool = config_data.get("smtp_ssl", True)
+        # Greeting line each email starts with, per recipient, e.g. "Hi {name},", see `greeting_personalizer`
+        self.EMAIL_GREETING: Optional[str] = config_data.get("email_greeting")
         self.LLM_MODEL: str = config_data["llm_model"]
-        
-        # Load stock symbols
-        self.STOCK_SYMBOLS: Optional[List[str]] = self._load_stock_symbols()
+        # Analysis scripts generated per LLM call and run side by side, the first valid one is kept
+        self.ANALYSIS_CANDIDATES: int = config_data.get("analysis_candidates", 1)
+        # LLM nodes whose responses are cached, and the cache limits, see `app/tools/core/llm_cache.py`. The
+        # `agent` node of `full_auto_agent` also writes the email, it is cached only when added here
+        self.LLM_CACHE_NODES: List[str] = config_data.get(
+            "llm_cache_nodes",
+            ["get_stock_symbol_node", "get_stock_data_node", "generate_sentiment_node", "analyze_symbol_node"],
+        )
+        self.LLM_CACHE_TTL_HOURS: float = config_data.get("llm_cache_ttl_hours", 24)
+        self.LLM_CACHE_MAX_MB: float = config_data.get("llm_cache_max_mb", 64)
+        # Run artifacts not written for this long are deleted after each run, see `ArtifactStore.prune`
+        self.ARTIFACT_MAX_AGE_DAYS: float = config_data.get("artifact_max_age_days", 7)
+        # `yfinance`, `replay:<dir>` or `record:<dir>`, overridden by the MARKET_DATA_PROVIDER env var
+        self.MARKET_DATA_PROVIDER: str = config_data.get("market_data_provider", "yfinance")
+        # Symbol universe the movers are picked from: nasdaq100, sp500 or a name from `universes`
+        self.UNIVERSE: str = config_data.get("universe", "nasdaq100")
+        self.UNIVERSE_TTL_HOURS: float = config_data.get("universe_ttl_hours", 24)
+        self.UNIVERSES: Dict[str, List[str]] = config_data.get("universes", {})
+        # Screen the agent picks its stock by, and named composites of screens, see `app/tools/core/screener.py`
+        self.SCREEN: str = config_data.get("screen", "gainers")
+        self.SCREENS: Dict[str, Dict[str, float]] = config_data.get("screens", {})
+        # Jobs of `main.py serve`, see `app/scheduler.py`
+        self.SCHEDULES: List[Dict[str, Any]] = config_data.get("schedules", [])
 
-        self.DATA_DIR: str = None
+        # Created by the stores that write into it, not at import
+        self.DATA_DIR: str = (Path(__file__).parent.parent / "data").as_posix()
 
-    def _load_stock_symbols(self) -> Optional[List[str]]:
-        """Load stock symbols from JSON file if it exists."""        
+    @cached_property
+    def STOCK_SYMBOLS(self) -> Optional[List[str]]:
+        """Load stock symbols from JSON file if it exists, on first use."""
         if os.path.exists(self.stock_symbols_path) and os.path.isfile(self.stock_symbols_path):
             with open(self.stock_symbols_path, "r") as f:
                 return json.load(f)
@@ -49,20 +78,30 @@ class Config:
         """Convert configuration to dictionary."""
         return {
             "period": self.PERIOD,
+            "indicator_period": self.INDICATOR_PERIOD,
             "num_news": self.NUM_NEWS,
             "from_email": self.FROM_EMAIL,
             "to_emails": self.TO_EMAILS,
             "smtp_server": self.SMTP_SERVER,
+            "smtp_port": self.SMTP_PORT,
+            "smtp_ssl": self.SMTP_SSL,
+            "email_greeting": self.EMAIL_GREETING,
             "llm_model": self.LLM_MODEL,
+            "analysis_candidates": self.ANALYSIS_CANDIDATES,
+            "llm_cache_nodes": self.LLM_CACHE_NODES,
+            "llm_cache_ttl_hours": self.LLM_CACHE_TTL_HOURS,
+            "llm_cache_max_mb": self.LLM_CACHE_MAX_MB,
+            "artifact_max_age_days": self.ARTIFACT_MAX_AGE_DAYS,
+            "market_data_provider": self.MARKET_DATA_PROVIDER,
+            "universe": self.UNIVERSE,
+            "universe_ttl_hours": self.UNIVERSE_TTL_HOURS,
+            "universes": self.UNIVERSES,
+            "screen": self.SCREEN,
+            "screens": self.SCREENS,
+            "schedules": self.SCHEDULES,
             "stock_symbols": self.STOCK_SYMBOLS,
             "data_dir": self.DATA_DIR
         }
 
 # Create a default instance for import
-config = Config()
-
-# Create `data` folder
-_data_path = Path(__file__).parent.parent / "data"
-_data_path.mkdir(parents=True, exist_ok=True)
-
-config.DATA_DIR = _data_path.as_posix()
\ No newline at end of file
+config = Config()
\ No newline at end of file
@@ -0,0 +1,120 @@
+"""
+Per-node context windows for the LLM nodes.
+
+Without a policy a node sends the whole transcript, every earlier tool call and tool output
+included, so prompts grow with each step. A `ContextPolicy` declares what a node still needs from
+the transcript; everything the node reads from state fields (symbol, data path, analysis,
+sentiment) is already in its system prompt.
+
+  - the user's messages are always kept
+  - tool turns (an AI tool-call message with all of its tool results) are kept only for the tools
+    the node declares, and always as a whole, so the provider never sees a tool result without its
+    call or a call without its results
+  - long tool outputs are cut to `max_tool_chars`
+  - with `max_tokens`, the oldest kept tool turns are dropped until the prompt fits
+
+Token counts before and after are recorded on the active `RunTracer` as `context` events.
+"""
+
+from typing import List, NamedTuple, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage, convert_to_messages
+from langchain_core.messages.utils import count_tokens_approximately
+
+from app.tools.core.spans import active_tracer
+
+
+class ContextPolicy(NamedTuple):
+    """What an LLM node sees of the transcript."""
+
+    tools: Tuple[str, ...] = ()  # tool turns kept, by tool name
+    max_tool_chars: Optional[int] = 4000  # tool outputs longer than this are cut
+    max_tokens: Optional[int] = None  # prompt budget, None for no limit
+
+
+def count_tokens(messages: list) -> int:
+    """Approximate token count of a prompt (about 4 characters per token, plus per-message overhead)."""
+    return count_tokens_approximately(convert_to_messages(messages))
+
+
+def _turns(messages: List[BaseMessage]) -> List[List[BaseMessage]]:
+    """Group the transcript into turns: a tool-call message with its results, or a single message."""
+    turns, open_calls = [], {}
+    for message in messages:
+        if isinstance(message, ToolMessage):
+            # A result whose call is not in the transcript cannot be sent, drop it.
+            if message.tool_call_id in open_calls:
+                open_calls[message.tool_call_id].append(message)
+            continue
+        turn = [message]
+        turns.append(turn)
+        if isinstance(message, AIMessage):
+            for tool_call in message.tool_calls:
+                open_calls[tool_call["id"]] = turn
+    return turns
+
+
+def _is_tool_turn(turn: List[BaseMessage]) -> bool:
+    return isinstance(turn[0], AIMessage) and bool(turn[0].tool_calls)
+
+
+def _compact(message: BaseMessage, max_chars: Optional[int]) -> BaseMessage:
+    if not isinstance(message, ToolMessage) or max_chars is None:
+        return message
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    if len(content) <= max_chars:
+        return message
+    return message.model_copy(
+        update={"content": content[:max_chars] + f"\n... [{len(content) - max_chars} characters cut]"}
+    )
+
+
+def select_messages(policy: ContextPolicy, system_message: dict, messages: List[BaseMessage]) -> list:
+    """
+    Apply a policy to a transcript.
+
+    Args:
+        policy (ContextPolicy): The node's policy.
+        system_message (dict): The node's system message, always sent first.
+        messages (List[BaseMessage]): The transcript from state.
+
+    Returns:
+        list: The prompt, `[system_message] + kept messages`.
+    """
+    kept = []
+    for turn in _turns(messages):
+        if _is_tool_turn(turn):
+            if not any(tool_call["name"] in policy.tools for tool_call in turn[0].tool_calls):
+                continue
+            turn = [_compact(message, policy.max_tool_chars) for message in turn]
+        elif isinstance(turn[0], AIMessage):
+            # Plain replies of earlier nodes; what later nodes need from them is in state.
+            continue
+        kept.append(turn)
+
+    if policy.max_tokens is not None:
+        budget = policy.max_tokens - count_tokens([system_message])
+        while sum(count_tokens(turn) for turn in kept) > budget:
+            oldest = next((i for i, turn in enumerate(kept[:-1]) if _is_tool_turn(turn)), None)
+            if oldest is None:
+                break
+            del kept[oldest]
+
+    return [system_message] + [message for turn in kept for message in turn]
+
+
+def apply_context_policy(node: str, policy: ContextPolicy, system_message: dict, messages: List[BaseMessage]) -> list:
+    """`select_messages`, recording the prompt size before and after on the active tracer."""
+    selected = select_messages(policy, system_message, messages)
+
+    tracer = active_tracer.get()
+    if tracer is not None:
+        tracer.record(
+            "context",
+            node=node,
+            tokens_before=count_tokens([system_message] + list(messages)),
+            tokens_after=count_tokens(selected),
+            messages_before=len(messages) + 1,
+            messages_after=len(selected),
+        )
+    return selected
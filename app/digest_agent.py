@@ -0,0 +1,211 @@
+# === Imports ===
+import asyncio
+import json
+import operator
+import uuid
+from typing import Optional, TypedDict, Annotated
+
+import pandas as pd
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+
+from langgraph.graph import StateGraph, START, END
+from langgraph.graph.message import add_messages
+from langgraph.prebuilt import ToolNode
+from langgraph.types import Send
+
+# === App Imports ===
+from . import graph_agent
+from .tools.graph_agent_tools import (
+    ConfigSchema,
+    execute_python_code_tool,
+    execute_python_code_candidates_tool,
+    send_email_tool,
+)
+from .tools.core.analysis import generate_analysis_batch, generate_analysis_fallback, validate_analysis
+from .tools.core.artifacts import artifact_store
+from .tools.core.code_cache import code_cache, make_key as make_code_cache_key
+from .tools.core.code_execution import run_python_candidates, run_python_code
+from .tools.core.indicators import get_indicators
+from .tools.core.news import news_service
+from .tools.core.stock_data import get_stock_data, get_stock_news, get_top_nasdaq_movers
+
+
+# === Define Graph State ===
+class DigestState(TypedDict):
+    messages: Annotated[list, add_messages]
+    movers: list[dict]
+    # Fallback analysis of every mover, computed at once from one panel by `select_movers_node`
+    fallbacks: dict[str, dict]
+    # One report per symbol, appended by the concurrent `analyze_symbol_node` runs. The analysis is
+    # referenced by `analysis_ref` and only resolved when the digest is written.
+    reports: Annotated[list[dict], operator.add]
+
+
+class SymbolState(TypedDict):
+    mover: dict
+    fallback: dict
+
+
+# === Graph Nodes ===
+# An email that cannot be queued fails the run, so it can be resumed
+send_email_tool_node = ToolNode([send_email_tool], name="send_email_tool_node", handle_tool_errors=False)
+
+
+def select_movers_node(state: DigestState, config: RunnableConfig):
+    """Pick the top movers, load and analyze their bars as one panel and fetch their news concurrently."""
+    tool_call = {
+        "name": "get_top_nasdaq_movers",
+        "args": {
+            "top_n": config["configurable"].get("top_n", 5),
+            "direction": config["configurable"].get("direction", "gainers"),
+            "universe": config["configurable"].get("universe"),
+            "screen": config["configurable"].get("screen"),
+        },
+        "id": str(uuid.uuid4()),
+        "type": "tool_call",
+    }
+
+    tool_call_message = AIMessage(content="", tool_calls=[tool_call])
+    movers = get_top_nasdaq_movers(**tool_call["args"])
+    tool_message = ToolMessage(json.dumps(movers), tool_call_id=tool_call["id"], name=tool_call["name"])
+
+    symbols = [mover["symbol"] for mover in movers]
+    fallbacks = generate_analysis_batch(symbols, config["configurable"]["period"])
+    news_service.get_many(symbols, config["configurable"]["num_news"])
+
+    return {"messages": [tool_call_message, tool_message], "movers": movers, "fallbacks": fallbacks}
+
+
+def fan_out_movers(state: DigestState):
+    return [
+        Send("analyze_symbol_node", {"mover": mover, "fallback": state["fallbacks"].get(mover["symbol"])})
+        for mover in state["movers"]
+    ]
+
+
+async def _analyze(symbol: str, data: pd.DataFrame, config: RunnableConfig) -> Optional[str]:
+    """Analysis of the generated code, None when it fails."""
+    period = config["configurable"]["period"]
+    code_cache_key = make_code_cache_key(graph_agent.GENERATE_CODE_PROMPT, period)
+
+    code = code_cache.get(code_cache_key, symbol)
+    codes = [code] if code else []
+    if not codes:
+        candidates = config["configurable"].get("candidates", 1)
+        prompt = graph_agent.GENERATE_CODE_PROMPT.format(stock_symbol=symbol, period=period)
+        tool = execute_python_code_tool
+        if candidates > 1:
+            prompt += graph_agent.CANDIDATES_PROMPT.format(candidates=candidates)
+            tool = execute_python_code_candidates_tool
+        llm_with_tools = graph_agent.get_llm().bind_tools([tool], tool_choice="any")
+        response = await llm_with_tools.ainvoke([{"role": "system", "content": prompt}])
+        args = response.tool_calls[0]["args"] if response.tool_calls else {}
+        codes = args.get("codes") or [args.get("code", "")]
+        for code in codes:
+            code_cache.track(code, code_cache_key, symbol)
+
+    # The frame is mapped into the sandbox as `df`, the analysis comes back validated
+    if len(codes) > 1:
+        result = await asyncio.to_thread(run_python_candidates, codes, data, validate_analysis)
+    else:
+        result = await asyncio.to_thread(run_python_code, codes[0], data, validate_analysis)
+    if result["status"] == "success":
+        return json.dumps(result["result"])
+    return None
+
+
+async def _sentiment(symbol: str, config: RunnableConfig) -> str:
+    news = await asyncio.to_thread(get_stock_news, symbol, config["configurable"]["num_news"])
+
+    system_message = {
+        "role": "system",
+        "content": f"Generate a short sentiment for the stock {symbol} from its recent news headlines.",
+    }
+    # The code generation of the same node is not cached, only this call is under "analyze_symbol_node"
+    llm = graph_agent.get_llm("analyze_symbol_node")
+    response = await llm.ainvoke([system_message, HumanMessage(json.dumps(news))])
+    return response.content
+
+
+async def analyze_symbol_node(state: SymbolState, config: RunnableConfig):
+    """Data, analysis and sentiment of one mover; analysis and sentiment run concurrently."""
+    mover = state["mover"]
+    symbol = mover["symbol"]
+    period = config["configurable"]["period"]
+
+    # Served from the store, `select_movers_node` already downloaded it. The sandbox maps it directly, no CSV is written.
+    data = await asyncio.to_thread(get_stock_data, symbol, period)
+
+    analysis, sentiment, indicators = await asyncio.gather(
+        _analyze(symbol, data, config),
+        _sentiment(symbol, config),
+        asyncio.to_thread(get_indicators, symbol),
+    )
+    if analysis is None:
+        fallback = state.get("fallback")
+        if fallback:
+            analysis = json.dumps(dict(fallback, indicators=indicators))
+        else:
+            analysis = await asyncio.to_thread(generate_analysis_fallback, symbol, period)
+    analysis_ref = artifact_store.put(analysis, "analysis", symbol)
+
+    return {"reports": [dict(mover, analysis_ref=analysis_ref, sentiment=sentiment, indicators=indicators)]}
+
+
+def _resolve_report(report: dict) -> dict:
+    resolved = {key: value for key, value in report.items() if key != "analysis_ref"}
+    resolved["analysis"] = artifact_store.get(report["analysis_ref"])
+    return resolved
+
+
+async def generate_digest_node(state: DigestState):
+    generate_digest_system_prompt = """Generate one digest email for today's top NASDAQ movers:
+    - Reports, one per stock, with its daily move, analysis, technical indicators and news sentiment: {reports}
+    - One section per stock, include all the analysis data, including the close prices, etc.
+    - Start with a short overview of the movers
+    - Use bulletin in body
+    - Make the email subject and body to be user friendly
+    - Send the digest via email
+    """.format(
+        reports=json.dumps([_resolve_report(report) for report in state["reports"]])
+    )
+
+    system_message = {
+        "role": "system",
+        "content": generate_digest_system_prompt,
+    }
+
+    llm_with_tools = graph_agent.get_llm("generate_digest_node").bind_tools([send_email_tool], tool_choice="any")
+    response = await llm_with_tools.ainvoke([system_message])
+
+    return {"messages": [response]}
+
+
+def build_graph(checkpointer=None):
+    """Build the top-N digest graph (async, run it with `ainvoke`/`astream`).
+
+    The movers are analyzed by concurrent `analyze_symbol_node` runs (map), whose reports are
+    merged into one digest email (reduce). Bound the fan-out with `max_concurrency` in the run config.
+
+    Args:
+        checkpointer (BaseCheckpointSaver, optional): Async checkpoint saver, to resume failed runs. Defaults to None.
+    """
+    # === Build the graph ===
+    graph = StateGraph(DigestState, config_schema=ConfigSchema)
+
+    # Add node
+    graph.add_node("select_movers_node", select_movers_node)
+    graph.add_node("analyze_symbol_node", analyze_symbol_node)
+    graph.add_node("generate_digest_node", generate_digest_node)
+    graph.add_node("send_email_tool_node", send_email_tool_node)
+
+    # Add edges to connect nodes
+    graph.add_edge(START, "select_movers_node")
+    graph.add_conditional_edges("select_movers_node", fan_out_movers, ["analyze_symbol_node"])
+    graph.add_edge("analyze_symbol_node", "generate_digest_node")
+    graph.add_edge("generate_digest_node", "send_email_tool_node")
+    graph.add_edge("send_email_tool_node", END)
+
+    # Compile the graph and run
+    return graph.compile(checkpointer=checkpointer)
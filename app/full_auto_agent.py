@@ -1,17 +1,28 @@
-from langchain.chat_models import init_chat_model
+import sys
+
 from langgraph.prebuilt import create_react_agent, ToolNode
 
-from app.tools.core.analysis import *
-from app.tools.core.stock_data import *
-from app.tools.core.code_execution import *
-from app.tools.core.email import *
+from app.tools.core.analysis import generate_analysis_fallback
+from app.tools.core.stock_data import get_stock_news, get_top_nasdaq_gainer
+from app.tools.core.code_execution import execute_python_code
+from app.tools.core.email import send_email_by_smtp
+from app.tools.core.llm_cache import with_llm_cache
 
 from app import config
 
-model = init_chat_model(
-    config.LLM_MODEL,
-    temperature=0
-)
+
+def __getattr__(name: str):
+    # `model` is created on first use, not at import: building the client loads the provider SDK.
+    if name == "model":
+        from langchain.chat_models import init_chat_model
+
+        globals()["model"] = init_chat_model(
+            config.LLM_MODEL,
+            temperature=0
+        )
+        return globals()["model"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 tool_node = ToolNode([get_top_nasdaq_gainer, get_stock_news, execute_python_code, generate_analysis_fallback, send_email_by_smtp])
 
@@ -44,16 +55,21 @@ You are an autonomous stock analyst. Use the tools provided to:
     - sender email: {from_email}
     - recipient email address: {to_emails}
     - SMTP server: {smtp_server}
+    - SMTP port: {smtp_port}
+    - use SSL: {smtp_ssl}
 Do it step by step.
 
 Be robust. Do not ask the user. Complete this task end-to-end autonomously.
-""".format(period=config.PERIOD, n_news=config.NUM_NEWS, from_email=config.FROM_EMAIL, to_emails=config.TO_EMAILS, smtp_server=config.SMTP_SERVER)
+""".format(period=config.PERIOD, n_news=config.NUM_NEWS, from_email=config.FROM_EMAIL, to_emails=config.TO_EMAILS, smtp_server=config.SMTP_SERVER, smtp_port=config.SMTP_PORT, smtp_ssl=config.SMTP_SSL)
 
-def build_graph():
+def build_graph(checkpointer=None):
     graph = create_react_agent(
-        model=model,
+        # The ReAct loop runs in the "agent" node. It also writes the email, so it is not cached unless "agent"
+        # is added to `llm_cache_nodes`
+        model=with_llm_cache(sys.modules[__name__].model, "agent"),
         tools=tool_node,
         prompt=system_prompt,
+        checkpointer=checkpointer,
     )
 
     return graph
@@ -1,23 +1,18 @@
 # === Imports ===
-from typing import TypedDict, Annotated, Literal
-from pathlib import Path
+from typing import Literal, Optional
+import asyncio
+import json
+import sys
 import uuid
-import os
-import pandas as pd
 from tenacity import retry, stop_after_attempt, wait_fixed
 
-from langchain_core.runnables import RunnableLambda
-from langchain_core.messages import AIMessage, ToolMessage
-from langchain_core.tools import InjectedToolCallId, tool
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
 
-from langgraph.graph import StateGraph, MessagesState, START, END
-from langgraph.graph.message import add_messages
+from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode
-from langgraph.types import Command
 from langchain_core.runnables import RunnableConfig
 
-from langchain.chat_models import init_chat_model
-
 # === App Imports ===
 from . import config
 from .tools.graph_agent_tools import (
@@ -25,26 +20,86 @@ from .tools.graph_agent_tools import (
     ConfigSchema,
     get_top_nasdaq_gainer_tool,
     get_and_save_stock_data_tool,
+    get_stock_news_tool,
     execute_python_code_tool,
+    execute_python_code_candidates_tool,
     send_email_tool,
+    memo_key,
 )
-from .tools.core.stock_data import get_stock_news
+from .context_policy import ContextPolicy, apply_context_policy
+from .tools.core.artifacts import artifact_store
 from .tools.core.analysis import generate_analysis_fallback
+from .tools.core.code_cache import code_cache, make_key as make_code_cache_key
+from .tools.core.indicators import get_indicators
+from .tools.core.llm_cache import with_llm_cache
+from .tools.core.memo import node_memo
 
 # === Initialize LLM ===
-llm = init_chat_model(config.LLM_MODEL)
+def __getattr__(name: str):
+    # `llm` is created on first use, not at import: building the client loads the provider SDK.
+    if name == "llm":
+        from langchain.chat_models import init_chat_model
+
+        globals()["llm"] = init_chat_model(config.LLM_MODEL)
+        return globals()["llm"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_llm(node: Optional[str] = None):
+    """
+    The chat model of the graph nodes, `llm` of this module (replace it to use another one).
+
+    Args:
+        node (str, optional): Node making the call. Nodes listed in `llm_cache_nodes` get the model with the
+            persistent LLM cache. Defaults to None, uncached.
+    """
+    llm = sys.modules[__name__].llm
+    return with_llm_cache(llm, node) if node else llm
 
 
 # === Graph Nodes ===
 get_stock_symbol_tool_node = ToolNode([get_top_nasdaq_gainer_tool], name="get_stock_symbol_tool_node")
 get_stock_data_tool_node = ToolNode([get_and_save_stock_data_tool], name="get_stock_data_tool_node")
-generate_analysis_tool_node = ToolNode([execute_python_code_tool], name="generate_analysis_tool_node")
-get_stock_news_tool_node = ToolNode([get_stock_news], name="get_stock_news_tool_node")
-send_email_tool_node = ToolNode([send_email_tool], name="send_email_tool_node")
+generate_analysis_tool_node = ToolNode(
+    [execute_python_code_tool, execute_python_code_candidates_tool], name="generate_analysis_tool_node"
+)
+get_stock_news_tool_node = ToolNode([get_stock_news_tool], name="get_stock_news_tool_node")
+get_stock_news_parallel_tool_node = ToolNode(
+    [get_stock_news_tool], name="get_stock_news_tool_node", messages_key="sentiment_messages"
+)
+# An email that cannot be queued fails the run instead of ending it with an error message, so it can be resumed.
+send_email_tool_node = ToolNode([send_email_tool], name="send_email_tool_node", handle_tool_errors=False)
 
 
-@retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-def get_stock_symbol_node(state: State):
+# What each LLM node sees of the transcript, the rest of what it needs is in its system prompt.
+# Only the sentiment loop reads earlier tool output: the news it asked for.
+CONTEXT_POLICIES = {
+    "get_stock_symbol_node": ContextPolicy(),
+    "get_stock_data_node": ContextPolicy(),
+    "generate_analysis_node": ContextPolicy(),
+    "generate_sentiment_node": ContextPolicy(tools=("get_stock_news_tool",)),
+    "generate_summary_node": ContextPolicy(),
+}
+
+
+def _context(node: str, system_message: dict, messages: list) -> list:
+    return apply_context_policy(node, CONTEXT_POLICIES[node], system_message, messages)
+
+
+def _tool_call_message(name: str, args: dict) -> AIMessage:
+    """An AI message calling one tool, for steps whose tool call is known without asking the LLM."""
+    tool_call = {
+        "name": name,
+        "args": args,
+        "id": str(uuid.uuid4()),
+        "type": "tool_call",
+    }
+    return AIMessage(content="", tool_calls=[tool_call])
+
+
+# Each LLM node is split into a `_*_request` helper that builds the bound model and prompt, plus a
+# sync node and an async (`a*`) node that only differ in `invoke` vs `ainvoke`.
+def _get_stock_symbol_request(state: State):
     system_prompt = """
     - Get the today top performance stock in Nasdaq
     """
@@ -54,20 +109,32 @@ def get_stock_symbol_node(state: State):
         "content": system_prompt,
     }
 
-    llm_with_tools = llm.bind_tools([get_top_nasdaq_gainer_tool])
-    response = llm_with_tools.invoke([system_message] + state["messages"])
+    llm_with_tools = get_llm("get_stock_symbol_node").bind_tools([get_top_nasdaq_gainer_tool])
+    return llm_with_tools, _context("get_stock_symbol_node", system_message, state["messages"])
+
+
+@retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
+def get_stock_symbol_node(state: State):
+    llm_with_tools, messages = _get_stock_symbol_request(state)
+    response = llm_with_tools.invoke(messages)
 
     return {"messages": [response]}
 
 
 @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-def get_stock_data_node(state: State, config: RunnableConfig):
-    stock_data_saved_path = os.path.join(config["configurable"]["data_dir"], str(uuid.uuid4()))
+async def aget_stock_symbol_node(state: State):
+    llm_with_tools, messages = _get_stock_symbol_request(state)
+    response = await llm_with_tools.ainvoke(messages)
+
+    return {"messages": [response]}
 
+
+def _get_stock_data_request(state: State, config: RunnableConfig):
+    # The tool stores the data as a frame artifact, the analysis code gets it as `df`.
     system_prompt = """
-    - Get the stock {symbol} past {period} days data and save to {saved_path}
+    - Get the stock {symbol} past {period} days data and save it
     """.format(
-        symbol=state["stock_symbol"], period=config["configurable"]["period"], saved_path=stock_data_saved_path
+        symbol=state["stock_symbol"], period=config["configurable"]["period"]
     )
 
     system_message = {
@@ -75,15 +142,39 @@ def get_stock_data_node(state: State, config: RunnableConfig):
         "content": system_prompt,
     }
 
-    llm_with_tools = llm.bind_tools([get_and_save_stock_data_tool])
-    response = llm_with_tools.invoke([system_message] + state["messages"])
+    llm_with_tools = get_llm("get_stock_data_node").bind_tools([get_and_save_stock_data_tool])
+    return llm_with_tools, _context("get_stock_data_node", system_message, state["messages"])
+
+
+@retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
+def get_stock_data_node(state: State, config: RunnableConfig):
+    llm_with_tools, messages = _get_stock_data_request(state, config)
+    response = llm_with_tools.invoke(messages)
 
     return {"messages": [response]}
 
 
-def generate_analysis_node(state: State, config: RunnableConfig):
-    generate_code_system_prompt = """Write Python code to analyze the stock {stock_symbol}:
-    - The last {period} trading days is in {stock_data_saved_path} file, you can use `pandas` to load the csv file, index is `Date`.
+@retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
+async def aget_stock_data_node(state: State, config: RunnableConfig):
+    llm_with_tools, messages = _get_stock_data_request(state, config)
+    response = await llm_with_tools.ainvoke(messages)
+
+    return {"messages": [response]}
+
+
+# Fast path: the symbol and data steps only ever make one fully determined tool call, so
+# `build_graph(fast=True)` synthesizes it instead of asking the LLM for it. The tool nodes run as usual.
+def get_stock_symbol_fast_node(state: State):
+    return {"messages": [_tool_call_message("get_top_nasdaq_gainer_tool", {})]}
+
+
+def get_stock_data_fast_node(state: State, config: RunnableConfig):
+    args = {"symbol": state["stock_symbol"], "period": config["configurable"]["period"]}
+    return {"messages": [_tool_call_message("get_and_save_stock_data_tool", args)]}
+
+
+GENERATE_CODE_PROMPT = """Write Python code to analyze the stock {stock_symbol}:
+    - The last {period} trading days are already loaded in the pandas DataFrame `df`, index is `Date`, columns are Open, High, Low, Close, Volume. Do not read any file.
     - Calculate average daily change
     - Calculate volatility (std deviation of Daily Changes)
     - Determine upward/downward trend
@@ -99,23 +190,96 @@ def generate_analysis_node(state: State, config: RunnableConfig):
         "close_prices": [123, 123, 133, 344, 123],
     }}
     ```
-    - At the code end, print out the analysis using `print()`
+    - At the code end, return the analysis with `set_result(analysis)`
 
     Only return Python code. No explanation.
-        """.format(
+        """
+
+# Appended to GENERATE_CODE_PROMPT when `candidates` > 1, the cache key stays that of the base prompt
+CANDIDATES_PROMPT = """
+    Write {candidates} different, independent versions of this code, each complete on its own, and pass them all
+    in a single `execute_python_code_candidates_tool` call. They run side by side, the first valid analysis is kept.
+        """
+
+
+def _cached_analysis_update(state: State, config: RunnableConfig):
+    """Replay a script that already worked for this prompt and period, with the symbol swapped."""
+    code_cache_key = make_code_cache_key(GENERATE_CODE_PROMPT, config["configurable"]["period"])
+    cached_code = code_cache.get(code_cache_key, state["stock_symbol"])
+    if not cached_code:
+        return None
+
+    return {"messages": [_tool_call_message("execute_python_code_tool", {"code": cached_code})]}
+
+
+def _memoized_analysis_update(state: State, config: RunnableConfig):
+    """Reuse the analysis of the same symbol, trading day and period from an earlier run."""
+    key = memo_key(state, config)
+    memoized = node_memo.get("generate_analysis_node", *key) if key else None
+    if not memoized:
+        return None
+
+    analysis_ref = memoized["stock_analysis_ref"]
+    return {
+        "messages": [AIMessage(f"Reused today's analysis: {analysis_ref['id']}")],
+        "stock_analysis_ref": analysis_ref,
+        "tool_status": True,
+    }
+
+
+def _generate_analysis_request(state: State, config: RunnableConfig):
+    generate_code_system_prompt = GENERATE_CODE_PROMPT.format(
         stock_symbol=state["stock_symbol"],
         period=config["configurable"]["period"],
-        stock_data_saved_path=state["stock_data_saved_path"],
     )
 
+    # k scripts from one call, raced in the sandbox pool
+    candidates = config["configurable"].get("candidates", 1)
+    tools = [execute_python_code_tool]
+    if candidates > 1:
+        generate_code_system_prompt += CANDIDATES_PROMPT.format(candidates=candidates)
+        tools = [execute_python_code_candidates_tool]
+
     # print(generate_code_system_prompt)
     system_message = {
         "role": "system",
         "content": generate_code_system_prompt,
     }
 
-    llm_with_tools = llm.bind_tools([execute_python_code_tool], parallel_tool_calls=False, tool_choice="any")
-    response = llm_with_tools.invoke([system_message] + state["messages"])
+    llm_with_tools = get_llm("generate_analysis_node").bind_tools(tools, parallel_tool_calls=False, tool_choice="any")
+    return llm_with_tools, _context("generate_analysis_node", system_message, state["messages"])
+
+
+def _track_generated_code(response: AIMessage, state: State, config: RunnableConfig):
+    code_cache_key = make_code_cache_key(GENERATE_CODE_PROMPT, config["configurable"]["period"])
+    for tool_call in response.tool_calls:
+        for code in tool_call["args"].get("codes") or [tool_call["args"].get("code", "")]:
+            code_cache.track(code, code_cache_key, state["stock_symbol"])
+
+
+def generate_analysis_node(state: State, config: RunnableConfig):
+    cached_update = _memoized_analysis_update(state, config) or _cached_analysis_update(state, config)
+    if cached_update:
+        return cached_update
+
+    llm_with_tools, messages = _generate_analysis_request(state, config)
+    response = llm_with_tools.invoke(messages)
+    _track_generated_code(response, state, config)
+
+    return {"messages": [response]}
+
+
+async def agenerate_analysis_node(state: State, config: RunnableConfig):
+    # The memo shares its SQLite file with the async checkpointer, whose commits need this event loop: never block it.
+    cached_update = await asyncio.to_thread(_memoized_analysis_update, state, config) or _cached_analysis_update(
+        state, config
+    )
+    if cached_update:
+        return cached_update
+
+    llm_with_tools, messages = _generate_analysis_request(state, config)
+    response = await llm_with_tools.ainvoke(messages)
+    _track_generated_code(response, state, config)
 
     return {"messages": [response]}
 
@@ -133,13 +297,17 @@ def generate_analysis_fallback_node(state: State, config: RunnableConfig):
 
     tool_call_message = AIMessage(content="", tool_calls=[tool_call])
     tool_message = tool(generate_analysis_fallback).invoke(tool_call)
-    response = AIMessage(f"fallback to generate analysis: {tool_message.content}")
+    analysis_ref = artifact_store.put(tool_message.content, "analysis", state["stock_symbol"])
+    response = AIMessage(f"fallback to generate analysis: {analysis_ref['id']}")
+    key = memo_key(state, config)
+    if key:
+        node_memo.put("generate_analysis_node", *key, {"stock_analysis_ref": analysis_ref})
 
     # result = generate_analysis_fallback(state["stock_symbol"], state["period"])
-    return {"messages": [tool_call_message, tool_message, response], "stock_analysis": tool_message.content}
+    return {"messages": [tool_call_message, tool_message, response], "stock_analysis_ref": analysis_ref}
 
 
-def generate_sentiment_node(state: State, config: RunnableConfig):
+def _generate_sentiment_request(state: State, config: RunnableConfig, messages_key: str = "messages"):
     generate_sentiment_system_prompt = """Generate a sentiment the stock {symbol}:
     - Get the stock recent {num_news} news headlines
     """.format(
@@ -152,21 +320,60 @@ def generate_sentiment_node(state: State, config: RunnableConfig):
         "content": generate_sentiment_system_prompt,
     }
 
-    llm_with_tools = llm.bind_tools([get_stock_news])
-    response = llm_with_tools.invoke([system_message] + state["messages"])
+    llm_with_tools = get_llm("generate_sentiment_node").bind_tools([get_stock_news_tool])
+    return llm_with_tools, _context("generate_sentiment_node", system_message, state.get(messages_key, []))
+
+
+def _memoized_sentiment(state: State, config: RunnableConfig):
+    key = memo_key(state, config)
+    memoized = node_memo.get("generate_sentiment_node", *key) if key else None
+    return memoized["stock_sentiment"] if memoized else None
+
+
+def _memoize_sentiment(response: AIMessage, state: State, config: RunnableConfig):
+    key = memo_key(state, config)
+    # Only the final answer, not the request for news
+    if key and not response.tool_calls:
+        node_memo.put("generate_sentiment_node", *key, {"stock_sentiment": response.content})
+
+
+def generate_sentiment_node(state: State, config: RunnableConfig):
+    sentiment = _memoized_sentiment(state, config)
+    if sentiment is not None:
+        return {"messages": [AIMessage(sentiment)], "stock_sentiment": sentiment}
+
+    llm_with_tools, messages = _generate_sentiment_request(state, config)
+    response = llm_with_tools.invoke(messages)
+    _memoize_sentiment(response, state, config)
 
     return {"messages": [response], "stock_sentiment": response.content}
 
 
-def generate_summary_node(state: State):
+async def agenerate_sentiment_node(state: State, config: RunnableConfig):
+    sentiment = await asyncio.to_thread(_memoized_sentiment, state, config)
+    if sentiment is not None:
+        return {"sentiment_messages": [AIMessage(sentiment)], "stock_sentiment": sentiment}
+
+    # Runs next to the analysis branch, so it keeps its own transcript in `sentiment_messages`.
+    llm_with_tools, messages = _generate_sentiment_request(state, config, messages_key="sentiment_messages")
+    response = await llm_with_tools.ainvoke(messages)
+    await asyncio.to_thread(_memoize_sentiment, response, state, config)
+
+    return {"sentiment_messages": [response], "stock_sentiment": response.content}
+
+
+def _generate_summary_request(state: State, indicators: dict):
     generate_summary_system_prompt = """Generate a summary for the stock based on analysis and sentiment:
     - Include all the analysis data from: {analysis}, including the close prices, etc.
+    - Add the technical indicators (RSI, MACD, Bollinger bands, ATR, drawdowns) with a short reading: {indicators}
     - Give a sentiment: {sentiment}
     - Use bulletin in body
     - Make the email subject and body to be user friendly
     - Send the summary via email
     """.format(
-        analysis=state["stock_analysis"], sentiment=state["stock_sentiment"]
+        analysis=artifact_store.get(state["stock_analysis_ref"]),
+        indicators=json.dumps(indicators),
+        sentiment=state["stock_sentiment"],
     )
 
     system_message = {
@@ -174,12 +381,30 @@ def generate_summary_node(state: State):
         "content": generate_summary_system_prompt,
     }
 
-    llm_with_tools = llm.bind_tools([send_email_tool], tool_choice="any")
-    response = llm_with_tools.invoke([system_message] + state["messages"])
+    llm_with_tools = get_llm("generate_summary_node").bind_tools([send_email_tool], tool_choice="any")
+    return llm_with_tools, _context("generate_summary_node", system_message, state["messages"])
+
+
+def generate_summary_node(state: State):
+    llm_with_tools, messages = _generate_summary_request(state, get_indicators(state["stock_symbol"]))
+    response = llm_with_tools.invoke(messages)
 
     return {"messages": [response]}
 
 
+async def agenerate_summary_node(state: State):
+    indicators = await asyncio.to_thread(get_indicators, state["stock_symbol"])
+    llm_with_tools, messages = _generate_summary_request(state, indicators)
+    response = await llm_with_tools.ainvoke(messages)
+
+    return {"messages": [response]}
+
+
+def branch_done_node(state: State):
+    """No-op marker closing a parallel branch, the summary waits for both markers."""
+    return {}
+
+
 # Conditional edge function to route to the tool node or end based upon whether the LLM made a tool call
 def should_continue(state: State) -> Literal["ACTION", "NEXT"]:
     """Decide if we should continue the loop or stop based upon whether the LLM made a tool call"""
@@ -192,6 +417,14 @@ def should_continue(state: State) -> Literal["ACTION", "NEXT"]:
         return "NEXT"
 
 
+def should_continue_sentiment(state: State) -> Literal["ACTION", "NEXT"]:
+    """Same as `should_continue`, for the sentiment branch transcript of the parallel graph"""
+    if state["sentiment_messages"][-1].tool_calls:
+        return "ACTION"
+    else:
+        return "NEXT"
+
+
 def route_after_tool(state: State) -> Literal["NEXT", "FALLBACK"]:
     if state["tool_status"]:
         return "NEXT"
@@ -199,14 +432,28 @@ def route_after_tool(state: State) -> Literal["NEXT", "FALLBACK"]:
         return "FALLBACK"
 
 
-def build_graph():
+def build_graph(parallel: bool = False, fast: bool = False, checkpointer=None):
+    """Build the controlled agent graph.
+
+    Args:
+        parallel (bool, optional): Build the async graph, in which the analysis and the sentiment
+            branches run concurrently and join before `generate_summary_node`. It must be run with
+            `ainvoke`/`astream`. Defaults to False.
+        fast (bool, optional): Call the symbol and data tools directly instead of through the LLM,
+            which is then only used for the analysis code, the sentiment and the summary. Defaults to False.
+        checkpointer (BaseCheckpointSaver, optional): Save a checkpoint after every step, so a failed
+            run can be resumed by its `thread_id`. The parallel graph needs an async saver. Defaults to None.
+    """
+    if parallel:
+        return _build_parallel_graph(fast, checkpointer)
+
     # === Build the graph ===
     graph = StateGraph(State, config_schema=ConfigSchema)
 
     # Add node
-    graph.add_node("get_stock_symbol_node", get_stock_symbol_node)
+    graph.add_node("get_stock_symbol_node", get_stock_symbol_fast_node if fast else get_stock_symbol_node)
     graph.add_node("get_stock_symbol_tool_node", get_stock_symbol_tool_node)
-    graph.add_node("get_stock_data_node", get_stock_data_node)
+    graph.add_node("get_stock_data_node", get_stock_data_fast_node if fast else get_stock_data_node)
     graph.add_node("get_stock_data_tool_node", get_stock_data_tool_node)
     graph.add_node("generate_analysis_node", generate_analysis_node)
     graph.add_node("generate_analysis_tool_node", generate_analysis_tool_node)
@@ -223,7 +470,15 @@ def build_graph():
     graph.add_edge("get_stock_data_node", "get_stock_data_tool_node")
     graph.add_edge("get_stock_data_tool_node", "generate_analysis_node")
 
-    graph.add_edge("generate_analysis_node", "generate_analysis_tool_node")
+    # The analysis of an earlier run today is reused without a tool call
+    graph.add_conditional_edges(
+        "generate_analysis_node",
+        should_continue,
+        {
+            "ACTION": "generate_analysis_tool_node",
+            "NEXT": "generate_sentiment_node",
+        },
+    )
     graph.add_conditional_edges(
         "generate_analysis_tool_node",
         route_after_tool,
@@ -247,7 +502,73 @@ def build_graph():
     graph.add_edge("send_email_tool_node", END)
 
     # Compile the graph and run
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
+
+
+def _build_parallel_graph(fast: bool = False, checkpointer=None):
+    # === Build the graph ===
+    graph = StateGraph(State, config_schema=ConfigSchema)
+
+    # Add node
+    graph.add_node("get_stock_symbol_node", get_stock_symbol_fast_node if fast else aget_stock_symbol_node)
+    graph.add_node("get_stock_symbol_tool_node", get_stock_symbol_tool_node)
+    graph.add_node("get_stock_data_node", get_stock_data_fast_node if fast else aget_stock_data_node)
+    graph.add_node("get_stock_data_tool_node", get_stock_data_tool_node)
+    graph.add_node("generate_analysis_node", agenerate_analysis_node)
+    graph.add_node("generate_analysis_tool_node", generate_analysis_tool_node)
+    graph.add_node("generate_analysis_fallback_node", generate_analysis_fallback_node)
+    graph.add_node("analysis_done_node", branch_done_node)
+    graph.add_node("generate_sentiment_node", agenerate_sentiment_node)
+    graph.add_node("get_stock_news_tool_node", get_stock_news_parallel_tool_node)
+    graph.add_node("sentiment_done_node", branch_done_node)
+    graph.add_node("generate_summary_node", agenerate_summary_node)
+    graph.add_node("send_email_tool_node", send_email_tool_node)
+
+    # Add edges to connect nodes
+    graph.add_edge(START, "get_stock_symbol_node")
+    graph.add_edge("get_stock_symbol_node", "get_stock_symbol_tool_node")
+    graph.add_edge("get_stock_symbol_tool_node", "get_stock_data_node")
+    graph.add_edge("get_stock_data_node", "get_stock_data_tool_node")
+
+    # Fan out: sentiment only needs the symbol, so it does not wait for the analysis
+    graph.add_edge("get_stock_data_tool_node", "generate_analysis_node")
+    graph.add_edge("get_stock_data_tool_node", "generate_sentiment_node")
+
+    graph.add_conditional_edges(
+        "generate_analysis_node",
+        should_continue,
+        {
+            "ACTION": "generate_analysis_tool_node",
+            "NEXT": "analysis_done_node",
+        },
+    )
+    graph.add_conditional_edges(
+        "generate_analysis_tool_node",
+        route_after_tool,
+        {
+            "NEXT": "analysis_done_node",
+            "FALLBACK": "generate_analysis_fallback_node",
+        },
+    )
+    graph.add_edge("generate_analysis_fallback_node", "analysis_done_node")
+
+    graph.add_conditional_edges(
+        "generate_sentiment_node",
+        should_continue_sentiment,
+        {
+            "NEXT": "sentiment_done_node",
+            "ACTION": "get_stock_news_tool_node",
+        },
+    )
+    graph.add_edge("get_stock_news_tool_node", "generate_sentiment_node")
+
+    # Join: the summary runs once both branches are done
+    graph.add_edge(["analysis_done_node", "sentiment_done_node"], "generate_summary_node")
+    graph.add_edge("generate_summary_node", "send_email_tool_node")
+    graph.add_edge("send_email_tool_node", END)
+
+    # Compile the graph and run
+    return graph.compile(checkpointer=checkpointer)
 
 
 if __name__ == "__main__":
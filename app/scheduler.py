@@ -0,0 +1,215 @@
+"""
+Cron-style job scheduling for `main.py serve`.
+
+Jobs come from `schedules` in config.json, e.g. a report 15 minutes after the US market close for
+two watchlists:
+
+    "schedules": [
+        {"name": "close-tech", "cron": "15 16 * * 1-5", "timezone": "America/New_York",
+         "graph": "digest_agent", "universe": "tech", "top_n": 5},
+        {"name": "close-nasdaq", "cron": "15 16 * * 1-5", "graph": "graph_agent_fast"}
+    ]
+
+`cron` has the five standard fields (minute hour day-of-month month day-of-week) with `*`, lists,
+ranges and steps. Day of week is 0-6 from Sunday (7 is also Sunday).
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Set
+from zoneinfo import ZoneInfo
+
+DEFAULT_TIMEZONE = "America/New_York"
+GRAPHS = ("graph_agent", "graph_agent_parallel", "graph_agent_fast", "graph_agent_parallel_fast", "digest_agent", "full_auto_agent")
+
+# (first, last) value of each cron field
+_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def _parse_field(field: str, first: int, last: int) -> Set[int]:
+    values = set()
+    for part in field.split(","):
+        body, _, step = part.partition("/")
+        if body == "*":
+            low, high = first, last
+        elif "-" in body:
+            low, high = (int(value) for value in body.split("-", 1))
+        else:
+            low = high = int(body)
+            if step:
+                high = last
+        if not first <= low <= high <= last:
+            raise ValueError(f"Cron field out of range: {part!r}")
+        values.update(range(low, high + 1, int(step) if step else 1))
+    return values
+
+
+class CronSchedule:
+    """A five-field cron expression evaluated in a timezone."""
+
+    def __init__(self, expression: str, tz: str = DEFAULT_TIMEZONE):
+        """
+        Args:
+            expression (str): e.g. "15 16 * * 1-5" for 16:15 on weekdays.
+            tz (str, optional): IANA timezone the expression is read in. Defaults to "America/New_York".
+
+        Raises:
+            ValueError: If the expression is malformed.
+        """
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields, got {expression!r}")
+        try:
+            minutes, hours, days, months, weekdays = (
+                _parse_field(field, first, last) for field, (first, last) in zip(fields, _FIELDS)
+            )
+        except ValueError as e:
+            raise ValueError(f"Invalid cron expression {expression!r}: {e}") from None
+
+        self.expression = expression
+        self.tz = ZoneInfo(tz)
+        self.minutes, self.hours, self.months = minutes, hours, months
+        self.days = days
+        self.weekdays = {day % 7 for day in weekdays}
+        # Standard cron: when both day fields are restricted, either one matching is enough
+        self._any_day = fields[2] == "*" or fields[4] == "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_match = moment.day in self.days
+        weekday_match = (moment.weekday() + 1) % 7 in self.weekdays
+        return day_match and weekday_match if self._any_day else day_match or weekday_match
+
+    def next_after(self, moment: datetime) -> datetime:
+        """
+        First time strictly after `moment` the schedule fires.
+
+        Args:
+            moment (datetime): A timezone-aware datetime.
+
+        Returns:
+            datetime: The next fire time, in the schedule's timezone.
+        """
+        local = moment.astimezone(self.tz).replace(tzinfo=None, second=0, microsecond=0) + timedelta(minutes=1)
+        # Wall-clock search, skipping whole months/days/hours that cannot match; five years covers any valid expression
+        limit = local + timedelta(days=5 * 366)
+        while local < limit:
+            if local.month not in self.months:
+                local = (local.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(local):
+                local = (local + timedelta(days=1)).replace(hour=0, minute=0)
+            elif local.hour not in self.hours:
+                local = (local + timedelta(hours=1)).replace(minute=0)
+            elif local.minute not in self.minutes:
+                local += timedelta(minutes=1)
+            else:
+                fire = local.replace(tzinfo=self.tz)
+                # A wall-clock time skipped by a DST change fires at the shifted instant, once.
+                if fire.astimezone(timezone.utc) > moment.astimezone(timezone.utc):
+                    return fire
+                local += timedelta(minutes=1)
+        raise ValueError(f"Cron expression {self.expression!r} never fires")
+
+
+def load_jobs(schedules: List[dict]) -> List[dict]:
+    """
+    Validate the `schedules` of config.json.
+
+    Args:
+        schedules (List[dict]): Job specs: `name`, `cron`, optional `timezone`, `graph` (default
+            "graph_agent") and run options `top_n`, `direction`, `universe`.
+
+    Returns:
+        List[dict]: The jobs, each with its parsed `schedule` (CronSchedule).
+
+    Raises:
+        ValueError: On a missing name, a duplicate name, an unknown graph or a bad cron expression.
+    """
+    jobs, names = [], set()
+    for spec in schedules:
+        name = spec.get("name")
+        if not name or name in names:
+            raise ValueError(f"Each schedule needs a unique name: {spec}")
+        names.add(name)
+        graph = spec.get("graph", "graph_agent")
+        if graph not in GRAPHS:
+            raise ValueError(f"Unknown graph {graph!r} in schedule {name!r}, expected one of {GRAPHS}")
+        schedule = CronSchedule(spec["cron"], spec.get("timezone", DEFAULT_TIMEZONE))
+        jobs.append(dict(spec, graph=graph, schedule=schedule))
+    return jobs
+
+
+class Scheduler:
+    """
+    Runs jobs on their cron schedules in a bounded thread pool.
+
+    At most `max_concurrency` jobs run at once, later ones wait for a free slot. A job whose
+    previous run has not finished when it fires again is skipped, so runs of one job never overlap.
+    """
+
+    def __init__(self, jobs: List[dict], run_job: Callable[[dict], None], max_concurrency: int = 2):
+        """
+        Args:
+            jobs (List[dict]): Output of `load_jobs`.
+            run_job (Callable): `run_job(job)` runs one job; exceptions are printed, not raised.
+            max_concurrency (int, optional): Jobs run at once. Defaults to 2.
+        """
+        self.jobs = jobs
+        self.run_job = run_job
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="job")
+        self._running: Set[str] = set()
+        self._lock = threading.Lock()
+        self._next: Dict[str, datetime] = {}
+
+    def next_runs(self, now: Optional[datetime] = None) -> Dict[str, datetime]:
+        """Next fire time per job name."""
+        now = now or datetime.now(timezone.utc)
+        for job in self.jobs:
+            if job["name"] not in self._next:
+                self._next[job["name"]] = job["schedule"].next_after(now)
+        return dict(self._next)
+
+    def fire(self, job: dict) -> Optional[Future]:
+        """Start a run of `job` now, None if its previous run is still going."""
+        with self._lock:
+            if job["name"] in self._running:
+                print(f"Skipped {job['name']}: the previous run is still going")
+                return None
+            self._running.add(job["name"])
+        return self._executor.submit(self._run, job)
+
+    def _run(self, job: dict):
+        try:
+            self.run_job(job)
+        except Exception as e:
+            print(f"Job {job['name']} failed: {e}")
+        finally:
+            with self._lock:
+                self._running.discard(job["name"])
+
+    def tick(self, now: Optional[datetime] = None) -> List[Future]:
+        """Fire the jobs that are due at `now` and schedule their next runs."""
+        now = now or datetime.now(timezone.utc)
+        futures = []
+        for job in self.jobs:
+            due = self.next_runs(now)[job["name"]]
+            if due <= now:
+                # Fire times missed while the machine slept are collapsed into this one run.
+                self._next[job["name"]] = job["schedule"].next_after(now)
+                future = self.fire(job)
+                if future:
+                    futures.append(future)
+        return futures
+
+    def run(self, stop: Optional[threading.Event] = None):
+        """Fire jobs until `stop` is set. Wakes at least every minute, so clock changes are noticed."""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            self.tick()
+            now = datetime.now(timezone.utc)
+            wait = min(((due - now).total_seconds() for due in self.next_runs(now).values()), default=60)
+            stop.wait(min(max(wait, 0.05), 60))
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting runs, by default waiting for the running ones."""
+        self._executor.shutdown(wait=wait)
@@ -1,7 +1,96 @@
 import json
+import re
+from typing import Any, Dict, List, TypedDict
+import numpy as np
+import pandas as pd
 from langchain.chat_models import init_chat_model
 from app import config
-import yfinance as yf
+from app.tools.core.stock_data import get_stock_data
+from app.tools.core.code_cache import code_cache, make_key as make_code_cache_key
+from app.tools.core.indicators import get_indicators
+from app.tools.core.market_store import market_store
+
+STOCK_ANALYSIS_CODE_PROMPT = """Write Python code to analyze stock {symbol}:
+    - The last {period} trading days are already loaded in the pandas DataFrame `df`, index is `Date`, columns are Open, High, Low, Close, Volume. Do not read any file.
+    - Calculate average daily change
+    - Calculate volatility (std deviation of Daily Changes)
+    - Determine upward/downward trend
+    - List close prices in this period 
+    - Put the analysis in json, example like
+    ```
+    analysis = {{
+        "stock": "symbol",
+        "period": "5d",
+        "average_daily_change": 0.2,
+        "volatility": 0.2,
+        "trend": "UP",
+        "close_prices": [123, 123, 133, 344, 123],
+    }}
+    ```
+    - At the code end, return the analysis with `set_result(analysis)`
+
+    Only return Python code. No explanation.
+    """
+
+# A fenced block, as chat models often wrap code in one despite the prompt
+_CODE_FENCE = re.compile(r"```[\w+-]*\n(.*?)```", re.DOTALL)
+
+
+def _strip_code_fences(text: str) -> str:
+    """The code of the first fenced block in `text`, or `text` itself without one."""
+    match = _CODE_FENCE.search(text)
+    return (match.group(1) if match else text).strip()
+
+
+class StockAnalysis(TypedDict):
+    """Result of the generated analysis code, checked by `validate_analysis` before it is used."""
+
+    stock: str
+    period: str
+    average_daily_change: float
+    volatility: float
+    trend: str
+    close_prices: List[float]
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+# Field type -> (description, check)
+_CHECKS = {
+    str: ("a string", lambda value: isinstance(value, str)),
+    float: ("a number", _is_number),
+    List[float]: ("a list of numbers", lambda value: isinstance(value, list) and all(map(_is_number, value))),
+}
+
+
+def validate_analysis(value: Any) -> StockAnalysis:
+    """Check a sandbox result against `StockAnalysis`.
+
+    Args:
+        value (Any): The decoded JSON result.
+
+    Returns:
+        StockAnalysis: `value`, extra keys included.
+
+    Raises:
+        ValueError: Listing every missing or mistyped field.
+    """
+    if not isinstance(value, dict):
+        raise ValueError(f"expected an analysis dict, got {type(value).__name__}")
+
+    problems = []
+    for field, kind in StockAnalysis.__annotations__.items():
+        description, check = _CHECKS[kind]
+        if field not in value:
+            problems.append(f"{field} is missing")
+        elif not check(value[field]):
+            problems.append(f"{field} should be {description}")
+    if problems:
+        raise ValueError(", ".join(problems))
+    return value
+
 
 def generate_stock_analysis_code(stock_symbol: str) -> str:
     """Generates Python code to analyze a stock
@@ -18,33 +107,23 @@ def generate_stock_analysis_code(stock_symbol: str) -> str:
       - Calculate volatility (std deviation of daily changes).
       - Determine upward/downward trend.
       - List close prices in the period.
-      - Output analysis as a JSON dictionary printed at the end.
+      - Read the data from the preloaded DataFrame `df` and return the analysis with `set_result(analysis)`.
     """
-    prompt = """Write Python code to analyze stock {symbol}:
-    - Analyze past {period} days data
-    - Calculate average daily change
-    - Calculate volatility (std deviation of Daily Changes)
-    - Determine upward/downward trend
-    - List close prices in this period 
-    - Put the analysis in json, example like
-    ```
-    analysis = {{
-        "stock": "symbol",
-        "period": "5d",
-        "average_daily_change": 0.2,
-        "volatility": 0.2,
-        "trend": "UP",
-        "close_prices": [123, 123, 133, 344, 123],
-    }}
-    ```
-    - At the code end, print out the analysis using `print()`.
-    """.format(
+    cache_key = make_code_cache_key(STOCK_ANALYSIS_CODE_PROMPT, config.PERIOD)
+    cached_code = code_cache.get(cache_key, stock_symbol)
+    if cached_code:
+        return cached_code
+
+    prompt = STOCK_ANALYSIS_CODE_PROMPT.format(
         symbol=stock_symbol, period=config.PERIOD
     )
 
     llm = init_chat_model(config.LLM_MODEL)
     msg = llm.invoke(prompt)
-    return msg.content
+    code = _strip_code_fences(msg.content)
+    # Cached once `execute_python_code` reports that this exact script succeeded.
+    code_cache.track(code, cache_key, stock_symbol)
+    return code
 
 
 
@@ -72,6 +151,62 @@ print(analysis)
     return code
 
 
+def analyze_panel(panel: pd.DataFrame, period: str = "5d", window: int = 5) -> Dict[str, dict]:
+    """Compute the fallback analysis for every symbol of a price panel in one vectorized pass.
+
+    Args:
+        panel (pd.DataFrame): Either a `yf.download` panel with (field, symbol) columns, or a
+                              frame of close prices with one column per symbol.
+        period (str, optional): Period label reported in each analysis. Defaults to "5d".
+        window (int, optional): Number of trailing trading days to analyze. Defaults to 5.
+
+    Returns:
+        Dict[str, dict]: symbol -> {
+            "stock", "period", "average_daily_change", "volatility", "trend", "close_prices"
+        }
+    """
+    close = panel["Close"] if isinstance(panel.columns, pd.MultiIndex) else panel
+    close = close.dropna(how="all")
+
+    daily_change = close.pct_change().tail(window)
+    last_closes = close.tail(window)
+
+    avg_change = daily_change.mean().to_numpy()
+    volatility = daily_change.std().to_numpy()
+    net_change = (last_closes.ffill().iloc[-1] - last_closes.bfill().iloc[0]).to_numpy()
+    trend = np.select([net_change > 0, net_change < 0], ["upward 📈", "downward 📉"], "flat ➖")
+
+    closes = last_closes.to_numpy().T
+    return {
+        symbol: {
+            "stock": symbol,
+            "period": period,
+            "average_daily_change": round(float(avg_change[i]), 4),
+            "volatility": float(volatility[i]),
+            "trend": str(trend[i]),
+            "close_prices": closes[i][~np.isnan(closes[i])].tolist(),
+        }
+        for i, symbol in enumerate(close.columns)
+    }
+
+
+def generate_analysis_batch(stock_symbols: List[str], period: str = "5d") -> Dict[str, dict]:
+    """Generate the fallback analysis for many stocks in one pass over a panel of the local market data store.
+
+    What the store is missing is fetched with one panel download.
+
+    Args:
+        stock_symbols (List[str]): Stock ticker symbols, e.g. ["AAPL", "MSFT"].
+        period (str, optional): Time period to fetch data for. Defaults to "5d".
+
+    Returns:
+        Dict[str, dict]: symbol -> analysis, see `analyze_panel`. Symbols without any bars are left out.
+    """
+    market_store.prefetch(stock_symbols, period)
+    panel = market_store.panel(stock_symbols, period)
+    return analyze_panel(panel, period=period) if not panel.empty else {}
+
+
 def generate_analysis_fallback(stock_symbol: str, period: str = "5d") -> str:
     """Generate a fallback analysis for the stock if the LLM generated code execution fails.
     Args:
@@ -80,31 +215,9 @@ def generate_analysis_fallback(stock_symbol: str, period: str = "5d") -> str:
                                Examples: "1d", "5d", "1mo", "1y".
     
     Returns:
-        str: analysis string
+        str: analysis string, with the technical indicators of the longer `indicator_period` history
     """
-    stock = yf.Ticker(stock_symbol)
-    df = stock.history(period=period)  # Covers 5 trading days
-
-    df["Daily Change"] = df["Close"].pct_change()
-    last_5_days = df.tail(5)
-
-    avg_change = last_5_days["Daily Change"].mean()
-    volatility = last_5_days["Daily Change"].std()
-    net_change = last_5_days["Close"].iloc[-1] - last_5_days["Close"].iloc[0]
-
-    if net_change > 0:
-        trend = "upward 📈"
-    elif net_change < 0:
-        trend = "downward 📉"
-    else:
-        trend = "flat ➖"
-
-    result = {
-        "stock": stock_symbol,
-        "period": period,
-        "average_daily_change": f"{avg_change:.2f}",
-        "volatility": volatility,
-        "trend": trend,
-        "close_prices": last_5_days["Close"].tolist(),
-    }
+    df = get_stock_data(stock_symbol, period)
+    result = analyze_panel(df[["Close"]].set_axis([stock_symbol], axis=1), period=period)[stock_symbol]
+    result["indicators"] = get_indicators(stock_symbol)
     return json.dumps(result)
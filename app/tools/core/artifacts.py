@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional, TypedDict
+
+import numpy as np
+import pandas as pd
+
+from app import config
+
+
+class ArtifactRef(TypedDict):
+    """Handle of an artifact, small enough to keep in graph state, messages and checkpoints."""
+
+    id: str
+    kind: str  # "frame", "analysis", "news", ...
+    symbol: Optional[str]
+    path: str
+    bytes: int
+
+
+# File format per Python type. A frame is a directory in the layout of the market data store: raw NumPy
+# `index.npy` (UTC nanoseconds) and `values.npy` (float64), plus `meta.json` with its columns and timezone.
+_FORMATS = {"frame": "", "text": ".txt", "json": ".json"}
+
+
+def _frame_arrays(frame: pd.DataFrame) -> tuple:
+    frame = frame.select_dtypes("number")
+    dates = pd.DatetimeIndex(frame.index)
+    tz = str(dates.tz) if dates.tz is not None else None
+    if tz:
+        dates = dates.tz_convert("UTC").tz_localize(None)
+    index = dates.as_unit("ns").asi8
+    values = np.ascontiguousarray(frame.to_numpy(dtype=np.float64))
+    meta = json.dumps({"columns": [str(column) for column in frame.columns], "tz": tz}).encode()
+    return index, values, meta
+
+
+def _serialize(value: Any) -> tuple:
+    """Format and content of a value; the content of a frame is its arrays and meta."""
+    if isinstance(value, pd.DataFrame):
+        return "frame", _frame_arrays(value)
+    if isinstance(value, str):
+        return "text", value.encode()
+    return "json", json.dumps(value).encode()
+
+
+def _digest(fmt: str, data: Any) -> str:
+    if fmt != "frame":
+        return hashlib.sha256(data).hexdigest()
+    index, values, meta = data
+    digest = hashlib.sha256(meta)
+    digest.update(index.tobytes())
+    digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+def _write(path: Path, fmt: str, data: Any):
+    """Write `data` to a temporary sibling of `path`, then move it into place in one `os.replace`."""
+    tmp = path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+    if fmt != "frame":
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return
+
+    index, values, meta = data
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir()
+    np.save(tmp / "index.npy", index)
+    np.save(tmp / "values.npy", values)
+    (tmp / "meta.json").write_bytes(meta)
+    try:
+        os.replace(tmp, path)
+    except OSError:
+        # The same frame was stored by another thread in the meantime
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not path.is_dir():
+            raise
+
+
+def _size(fmt: str, data: Any) -> int:
+    if fmt != "frame":
+        return len(data)
+    index, values, meta = data
+    return index.nbytes + values.nbytes + len(meta)
+
+
+def _deserialize(path: str) -> Any:
+    if os.path.isdir(path):
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            meta = json.load(f)
+        # Memory-mapped read-only, the same frame (types, timezone, values) that was put
+        index = np.load(os.path.join(path, "index.npy"), mmap_mode="r")
+        values = np.load(os.path.join(path, "values.npy"), mmap_mode="r")
+        dates = pd.DatetimeIndex(np.asarray(index).view("datetime64[ns]"), name="Date").tz_localize("UTC")
+        if meta["tz"]:
+            dates = dates.tz_convert(meta["tz"])
+        return pd.DataFrame(values, index=dates, columns=meta["columns"], copy=False)
+    extension = os.path.splitext(path)[1]
+    with open(path, "r") as f:
+        return f.read() if extension == ".txt" else json.load(f)
+
+
+class ArtifactStore:
+    """
+    Content-addressed store for the large values a graph run produces: price frames, analysis
+    results, news batches.
+
+    `put` writes the value once under `<root>/<kind>/<id><ext>`, where the id is a hash of the
+    content, and returns an `ArtifactRef`. Graph state and tool messages carry only the ref, and
+    nodes `get` the value when they actually need it. Recently used values are kept in memory.
+    """
+
+    def __init__(self, root: str, cache_size: int = 64):
+        """
+        Args:
+            root (str): Store directory.
+            cache_size (int, optional): Values kept in memory after `put`/`get`. Defaults to 64.
+        """
+        self.root = Path(root)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, artifact_id: str, value: Any):
+        with self._lock:
+            self._cache[artifact_id] = value
+            self._cache.move_to_end(artifact_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def put(self, value: Any, kind: str, symbol: Optional[str] = None) -> ArtifactRef:
+        """
+        Store a value.
+
+        Args:
+            value (Any): A DataFrame (its numeric columns, memory-mapped back by `get`), a str, or anything
+                JSON-serializable.
+            kind (str): What the value is, e.g. "frame", "analysis", "news".
+            symbol (str, optional): Stock symbol the value belongs to.
+
+        Returns:
+            ArtifactRef: The handle.
+        """
+        fmt, data = _serialize(value)
+        artifact_id = f"{kind}-{_digest(fmt, data)[:16]}"
+        path = self.root / kind / f"{artifact_id}{_FORMATS[fmt]}"
+
+        if path.exists():
+            # Same content already stored, refresh its age for `prune`
+            os.utime(path)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            _write(path, fmt, data)
+
+        self._remember(artifact_id, value)
+        return {"id": artifact_id, "kind": kind, "symbol": symbol, "path": str(path), "bytes": _size(fmt, data)}
+
+    def get(self, ref: ArtifactRef) -> Any:
+        """Resolve a handle to its value."""
+        with self._lock:
+            if ref["id"] in self._cache:
+                self._cache.move_to_end(ref["id"])
+                return self._cache[ref["id"]]
+        value = _deserialize(ref["path"])
+        self._remember(ref["id"], value)
+        return value
+
+    def prune(self, max_age_days: float = 7) -> int:
+        """Delete artifacts not written for `max_age_days`. Returns the number of files deleted."""
+        cutoff = time.time() - max_age_days * 86400
+        deleted = 0
+        for path in self.root.glob("*/*"):
+            try:
+                if path.stat().st_mtime >= cutoff:
+                    continue
+            except FileNotFoundError:
+                # Deleted by a concurrent prune
+                continue
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+            deleted += 1
+        return deleted
+
+
+# Create a default instance for import
+artifact_store = ArtifactStore(os.path.join(config.DATA_DIR, "artifacts"))
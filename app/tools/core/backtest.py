@@ -0,0 +1,247 @@
+"""
+Vectorized backtest of a screen over the daily history of a universe.
+
+Every day the screen ranks the universe with the bars up to that day's close, the way the agent
+picks today's stock, and the `top_k` best are held from that close. Scores, picks, forward returns
+and drawdowns are symbol x date matrices, so a 10-year, 500-symbol study is a handful of array
+operations rather than a loop over days:
+
+    python main.py backtest --screen gainers --period 10y
+
+Each day only the symbols that were in the universe on that day are ranked, from its dated
+snapshots, so constituents that were later dropped are replayed too and no survivorship bias creeps in.
+"""
+
+import bisect
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from app import config
+from app.tools.core.market_store import market_store
+from app.tools.core.screener import Screen, get_screen
+from app.tools.core.spans import span
+from app.tools.core.universe import universe_manager
+
+# Forward holding periods in trading days
+HORIZONS = (1, 5, 20)
+
+# Fields the screens read
+FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+
+# Statistics reported per horizon
+STATS = (
+    "signals",
+    "mean_return",
+    "median_return",
+    "hit_rate",
+    "universe_return",
+    "excess_return",
+    "beat_rate",
+    "avg_drawdown",
+    "worst_drawdown",
+)
+
+
+def forward_returns(close: np.ndarray, horizon: int) -> np.ndarray:
+    """Return from the close of day t to the close of day t + horizon, NaN where the future is unknown."""
+    returns = np.full_like(close, np.nan)
+    returns[:-horizon] = close[horizon:] / close[:-horizon] - 1
+    return returns
+
+
+def forward_drawdowns(close: np.ndarray, horizon: int) -> np.ndarray:
+    """Worst close of days t + 1 .. t + horizon relative to the close of day t, as a fraction (<= 0)."""
+    worst = pd.DataFrame(close).rolling(horizon).min().shift(-horizon).to_numpy()
+    return np.minimum(worst / close - 1, 0.0)
+
+
+def select(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Column indices of the `top_k` best scores of every row, -1 where fewer symbols have a score."""
+    filled = np.where(np.isnan(scores), -np.inf, scores)
+    picks = np.argsort(-filled, axis=1, kind="stable")[:, :top_k]
+    return np.where(np.isfinite(np.take_along_axis(filled, picks, axis=1)), picks, -1)
+
+
+def _picked(values: np.ndarray, picks: np.ndarray) -> np.ndarray:
+    picked = np.take_along_axis(values, np.maximum(picks, 0), axis=1)
+    return np.where(picks >= 0, picked, np.nan)
+
+
+def _row_mean(values: np.ndarray) -> np.ndarray:
+    """Mean of every row over its known values, NaN for rows without any."""
+    counts = (~np.isnan(values)).sum(axis=1)
+    sums = np.nansum(values, axis=1)
+    return np.divide(sums, counts, out=np.full(len(values), np.nan), where=counts > 0)
+
+
+def _max_drawdown(returns: np.ndarray) -> float:
+    equity = np.cumprod(1 + returns)
+    return float(np.min(equity / np.maximum.accumulate(equity) - 1, initial=0.0))
+
+
+def _round(value: float) -> Optional[float]:
+    return None if value is None or np.isnan(value) else round(float(value), 4)
+
+
+def _horizon_stats(picked: np.ndarray, universe: np.ndarray, excess: np.ndarray, drawdowns: np.ndarray) -> dict:
+    if not len(picked):
+        return dict.fromkeys(STATS, None) | {"signals": 0}
+    return {
+        "signals": len(picked),
+        "mean_return": _round(np.mean(picked)),
+        "median_return": _round(np.median(picked)),
+        "hit_rate": _round(np.mean(picked > 0)),
+        "universe_return": _round(np.mean(universe)),
+        "excess_return": _round(np.mean(excess)),
+        "beat_rate": _round(np.mean(excess > 0)),
+        "avg_drawdown": _round(np.nanmean(drawdowns)),
+        "worst_drawdown": _round(np.nanmin(drawdowns)),
+    }
+
+
+def backtest(
+    panel: pd.DataFrame,
+    screen: Screen,
+    top_k: int = 1,
+    horizons: Sequence[int] = HORIZONS,
+    members: Optional[pd.DataFrame] = None,
+) -> dict:
+    """
+    Replay `screen` over every day of `panel`.
+
+    Args:
+        panel (pd.DataFrame): Daily bars with (field, symbol) columns, e.g. from `MarketDataStore.panel`.
+        screen (Screen): Selection rule, e.g. `get_screen("gainers")` for the top gainer of `get_top_nasdaq_gainer`.
+        top_k (int, optional): Symbols held per day, equally weighted. Defaults to 1.
+        horizons (Sequence[int], optional): Forward holding periods in trading days. Defaults to (1, 5, 20).
+        members (pd.DataFrame, optional): Universe membership, days x symbols booleans, e.g. from
+            `universe_membership`. Symbols are neither picked nor counted in the universe on days they
+            were not members. Defaults to every symbol of `panel` on every day.
+
+    Returns:
+        dict: {
+            "screen", "top_k", "symbols", "start", "end",
+            "days": int,                  # Days with a pick
+            "horizons": {"<h>d": {
+                "signals": int,           # Picks with a known forward return
+                "mean_return": float,     # Mean forward return of the picks
+                "median_return": float,
+                "hit_rate": float,        # Fraction of picks with a positive forward return
+                "universe_return": float, # Mean forward return of the universe members on the same days
+                "excess_return": float,   # Mean of pick return - universe return
+                "beat_rate": float,       # Fraction of picks beating the universe
+                "avg_drawdown": float,    # Mean worst close within the horizon, relative to the entry
+                "worst_drawdown": float
+            }},
+            "equity": {                   # Daily rebalanced into the picks, held for one day
+                "total_return", "max_drawdown", "universe_total_return", "universe_max_drawdown"
+            }
+        }, returns as fractions rounded to 4 decimals
+    """
+    panel = panel.dropna(how="all")
+    close = panel["Close"]
+    scores = screen.scores(panel).reindex(index=close.index, columns=close.columns).to_numpy(dtype=np.float64)
+    prices = close.to_numpy(dtype=np.float64)
+    if members is not None:
+        member = members.reindex(index=close.index, columns=close.columns, fill_value=False).to_numpy(dtype=bool)
+        scores = np.where(member, scores, np.nan)
+    else:
+        member = np.ones(prices.shape, dtype=bool)
+
+    with span("backtest.run", screen=screen.name, days=len(prices), symbols=prices.shape[1]):
+        picks = select(scores, top_k)
+        has_pick = (picks >= 0).any(axis=1)
+
+        results = {}
+        for horizon in horizons:
+            returns = forward_returns(prices, horizon)
+            picked = _picked(returns, picks)
+            universe = _row_mean(np.where(member, returns, np.nan))
+            known = ~np.isnan(picked)
+            results[f"{horizon}d"] = _horizon_stats(
+                picked[known],
+                universe[known.any(axis=1)],
+                (picked - universe[:, None])[known],
+                _picked(forward_drawdowns(prices, horizon), picks)[known],
+            )
+
+        daily = forward_returns(prices, 1)
+        strategy = _row_mean(_picked(daily, picks))
+        traded = ~np.isnan(strategy)
+        strategy, universe = strategy[traded], _row_mean(np.where(member, daily, np.nan))[traded]
+
+    return {
+        "screen": screen.name,
+        "top_k": top_k,
+        "symbols": prices.shape[1],
+        "start": close.index[0].date().isoformat() if len(close) else None,
+        "end": close.index[-1].date().isoformat() if len(close) else None,
+        "days": int(has_pick.sum()),
+        "horizons": results,
+        "equity": {
+            "total_return": _round(np.prod(1 + strategy) - 1),
+            "max_drawdown": _round(_max_drawdown(strategy)),
+            "universe_total_return": _round(np.prod(1 + universe) - 1),
+            "universe_max_drawdown": _round(_max_drawdown(universe)),
+        },
+    }
+
+
+def universe_membership(universe: str, index: pd.DatetimeIndex) -> pd.DataFrame:
+    """
+    Constituents of `universe` on every day of `index`, from its dated snapshots.
+
+    Each day gets the snapshot in effect on it (`UniverseManager.get(as_of=day)`); days before the
+    first snapshot get the oldest one. Custom universes are the same list every day.
+
+    Returns:
+        pd.DataFrame: Booleans, days x every symbol that was a member on any of them.
+    """
+    snapshots = universe_manager.snapshots(universe)
+    in_effect, constituents = np.zeros(len(index), dtype=int), {}
+    for row, timestamp in enumerate(index):
+        day = timestamp.date()
+        in_effect[row] = max(bisect.bisect_right(snapshots, day) - 1, 0)
+        # Days sharing a snapshot share its constituents, one lookup per snapshot
+        if in_effect[row] not in constituents:
+            constituents[in_effect[row]] = universe_manager.get(universe, as_of=day)
+
+    members = pd.DataFrame(False, index=index, columns=sorted(set().union(*constituents.values())))
+    for snapshot, symbols in constituents.items():
+        members.loc[in_effect == snapshot, symbols] = True
+    return members
+
+
+def run_backtest(
+    universe: Optional[str] = None,
+    screen: Optional[str] = None,
+    period: str = "10y",
+    top_k: int = 1,
+    horizons: Sequence[int] = HORIZONS,
+) -> dict:
+    """
+    Backtest a screen over the history of a universe.
+
+    Args:
+        universe (str, optional): Symbol universe. Defaults to `universe` in config.json.
+        screen (str, optional): Screen name. Defaults to `screen` in config.json.
+        period (str, optional): History replayed, e.g. "10y". Defaults to "10y".
+        top_k (int, optional): Symbols held per day. Defaults to 1.
+        horizons (Sequence[int], optional): Forward holding periods in trading days. Defaults to (1, 5, 20).
+
+    Returns:
+        dict: See `backtest`, plus `universe`.
+    """
+    universe = universe or config.UNIVERSE
+    # Every symbol that was ever a member, each is then only ranked on the days it was one
+    symbols = set(universe_manager.get(universe))
+    for day in universe_manager.snapshots(universe):
+        symbols.update(universe_manager.get(universe, as_of=day))
+    symbols = sorted(symbols)
+
+    market_store.prefetch(symbols, period)
+    panel = market_store.panel(symbols, period)[FIELDS]
+    members = universe_membership(universe, panel.index)
+    return dict(backtest(panel, get_screen(screen or config.SCREEN), top_k, horizons, members), universe=universe)
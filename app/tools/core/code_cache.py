@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from app import config
+
+SYMBOL_PLACEHOLDER = "__STOCK_SYMBOL__"
+
+
+def make_key(prompt_template: str, period: str) -> str:
+    """
+    Build the cache key of a code generation prompt.
+
+    Args:
+        prompt_template (str): The prompt before the symbol is filled in.
+        period (str): Analysis period, e.g. "5d".
+
+    Returns:
+        str: `<sha256 of the whitespace-normalized template>:<period>`
+    """
+    normalized = re.sub(r"\s+", " ", prompt_template).strip()
+    return hashlib.sha256(normalized.encode()).hexdigest() + ":" + period
+
+
+class CodeCache:
+    """
+    Persistent cache of LLM-generated analysis scripts.
+
+    Scripts are stored with the stock symbol replaced by a placeholder, so a script that worked for
+    one symbol can be replayed for any other; the data comes in as the DataFrame `df`, never from a path. A generated script is only `track`ed
+    at first; it is written to the cache once `report` sees it succeed, and a cached script that
+    fails is invalidated so the next run generates a new one.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, dict]] = None
+        # code -> (key, symbol) for scripts that have not run yet
+        self._pending: Dict[str, Tuple[str, str]] = {}
+
+    def _load(self) -> Dict[str, dict]:
+        if self._entries is None:
+            if os.path.isfile(self.path):
+                with open(self.path, "r") as f:
+                    self._entries = json.load(f)
+            else:
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def _templatize(code: str, symbol: str) -> str:
+        # Only quoted literals, a bare replace would mangle short symbols like "A".
+        for quote in ('"', "'"):
+            code = code.replace(f"{quote}{symbol}{quote}", f"{quote}{SYMBOL_PLACEHOLDER}{quote}")
+        return code
+
+    def get(self, key: str, symbol: str) -> Optional[str]:
+        """
+        Return the cached script for `key` with `symbol` filled in, None on a miss.
+        The returned script is tracked, so its outcome is reported like freshly generated code.
+        """
+        with self._lock:
+            entry = self._load().get(key)
+        if entry is None:
+            return None
+
+        code = entry["code"].replace(SYMBOL_PLACEHOLDER, symbol)
+        self.track(code, key, symbol)
+        return code
+
+    def track(self, code: str, key: str, symbol: str):
+        """Remember where a generated script came from, until its execution is reported."""
+        with self._lock:
+            self._pending[code] = (key, symbol)
+
+    def report(self, code: str, succeeded: bool):
+        """Cache a tracked script that succeeded, or invalidate its key if it failed."""
+        with self._lock:
+            origin = self._pending.pop(code, None)
+            if origin is None:
+                return
+            key, symbol = origin
+
+            entries = self._load()
+            if succeeded:
+                entries[key] = {"code": self._templatize(code, symbol), "updated_at": time.time()}
+            elif entries.pop(key, None) is None:
+                return
+            self._save()
+
+    def forget(self, code: str):
+        """Stop tracking a script whose outcome says nothing about it, e.g. a cancelled candidate."""
+        with self._lock:
+            self._pending.pop(code, None)
+
+    def invalidate(self, key: str):
+        """Drop the cached script for `key`."""
+        with self._lock:
+            if self._load().pop(key, None) is not None:
+                self._save()
+
+
+# Create a default instance for import
+code_cache = CodeCache(os.path.join(config.DATA_DIR, "code_cache.json"))
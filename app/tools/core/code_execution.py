@@ -1,8 +1,554 @@
+import atexit
+import contextlib
+import io
+import json
+import os
+import queue
+import resource
+import secrets
+import shutil
+import signal
 import subprocess
+import sys
 import tempfile
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from app.tools.core.code_cache import code_cache
+from app.tools.core.spans import span
+
+# Modules the zygote imports once, every sandbox worker forked from it starts with them warm.
+PRELOAD_MODULES = ["json", "numpy", "pandas"]
+
+# Frames handed to the sandbox are written here, memory-backed where the platform has it
+FRAMES_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+def _set_limit(limit: int, soft: int):
+    _, hard = resource.getrlimit(limit)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(limit, (soft, hard))
+
+
+# === Frame channel ===
+def _write_frame(frame: pd.DataFrame, directory: str) -> dict:
+    """
+    Write the numeric columns of `frame` as two raw NumPy files, the layout of the market data store,
+    and return the spec `_load_frame` maps them back from.
+    """
+    frame = frame.select_dtypes("number")
+    dates = pd.DatetimeIndex(frame.index)
+    tz = str(dates.tz) if dates.tz is not None else None
+    if tz:
+        dates = dates.tz_convert("UTC").tz_localize(None)
+
+    stem = os.path.join(directory, uuid.uuid4().hex)
+    spec = {"index": f"{stem}.index.npy", "values": f"{stem}.values.npy", "columns": list(frame.columns), "tz": tz}
+    np.save(spec["index"], dates.as_unit("ns").asi8)
+    np.save(spec["values"], np.ascontiguousarray(frame.to_numpy(dtype=np.float64)))
+    return spec
+
+
+def _load_frame(spec: dict) -> pd.DataFrame:
+    """Map a frame written by `_write_frame` without parsing or copying it. Writes stay private to the job."""
+    index = np.load(spec["index"], mmap_mode="c")
+    values = np.load(spec["values"], mmap_mode="c")
+    dates = pd.DatetimeIndex(np.asarray(index).view("datetime64[ns]"), name="Date").tz_localize("UTC")
+    if spec["tz"]:
+        dates = dates.tz_convert(spec["tz"])
+    return pd.DataFrame(values, index=dates, columns=spec["columns"], copy=False)
+
+
+def _to_json(value: Any) -> Any:
+    # NumPy scalars and arrays, pandas objects
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# === Sandbox processes ===
+def _worker_main(conn, cpu_limit: Optional[int]):
+    """
+    Sandbox worker loop: receive a job, run its code, send back its exit code, captured output and result.
+
+    The code sees the job's frame, if any, as `df`, and returns its result with `set_result(value)`
+    (or by leaving a dict named `analysis`). The result travels back as JSON next to the output, so
+    nothing has to be parsed out of stdout.
+    """
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+
+        if cpu_limit:
+            # RLIMIT_CPU counts the whole process lifetime, so move the soft limit per job.
+            used = resource.getrusage(resource.RUSAGE_SELF)
+            _set_limit(resource.RLIMIT_CPU, int(used.ru_utime + used.ru_stime) + cpu_limit)
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        returncode = 0
+        results = []
+        scope = {"__name__": "__main__", "set_result": results.append}
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                if job["frame"]:
+                    scope["df"] = _load_frame(job["frame"])
+                exec(compile(job["code"], "<sandbox>", "exec"), scope)
+            except SystemExit as e:
+                returncode = e.code if isinstance(e.code, int) else int(e.code is not None)
+            except BaseException:
+                traceback.print_exc()
+                returncode = 1
+
+        reply = {"returncode": returncode, "stdout": stdout.getvalue(), "stderr": stderr.getvalue(), "result": None}
+        if not results and isinstance(scope.get("analysis"), dict):
+            results.append(scope["analysis"])
+        if results:
+            try:
+                reply["result"] = json.dumps(results[-1], default=_to_json)
+            except (TypeError, ValueError) as e:
+                reply["stderr"] += f"Result is not JSON serializable: {e}\n"
+                reply["returncode"] = reply["returncode"] or 1
+        scope.clear()
+        conn.send(reply)
+
+
+def _zygote_main(address: str, memory_limit: int, cpu_limit: int):
+    """
+    Fork server loop: import `PRELOAD_MODULES`, then fork one worker per line read from stdin.
+    Each worker connects back to the pool's listener at `address`.
+    """
+    for module in PRELOAD_MODULES:
+        __import__(module)
+    authkey = bytes.fromhex(os.environ.pop("SANDBOX_AUTHKEY"))
+
+    # Let the kernel reap finished workers.
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    for _ in sys.stdin:
+        pid = os.fork()
+        if pid:
+            continue
+
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        sys.stdin.close()
+        if memory_limit:
+            _set_limit(resource.RLIMIT_AS, memory_limit)
+        conn = Client(address, family="AF_UNIX", authkey=authkey)
+        conn.send(os.getpid())
+        try:
+            _worker_main(conn, cpu_limit or None)
+        finally:
+            os._exit(0)
+
+
+class _Worker:
+    def __init__(self, conn):
+        self.conn = conn
+        self.pid = conn.recv()
+        self.jobs = 0
+        self.killed = False
+
+    def run(self, code: str, timeout: float, frame: Optional[dict]) -> dict:
+        self.jobs += 1
+        self.conn.send({"code": code, "frame": frame})
+        if not self.conn.poll(timeout):
+            raise TimeoutError
+        return self.conn.recv()
+
+    def kill(self):
+        """Stop the running job: its `run` then fails with EOFError."""
+        self.killed = True
+        with contextlib.suppress(ProcessLookupError):
+            os.kill(self.pid, signal.SIGKILL)
+
+    def close(self):
+        self.conn.close()
+        self.kill()
+
+
+class SandboxPool:
+    """
+    Pool of warm sandbox processes for running generated Python code.
+
+    Workers are forked from a zygote process that has already imported `PRELOAD_MODULES`, so a
+    job pays neither interpreter startup nor the pandas/numpy imports. Each worker runs under
+    address-space and CPU rlimits, is killed on timeout, and is recycled after `max_jobs` jobs so
+    state leaked by one script cannot pile up.
+
+    A job's input frame is handed over as memory-mapped NumPy files rather than CSV, and its result
+    comes back as JSON over the worker's connection, apart from its stdout.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        max_jobs: int = 20,
+        memory_limit: Optional[int] = 2 * 1024**3,
+        cpu_limit: Optional[int] = 10,
+    ):
+        """
+        Args:
+            size (int, optional): Maximum number of concurrent workers. Defaults to 2.
+            max_jobs (int, optional): Jobs a worker runs before it is replaced. Defaults to 20.
+            memory_limit (int, optional): Address space limit in bytes per worker. Defaults to 2 GiB.
+            cpu_limit (int, optional): CPU seconds allowed per job. Defaults to 10.
+        """
+        self.size = size
+        self.max_jobs = max_jobs
+        self.memory_limit = memory_limit
+        self.cpu_limit = cpu_limit
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._workers = set()
+        self._zygote: Optional[subprocess.Popen] = None
+        self._listener: Optional[Listener] = None
+        self._frames_dir = tempfile.mkdtemp(prefix="sandbox-frames-", dir=FRAMES_DIR)
+
+    def _start_zygote(self):
+        authkey = secrets.token_bytes(32)
+        address = os.path.join(tempfile.mkdtemp(prefix="sandbox-"), "pool.sock")
+        self._listener = Listener(address, family="AF_UNIX", authkey=authkey)
+
+        env = dict(os.environ, SANDBOX_AUTHKEY=authkey.hex())
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(Path(__file__).parents[3]), env.get("PYTHONPATH")]))
+        self._zygote = subprocess.Popen(
+            [
+                sys.executable,
+                "-c",
+                "from app.tools.core.code_execution import _zygote_main; _zygote_main(%r, %d, %d)"
+                % (address, self.memory_limit or 0, self.cpu_limit or 0),
+            ],
+            stdin=subprocess.PIPE,
+            env=env,
+            text=True,
+        )
+
+    def _spawn(self) -> _Worker:
+        with self._lock:
+            if self._zygote is None or self._zygote.poll() is not None:
+                self._close_zygote()
+                self._start_zygote()
+            self._zygote.stdin.write("fork\n")
+            self._zygote.stdin.flush()
+            worker = _Worker(self._listener.accept())
+            self._workers.add(worker)
+        return worker
+
+    def _discard(self, worker: _Worker):
+        with self._lock:
+            self._workers.discard(worker)
+        worker.close()
+
+    def warm(self):
+        """Start all workers ahead of the first job."""
+        for _ in range(self.size - self._idle.qsize()):
+            self._idle.put(self._spawn())
+
+    def _run_job(
+        self,
+        code: str,
+        timeout: float,
+        spec: Optional[dict],
+        started: Optional[Callable] = None,
+        finished: Optional[Callable] = None,
+    ) -> dict:
+        """Run one job; `started(worker)` and `finished(worker)` are called around it, before the worker is reused."""
+        with self._slots:
+            worker = self._idle_worker()
+            if started is not None:
+                started(worker)
+
+            try:
+                result = worker.run(code, timeout, spec)
+            except TimeoutError:
+                self._discard(worker)
+                raise
+            except (EOFError, OSError) as e:
+                self._discard(worker)
+                raise RuntimeError("Sandbox worker died, it may have exceeded its CPU or memory limit") from e
+            finally:
+                if finished is not None:
+                    finished(worker)
+
+            # Checked after `finished`: until then another thread may still kill the worker
+            if worker.jobs >= self.max_jobs or worker.killed:
+                self._discard(worker)
+            else:
+                self._idle.put(worker)
+            return result
+
+    def _idle_worker(self) -> _Worker:
+        """A warm worker, or a new one. Workers killed after they were put back are dropped."""
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return self._spawn()
+            if not worker.killed:
+                return worker
+            self._discard(worker)
+
+    @contextlib.contextmanager
+    def _frame(self, frame: Optional[pd.DataFrame]):
+        spec = _write_frame(frame, self._frames_dir) if frame is not None else None
+        try:
+            yield spec
+        finally:
+            if spec:
+                # The workers' mappings, if any, outlive the files
+                for path in (spec["index"], spec["values"]):
+                    with contextlib.suppress(OSError):
+                        os.unlink(path)
+
+    def run(self, code: str, timeout: float = 5, frame: Optional[pd.DataFrame] = None) -> dict:
+        """
+        Run `code` in a worker.
+
+        Args:
+            code (str): python code to execute
+            timeout (float, optional): Seconds before the worker is killed. Defaults to 5.
+            frame (pd.DataFrame, optional): Bars indexed by date, available to the code as `df`.
+
+        Returns:
+            dict: {"returncode": int, "stdout": str, "stderr": str, "result": Optional[str]},
+                `result` being the JSON of the value passed to `set_result`.
+
+        Raises:
+            TimeoutError: If the code did not finish within `timeout`.
+            RuntimeError: If the worker died, e.g. by hitting its CPU or memory limit.
+        """
+        with self._frame(frame) as spec:
+            return self._run_job(code, timeout, spec)
+
+    def run_first(
+        self,
+        codes: List[str],
+        accept: Callable[[int, dict], bool],
+        timeout: float = 5,
+        frame: Optional[pd.DataFrame] = None,
+    ) -> Tuple[Optional[int], List[Union[dict, Exception, None]]]:
+        """
+        Run candidate scripts concurrently, one worker each, and stop at the first accepted one.
+
+        The frame is written once and mapped by every candidate. Once a result is accepted, the
+        workers still running are killed and the candidates still waiting for a worker are skipped.
+
+        Args:
+            codes (List[str]): Candidate scripts.
+            accept (Callable): `accept(index, result) -> bool`, called with each finished candidate's result (see `run`).
+            timeout (float, optional): Seconds before each worker is killed. Defaults to 5.
+            frame (pd.DataFrame, optional): Bars indexed by date, available to the code as `df`.
+
+        Returns:
+            Tuple: (index of the accepted candidate or None, per candidate: its result, the TimeoutError or
+                RuntimeError it raised, or None if it was cancelled)
+        """
+        outcomes: List[Union[dict, Exception, None]] = [None] * len(codes)
+        running: Dict[int, _Worker] = {}
+        winner = []
+        lock = threading.Lock()
+
+        def started(index: int, worker: _Worker):
+            with lock:
+                running[index] = worker
+                if winner:
+                    worker.kill()
+
+        def finished(index: int, worker: _Worker):
+            # Out of `running` before the worker goes back to the pool, so a winner cannot kill it there
+            with lock:
+                running.pop(index, None)
+
+        def attempt(index: int):
+            if winner:
+                return
+            try:
+                outcomes[index] = self._run_job(
+                    codes[index],
+                    timeout,
+                    spec,
+                    lambda worker: started(index, worker),
+                    lambda worker: finished(index, worker),
+                )
+            except (TimeoutError, RuntimeError) as e:
+                # Killed for another candidate's result: cancelled, not failed
+                outcomes[index] = None if winner else e
+                return
+            if accept(index, outcomes[index]):
+                with lock:
+                    if winner:
+                        return
+                    winner.append(index)
+                    for worker in running.values():
+                        worker.kill()
+
+        with self._frame(frame) as spec, ThreadPoolExecutor(len(codes) or 1, thread_name_prefix="sandbox") as executor:
+            list(executor.map(attempt, range(len(codes))))
+        return (winner[0] if winner else None), outcomes
+
+    def _close_zygote(self):
+        if self._zygote is not None:
+            self._zygote.kill()
+            self._zygote.wait()
+            self._zygote = None
+        if self._listener is not None:
+            address = self._listener.address
+            self._listener.close()
+            with contextlib.suppress(OSError):
+                os.rmdir(os.path.dirname(address))
+            self._listener = None
+
+    def shutdown(self):
+        """Stop all workers and the zygote."""
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+            self._close_zygote()
+        for worker in workers:
+            worker.close()
+        self._idle = queue.LifoQueue()
+        shutil.rmtree(self._frames_dir, ignore_errors=True)
+
+
+_pool: Optional[SandboxPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_sandbox_pool() -> SandboxPool:
+    """Return the process-wide sandbox pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Workers start on demand, so this only bounds how many candidates run at once
+            _pool = SandboxPool(size=max(2, os.cpu_count() or 1))
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def _outcome(result: Union[dict, Exception], validate: Optional[Callable[[Any], Any]]) -> dict:
+    """Status of a sandbox job from its pool result, or the error it raised."""
+    outcome = {"status": "failed", "output": "", "error": "", "result": None}
+    try:
+        if isinstance(result, Exception):
+            raise result
+        outcome.update(output=result["stdout"], error=result["stderr"])
+        if result["result"] is not None:
+            outcome["result"] = json.loads(result["result"])
+
+        if result["returncode"] != 0:
+            outcome["error"] = outcome["error"] or f"Exited with code {result['returncode']}"
+        elif validate is not None:
+            outcome.update(result=validate(outcome["result"]), status="success")
+        elif outcome["result"] is not None or outcome["output"]:
+            outcome["status"] = "success"
+        else:
+            outcome["error"] = "No result: call set_result(...) or print the analysis"
+
+    except TimeoutError:
+        outcome["error"] = "Execution timed out"
+
+    except ValueError as e:
+        outcome["error"] = f"Invalid result: {e}"
+
+    except Exception as e:
+        outcome["error"] = str(e)
+
+    return outcome
+
+
+def run_python_code(
+    code: str, frame: Optional[pd.DataFrame] = None, validate: Optional[Callable[[Any], Any]] = None
+) -> dict:
+    """
+    Run code in a warm sandbox worker, with an input frame and a typed result.
+
+    Args:
+        code (str): python code to execute
+        frame (pd.DataFrame, optional): Bars indexed by date, mapped into the sandbox as `df`.
+        validate (Callable, optional): Checks the result, returning it (possibly normalized) or raising
+            ValueError, e.g. `validate_analysis`.
+
+    Returns:
+        dict: {
+            "status": "success" | "failed",  # success: exit code 0 and a result (or output) that passed `validate`
+            "output": str,                   # stdout
+            "error": str,
+            "result": Any                    # the value passed to `set_result`, None without one
+        }
+    """
+    try:
+        with span("sandbox.run"):
+            result = get_sandbox_pool().run(code, timeout=5, frame=frame)  # seconds
+    except Exception as e:
+        result = e
+    outcome = _outcome(result, validate)
+
+    # Let the code cache keep generated scripts that worked and drop the ones that did not.
+    code_cache.report(code, outcome["status"] == "success")
+    return outcome
+
+
+def run_python_candidates(
+    codes: List[str], frame: Optional[pd.DataFrame] = None, validate: Optional[Callable[[Any], Any]] = None
+) -> dict:
+    """
+    Run candidate scripts concurrently and keep the first that succeeds, cancelling the others.
+
+    Args:
+        codes (List[str]): Candidate scripts, e.g. generated by one LLM call.
+        frame (pd.DataFrame, optional): Bars indexed by date, mapped into every candidate as `df`.
+        validate (Callable, optional): See `run_python_code`.
+
+    Returns:
+        dict: The `run_python_code` outcome of the winner, plus "candidate": its index. If every candidate
+            failed, "candidate" is None and "error" lists their errors.
+    """
+    if not codes:
+        return {"status": "failed", "output": "", "error": "No candidate scripts", "result": None, "candidate": None}
+
+    outcomes = {}
+
+    def accept(index: int, result: dict) -> bool:
+        outcomes[index] = _outcome(result, validate)
+        return outcomes[index]["status"] == "success"
+
+    with span("sandbox.candidates", candidates=len(codes)):
+        winner, results = get_sandbox_pool().run_first(codes, accept, timeout=5, frame=frame)
+
+    if winner is not None:
+        code_cache.report(codes[winner], True)
+        # Cancelled or beaten candidates say nothing about the cached script
+        for index, code in enumerate(codes):
+            if index != winner:
+                code_cache.forget(code)
+        return dict(outcomes[winner], candidate=winner)
+
+    for index, (code, result) in enumerate(zip(codes, results)):
+        if index not in outcomes:
+            outcomes[index] = _outcome(result, validate)
+        code_cache.report(code, False)
+    errors = "\n".join(f"Candidate {index + 1}: {outcomes[index]['error']}" for index in range(len(codes)))
+    return {"status": "failed", "output": "", "error": errors, "result": None, "candidate": None}
+
 
 def execute_python_code(code: str) -> dict:
-    """Executes Python code in a subprocess with timeout and isolation. Expects the code to output a non-empty string.
+    """Executes Python code in a warm sandbox worker with timeout and isolation. Expects the code to output a non-empty string,
+    or to pass its analysis to `set_result(...)`.
     Returns a JSON string with status, output, and error if any.
 
     Args:
@@ -12,40 +558,12 @@ def execute_python_code(code: str) -> dict:
         dict: {
             "status": "success" | "failed",
             "output": str,
-            "error": str
+            "error": str,
+            "result": Any
         }
     """
-    try:
-        # Write the code to a temporary file
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-            f.write(code)
-            temp_path = f.name
-
-        result = subprocess.run(
-            ['python', temp_path],
-            capture_output=True,
-            text=True,
-            timeout=5  # seconds
-        )
-        
-        return {
-            "status": "success" if (result.returncode == 0 or not result.stdout) else "failed",
-            "output": result.stdout,
-            "error": result.stderr
-        }
+    return run_python_code(code)
 
-    except subprocess.TimeoutExpired:
-        return {
-            "status": "failed",
-            "error": "Execution timed out"
-        }
-
-    except Exception as e:
-        return {
-            "status": "failed",
-            "error": str(e)
-        }
-            
 # code = '''
 # import yfinance as yf
 
@@ -1,8 +1,73 @@
 import os
-import smtplib
-from email.mime.text import MIMEText
+from concurrent.futures import Future
+from typing import Callable, List, Optional
 
-def send_email_by_smtp(subject: str, body: str, from_email: str, to_emails: list[str], smtp_server: str) -> str:
+from app.tools.core.mailer import mailer
+
+
+def greeting_personalizer(template: str) -> Callable[[str, str], str]:
+    """
+    `personalize` hook starting each body with a greeting for its recipient.
+
+    Args:
+        template (str): Greeting line, `{name}` is the part of the address before the @ and `{email}` the
+            whole address, e.g. "Hi {name},".
+    Returns:
+        Callable: `personalize(recipient, body) -> body`.
+    """
+
+    def personalize(recipient: str, body: str) -> str:
+        return f"{template.format(name=recipient.split('@')[0], email=recipient)}\n\n{body}"
+
+    return personalize
+
+
+def queue_email(
+    subject: str,
+    body: str,
+    from_email: str,
+    to_emails: list[str],
+    smtp_server: str,
+    smtp_port: int = 465,
+    use_ssl: bool = True,
+    personalize: Optional[Callable[[str, str], str]] = None,
+) -> List[Future]:
+    """
+    Queue an email for background delivery, one message per recipient, over pooled SMTP connections.
+    Failed deliveries are retried, then written to the mailer's dead-letter file.
+
+    Args:
+        subject (str): Email subject line.
+        body (str): Email body text.
+        from_email (str): Sender email address.
+        to_emails (list[str]): List of recipient email addresses.
+        smtp_server (str): SMTP server address.
+        smtp_port (int, optional): SMTP server port. Defaults to 465.
+        use_ssl (bool, optional): Connect with implicit TLS (SMTP_SSL), STARTTLS otherwise. Defaults to True.
+        personalize (Callable, optional): `personalize(recipient, body) -> body` for each recipient, e.g.
+            `greeting_personalizer("Hi {name},")`.
+    Returns:
+        List[Future]: One per recipient, done once the message is sent or dead-lettered.
+
+    Raises:
+        RuntimeError: If the `EMAIL_PASSWORD` environment variable is not set.
+    """
+    if not os.environ.get("EMAIL_PASSWORD"):
+        raise RuntimeError("EMAIL_PASSWORD environment variable not set")
+
+    return mailer.submit(subject, body, from_email, to_emails, smtp_server, smtp_port, use_ssl, personalize)
+
+
+def send_email_by_smtp(
+    subject: str,
+    body: str,
+    from_email: str,
+    to_emails: list[str],
+    smtp_server: str,
+    smtp_port: int = 465,
+    use_ssl: bool = True,
+    greeting: Optional[str] = None,
+) -> str:
     """
     Sends an email with the given subject and body using SMTP.
     The password is stored in the environment variable `EMAIL_PASSWORD`.
@@ -12,31 +77,21 @@ def send_email_by_smtp(subject: str, body: str, from_email: str, to_emails: list
         body (str): Email body text.
         from_email (str): Sender email address.
         to_emails (list[str]): List of recipient email addresses.
-        password (str): Sender email password.
         smtp_server (str): SMTP server address.
+        smtp_port (int, optional): SMTP server port. Defaults to 465.
+        use_ssl (bool, optional): Connect with implicit TLS (SMTP_SSL), STARTTLS otherwise. Defaults to True.
+        greeting (str, optional): Greeting line each body starts with, see `greeting_personalizer`. Defaults to None.
     Returns:
         str: Success message if email sent.
 
     Raises:
         RuntimeError: If email sending fails.
     """
-    # to_emails = TO_EMAILS
-    # from_email = FROM_EMAIL
-    # smtp_server = SMTP_SERVER
-    
-    password = os.environ.get("EMAIL_PASSWORD")
-    if not password:
-        raise RuntimeError("EMAIL_PASSWORD environment variable not set")
-
-    msg = MIMEText(body)
-    msg["Subject"] = subject
-    msg["From"] = from_email
-    msg["To"] = ', '.join(to_emails)
-
     try:
-        with smtplib.SMTP_SSL(smtp_server, 465) as server:
-            server.login(from_email, password)
-            server.sendmail(from_email, to_emails, msg.as_string())
+        # Waits for the delivery, retries included
+        personalize = greeting_personalizer(greeting) if greeting else None
+        for future in queue_email(subject, body, from_email, to_emails, smtp_server, smtp_port, use_ssl, personalize):
+            future.result()
         return "Email sent successfully."
     except Exception as e:
-        raise Exception(f"Failed to send email: {e}")
\ No newline at end of file
+        raise Exception(f"Failed to send email: {e}")
@@ -0,0 +1,328 @@
+import csv
+import threading
+import time
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+from app.tools.core.providers import MarketDataProvider, get_provider
+
+# Sessions are dated in the timezone of the exchange, not of the machine
+EXCHANGE_TIMEZONE = ZoneInfo("America/New_York")
+
+
+def session_day(ts: Optional[float] = None) -> date:
+    """Trading day of a unix timestamp (default: now) in the exchange timezone."""
+    return datetime.fromtimestamp(time.time() if ts is None else ts, EXCHANGE_TIMEZONE).date()
+
+
+class Tick(NamedTuple):
+    """One price update."""
+
+    ts: float  # unix seconds
+    symbol: str
+    price: float
+
+
+class IndexedHeap:
+    """
+    Binary min-heap of symbols by priority, with a symbol -> position index.
+
+    The index makes `update` and `remove` of an arbitrary symbol O(log n), which a plain `heapq`
+    list cannot do. Use negated priorities for a max-heap.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, str]] = []
+        self._pos: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._pos
+
+    def priority(self, symbol: str) -> float:
+        return self._heap[self._pos[symbol]][0]
+
+    def peek(self) -> Tuple[str, float]:
+        """(symbol, priority) with the smallest priority."""
+        priority, symbol = self._heap[0]
+        return symbol, priority
+
+    def items(self) -> List[Tuple[str, float]]:
+        """All (symbol, priority) pairs, in heap order."""
+        return [(symbol, priority) for priority, symbol in self._heap]
+
+    def push(self, symbol: str, priority: float):
+        self._heap.append((priority, symbol))
+        self._pos[symbol] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def update(self, symbol: str, priority: float):
+        i = self._pos[symbol]
+        previous = self._heap[i][0]
+        self._heap[i] = (priority, symbol)
+        if priority < previous:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
+
+    def remove(self, symbol: str) -> float:
+        i = self._pos.pop(symbol)
+        priority = self._heap[i][0]
+        last = self._heap.pop()
+        if i < len(self._heap):
+            self._heap[i] = last
+            self._pos[last[1]] = i
+            self._sift_up(i)
+            self._sift_down(self._pos[last[1]])
+        return priority
+
+    def pop(self) -> Tuple[str, float]:
+        symbol, priority = self.peek()
+        self.remove(symbol)
+        return symbol, priority
+
+    def _swap(self, i: int, j: int):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._pos[heap[i][1]] = i
+        self._pos[heap[j][1]] = j
+
+    def _sift_up(self, i: int):
+        while i > 0:
+            parent = (i - 1) // 2
+            if self._heap[i] >= self._heap[parent]:
+                return
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i: int):
+        n = len(self._heap)
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < n and self._heap[child] < self._heap[smallest]:
+                    smallest = child
+            if smallest == i:
+                return
+            self._swap(i, smallest)
+            i = smallest
+
+
+class GainerTracker:
+    """
+    Live ranking of the universe by percent change against the prior close.
+
+    The K best symbols sit in a min-heap (root: the weakest leader) and all others in a max-heap
+    (root: the best challenger), both indexed, so each tick costs O(log n) and the top-K can be
+    read at any time without touching a panel. Listeners registered with `on_leader_change` are
+    called with (previous, current) leader whenever the top symbol changes.
+    """
+
+    def __init__(self, top_k: int = 10, prior_closes: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            top_k (int, optional): Number of leaders kept ranked. Defaults to 10.
+            prior_closes (Dict[str, float], optional): symbol -> prior session close, the reference of
+                the percent change. Ticks of symbols without one are ignored.
+        """
+        self.top_k = top_k
+        self.prior_closes: Dict[str, float] = dict(prior_closes or {})
+
+        self._top = IndexedHeap()  # pct
+        self._rest = IndexedHeap()  # -pct
+        self._last: Dict[str, Tick] = {}
+        self._leader: Optional[str] = None
+        self._listeners: List[Callable[[Optional[dict], dict], None]] = []
+        self._lock = threading.Lock()
+
+    def on_leader_change(self, listener: Callable[[Optional[dict], dict], None]):
+        """Call `listener(previous, current)` with leader dicts (see `leaders`) when the leader changes."""
+        self._listeners.append(listener)
+
+    def _pct(self, symbol: str) -> float:
+        return self._top.priority(symbol) if symbol in self._top else -self._rest.priority(symbol)
+
+    def _rebalance(self):
+        if len(self._top) < self.top_k and len(self._rest):
+            symbol, priority = self._rest.pop()
+            self._top.push(symbol, -priority)
+        elif len(self._top) > self.top_k:
+            symbol, pct = self._top.pop()
+            self._rest.push(symbol, -pct)
+        # A challenger that overtook the weakest leader swaps places with it.
+        if len(self._top) and len(self._rest) and -self._rest.peek()[1] > self._top.peek()[1]:
+            leader_symbol, leader_pct = self._top.pop()
+            challenger_symbol, challenger_priority = self._rest.pop()
+            self._top.push(challenger_symbol, -challenger_priority)
+            self._rest.push(leader_symbol, -leader_pct)
+
+    def update(self, symbol: str, price: float, ts: Optional[float] = None) -> bool:
+        """
+        Apply one price update.
+
+        Args:
+            symbol (str): Stock symbol.
+            price (float): Latest price.
+            ts (float, optional): Unix time of the price. Defaults to now.
+
+        Returns:
+            bool: True if the update changed the leader.
+        """
+        prior_close = self.prior_closes.get(symbol)
+        if not prior_close:
+            return False
+        pct = price / prior_close - 1
+
+        with self._lock:
+            self._last[symbol] = Tick(time.time() if ts is None else ts, symbol, price)
+            if symbol in self._top:
+                self._top.update(symbol, pct)
+            elif symbol in self._rest:
+                self._rest.update(symbol, -pct)
+            else:
+                self._rest.push(symbol, -pct)
+            self._rebalance()
+
+            previous = self._leader
+            if previous is None or (symbol != previous and pct > self._pct(previous)):
+                self._leader = symbol
+            elif symbol == previous:
+                # The leader fell back, it may have been overtaken by any of the other K - 1.
+                self._leader = max(self._top.items(), key=lambda item: item[1])[0]
+            if self._leader == previous:
+                return False
+            previous_info = self._info(previous) if previous else None
+            current_info = self._info(self._leader)
+
+        for listener in self._listeners:
+            listener(previous_info, current_info)
+        return True
+
+    def run(self, ticks: Iterable[Tick]) -> int:
+        """Consume a tick stream until it ends. Returns the number of leader changes."""
+        return sum(self.update(tick.symbol, tick.price, tick.ts) for tick in ticks)
+
+    def _info(self, symbol: str) -> dict:
+        tick = self._last[symbol]
+        return {
+            "symbol": symbol,
+            "pct": f"{self._pct(symbol):.2f}",
+            "price": tick.price,
+            "prior_close": self.prior_closes[symbol],
+            "day": session_day(tick.ts).isoformat(),
+        }
+
+    @property
+    def leader(self) -> Optional[dict]:
+        """The current top gainer, shaped like `get_top_nasdaq_gainer`, None before the first tick."""
+        with self._lock:
+            return self._info(self._leader) if self._leader else None
+
+    def leaders(self, n: Optional[int] = None) -> List[dict]:
+        """
+        The current top gainers, best first.
+
+        Args:
+            n (int, optional): Number of leaders, at most `top_k`. Defaults to `top_k`.
+
+        Returns:
+            List[dict]: [{"symbol", "pct", "price", "prior_close", "day"}]
+        """
+        with self._lock:
+            ranked = sorted(self._top.items(), key=lambda item: item[1], reverse=True)
+            return [self._info(symbol) for symbol, _ in ranked[: n or self.top_k]]
+
+
+# === Sources ===
+def load_prior_closes(
+    symbols: List[str], day: Optional[date] = None, provider: Optional[MarketDataProvider] = None
+) -> Dict[str, float]:
+    """
+    Closes of the last session before `day`, from one daily panel download. A bar of `day` itself,
+    complete or not, is never the reference.
+
+    Args:
+        symbols (List[str]): Stock symbols.
+        day (date, optional): Session being tracked. Defaults to today in the exchange timezone, so
+            before the open the reference is the last completed session, not the one before it.
+        provider (MarketDataProvider, optional): Defaults to the active provider.
+
+    Returns:
+        Dict[str, float]: symbol -> prior close
+    """
+    close = (provider or get_provider()).download(symbols, "5d")["Close"]
+    day = day or session_day()
+    prior = close[close.index.date < day]
+    if prior.empty:
+        return {}
+    return {symbol: float(value) for symbol, value in prior.ffill().iloc[-1].dropna().items()}
+
+
+def replay_ticks(path: str, speed: float = 0) -> Iterator[Tick]:
+    """
+    Replay a tick file, a CSV with `timestamp,symbol,price` columns ordered by time.
+
+    Args:
+        path (str): Tick file. `timestamp` is unix seconds or an ISO datetime.
+        speed (float, optional): Replay speed relative to real time, e.g. 60 plays a minute per
+            second. 0 replays as fast as possible. Defaults to 0.
+    """
+    previous_ts = None
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            raw = row["timestamp"]
+            try:
+                ts = float(raw)
+            except ValueError:
+                ts = pd.Timestamp(raw).timestamp()
+            if speed and previous_ts is not None and ts > previous_ts:
+                time.sleep((ts - previous_ts) / speed)
+            previous_ts = ts
+            yield Tick(ts, row["symbol"], float(row["price"]))
+
+
+def poll_ticks(
+    symbols: List[str],
+    interval: float = 60,
+    provider: Optional[MarketDataProvider] = None,
+    stop: Optional[threading.Event] = None,
+) -> Iterator[Tick]:
+    """
+    Poll today's daily bars every `interval` seconds and yield the prices that moved.
+
+    Args:
+        symbols (List[str]): Stock symbols.
+        interval (float, optional): Seconds between polls. Defaults to 60.
+        provider (MarketDataProvider, optional): Defaults to the active provider.
+        stop (threading.Event, optional): Set it to end the stream.
+    """
+    stop = stop or threading.Event()
+    last: Dict[str, float] = {}
+    while not stop.is_set():
+        close = (provider or get_provider()).download(symbols, "1d")["Close"]
+        if not close.empty:
+            now = time.time()
+            for symbol, price in close.iloc[-1].dropna().items():
+                if last.get(symbol) != price:
+                    last[symbol] = price
+                    yield Tick(now, symbol, float(price))
+        stop.wait(interval)
+
+
+# === Active tracker ===
+_active_tracker: Optional[GainerTracker] = None
+
+
+def set_active_tracker(tracker: Optional[GainerTracker]):
+    """Make `get_top_nasdaq_gainer` answer from `tracker` instead of downloading a panel, None to stop."""
+    global _active_tracker
+    _active_tracker = tracker
+
+
+def get_active_tracker() -> Optional[GainerTracker]:
+    return _active_tracker
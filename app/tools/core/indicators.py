@@ -0,0 +1,364 @@
+import copy
+import json
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from app import config
+from app.tools.core.spans import span
+from app.tools.core.stock_data import get_stock_data
+
+
+# === Streaming indicators ===
+class StreamingIndicator:
+    """
+    Base of the indicators below: each `update` folds in one bar in O(1).
+
+    The state is the instance attributes, so it can be saved with `state()` and restored with
+    `from_state()`. Indicators made of other indicators list them in `_children`.
+    """
+
+    _children: Dict[str, type] = {}
+
+    def state(self) -> dict:
+        state = {}
+        for name, value in vars(self).items():
+            if isinstance(value, StreamingIndicator):
+                value = value.state()
+            elif isinstance(value, np.ndarray):
+                value = value.tolist()
+            state[name] = value
+        return state
+
+    @classmethod
+    def from_state(cls, state: dict) -> "StreamingIndicator":
+        indicator = cls.__new__(cls)
+        for name, value in state.items():
+            if name in cls._children:
+                value = cls._children[name].from_state(value)
+            elif isinstance(value, list):
+                value = np.asarray(value, dtype=np.float64)
+            setattr(indicator, name, value)
+        return indicator
+
+
+class RollingStats(StreamingIndicator):
+    """Mean and standard deviation over the last `window` values, from running sums over a ring buffer."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = np.zeros(window)
+        self.head = 0
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def update(self, x: float):
+        if self.count == self.window:
+            old = self.values[self.head]
+            self.total -= old
+            self.total_sq -= old * old
+        else:
+            self.count += 1
+        self.values[self.head] = x
+        self.total += x
+        self.total_sq += x * x
+        self.head = (self.head + 1) % self.window
+        if self.head == 0:
+            # Re-sum once per lap, so rounding errors of the running sums never pile up over years of bars.
+            self.total = float(self.values.sum())
+            self.total_sq = float(np.dot(self.values, self.values))
+
+    @property
+    def ready(self) -> bool:
+        return self.count == self.window
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.window if self.ready else None
+
+    def std(self, ddof: int = 1) -> Optional[float]:
+        if not self.ready or self.window <= ddof:
+            return None
+        variance = (self.total_sq - self.total * self.total / self.window) / (self.window - ddof)
+        return math.sqrt(max(variance, 0.0))
+
+
+class EMA(StreamingIndicator):
+    """Exponential moving average seeded with the first value, like `Series.ewm(span, adjust=False)`."""
+
+    def __init__(self, span: int):
+        self.alpha = 2 / (span + 1)
+        self.value = None
+
+    def update(self, x: float) -> float:
+        self.value = x if self.value is None else self.value + self.alpha * (x - self.value)
+        return self.value
+
+
+class WilderAverage(StreamingIndicator):
+    """Wilder's smoothing: the plain mean of the first `period` values, then `(prev * (period - 1) + x) / period`."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.count = 0
+        self.value = None
+        self._seed = 0.0
+
+    def update(self, x: float) -> Optional[float]:
+        self.count += 1
+        if self.count < self.period:
+            self._seed += x
+        elif self.count == self.period:
+            self.value = (self._seed + x) / self.period
+        else:
+            self.value = (self.value * (self.period - 1) + x) / self.period
+        return self.value
+
+
+class RSI(StreamingIndicator):
+    """Relative strength index of closes, with Wilder's smoothing."""
+
+    _children = {"gain": WilderAverage, "loss": WilderAverage}
+
+    def __init__(self, period: int = 14):
+        self.gain = WilderAverage(period)
+        self.loss = WilderAverage(period)
+        self.previous = None
+
+    def update(self, close: float):
+        if self.previous is not None:
+            change = close - self.previous
+            self.gain.update(max(change, 0.0))
+            self.loss.update(max(-change, 0.0))
+        self.previous = close
+
+    @property
+    def value(self) -> Optional[float]:
+        if self.gain.value is None:
+            return None
+        if self.loss.value == 0:
+            return 100.0
+        return 100 - 100 / (1 + self.gain.value / self.loss.value)
+
+
+class MACD(StreamingIndicator):
+    """MACD line (fast EMA - slow EMA), its signal EMA and the histogram."""
+
+    _children = {"fast": EMA, "slow": EMA, "signal": EMA}
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+
+    def update(self, close: float):
+        self.signal.update(self.fast.update(close) - self.slow.update(close))
+
+    @property
+    def value(self) -> Optional[float]:
+        return None if self.fast.value is None else self.fast.value - self.slow.value
+
+
+class ATR(StreamingIndicator):
+    """Average true range, with Wilder's smoothing."""
+
+    _children = {"average": WilderAverage}
+
+    def __init__(self, period: int = 14):
+        self.average = WilderAverage(period)
+        self.previous_close = None
+
+    def update(self, high: float, low: float, close: float):
+        true_range = high - low
+        if self.previous_close is not None:
+            true_range = max(true_range, abs(high - self.previous_close), abs(low - self.previous_close))
+        self.average.update(true_range)
+        self.previous_close = close
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.average.value
+
+
+class Drawdown(StreamingIndicator):
+    """Current and maximum drawdown of closes from their running peak, as fractions (<= 0)."""
+
+    def __init__(self):
+        self.peak = None
+        self.current = 0.0
+        self.max = 0.0
+
+    def update(self, close: float):
+        self.peak = close if self.peak is None else max(self.peak, close)
+        self.current = close / self.peak - 1
+        self.max = min(self.max, self.current)
+
+
+class IndicatorSet(StreamingIndicator):
+    """Every indicator of one symbol, updated together bar by bar."""
+
+    _children = {
+        "sma": RollingStats,
+        "rsi": RSI,
+        "macd": MACD,
+        "atr": ATR,
+        "drawdown": Drawdown,
+    }
+
+    def __init__(self, window: int = 20, bollinger_k: float = 2.0, rsi: int = 14, atr: int = 14):
+        self.window = window
+        self.bollinger_k = bollinger_k
+        self.bars = 0
+        self.close = None
+        self.sma = RollingStats(window)
+        self.rsi = RSI(rsi)
+        self.macd = MACD()
+        self.atr = ATR(atr)
+        self.drawdown = Drawdown()
+
+    def update(self, high: float, low: float, close: float):
+        self.bars += 1
+        self.close = close
+        self.sma.update(close)
+        self.rsi.update(close)
+        self.macd.update(close)
+        self.atr.update(high, low, close)
+        self.drawdown.update(close)
+
+    def values(self) -> dict:
+        """Latest value of each indicator, None until it has seen enough bars."""
+        mean, std = self.sma.mean, self.sma.std(ddof=0)
+        macd = self.macd.value
+        values = {
+            "bars": self.bars,
+            "close": self.close,
+            f"sma_{self.window}": mean,
+            f"std_{self.window}": self.sma.std(),
+            "ema_12": self.macd.fast.value,
+            "ema_26": self.macd.slow.value,
+            f"rsi_{self.rsi.gain.period}": self.rsi.value,
+            "macd": macd,
+            "macd_signal": self.macd.signal.value,
+            "macd_hist": None if macd is None else macd - self.macd.signal.value,
+            "bollinger_upper": None if mean is None else mean + self.bollinger_k * std,
+            "bollinger_lower": None if mean is None else mean - self.bollinger_k * std,
+            f"atr_{self.atr.average.period}": self.atr.value,
+            "drawdown": self.drawdown.current,
+            "max_drawdown": self.drawdown.max,
+        }
+        return {name: value if value is None or name == "bars" else round(float(value), 4) for name, value in values.items()}
+
+
+# === Per-symbol state ===
+class IndicatorStore:
+    """
+    Indicator state per symbol, persisted so extending a long history costs one update per new bar.
+
+    `<root>/<SYMBOL>.json` holds the indicators folded over every bar from the first one (`start`)
+    up to the second to last one seen, with that bar's timestamp and close. The last bar is applied
+    to a copy only, as it may be a partial intraday bar that the next download revises. The state is
+    rebuilt from scratch when the history goes further back than `start` (a longer period than the
+    state was seeded with), when the stored bar's close changed (e.g. prices adjusted for a dividend)
+    or when it is no longer in the history. A history starting later than `start` extends the state,
+    which keeps the longest history requested.
+    """
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root (str): Directory of the state files.
+        """
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    def _path(self, symbol: str) -> Path:
+        return self.root / f"{symbol.upper()}.json"
+
+    def _load(self, symbol: str) -> Optional[dict]:
+        path = self._path(symbol)
+        if not path.is_file():
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _save(self, symbol: str, state: dict):
+        path = self._path(symbol)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+
+    def latest(self, symbol: str, frame: pd.DataFrame) -> dict:
+        """
+        Indicators of `symbol` as of the last bar of `frame`.
+
+        Args:
+            symbol (str): Stock symbol.
+            frame (pd.DataFrame): Daily bars with `High`, `Low` and `Close`, indexed by date, e.g. from the market data store.
+
+        Returns:
+            dict: See `IndicatorSet.values`, plus `as_of` (ISO day of the last bar).
+        """
+        if frame.empty:
+            return {}
+        timestamps = pd.DatetimeIndex(frame.index).as_unit("ns").asi8
+        bars = frame[["High", "Low", "Close"]].to_numpy(dtype=np.float64)
+
+        with self._lock, span("indicators.update", symbol=symbol):
+            saved = self._load(symbol)
+            start = 0
+            # Only a state seeded no later than this history began can be extended, states without `start` never
+            if saved is not None and saved.get("start", math.inf) <= timestamps[0]:
+                position = int(np.searchsorted(timestamps, saved["timestamp"]))
+                if position < len(timestamps) and timestamps[position] == saved["timestamp"] and math.isclose(
+                    bars[position, 2], saved["close"], rel_tol=1e-9
+                ):
+                    start = position + 1
+            indicators = IndicatorSet.from_state(saved["indicators"]) if start else IndicatorSet()
+
+            # Fold in the new bars but the last, which stays provisional
+            last = len(bars) - 1
+            if start < last:
+                for high, low, close in bars[start:last]:
+                    indicators.update(high, low, close)
+                self._save(
+                    symbol,
+                    {
+                        "start": int(saved["start"] if start else timestamps[0]),
+                        "timestamp": int(timestamps[last - 1]),
+                        "close": float(bars[last - 1, 2]),
+                        "indicators": indicators.state(),
+                    },
+                )
+
+        if start <= last:
+            indicators = copy.deepcopy(indicators)
+            indicators.update(*bars[last])
+        return dict(indicators.values(), as_of=frame.index[-1].date().isoformat())
+
+
+# Create a default instance for import
+indicator_store = IndicatorStore(os.path.join(config.DATA_DIR, "indicators"))
+
+
+def get_indicators(symbol: str, period: Optional[str] = None) -> dict:
+    """
+    Technical indicators of a stock over a long history: SMA/std and Bollinger bands (20), EMA 12/26,
+    RSI 14, MACD 12/26/9, ATR 14, current and maximum drawdown.
+
+    Args:
+        symbol (str): Stock ticker symbol, e.g. "AAPL".
+        period (str, optional): History the indicators run over. Defaults to `indicator_period` in config.json.
+
+    Returns:
+        dict: Indicator name -> latest value (None until enough bars), with `bars` and `as_of`.
+    """
+    frame = get_stock_data(symbol, period or config.INDICATOR_PERIOD)
+    return indicator_store.latest(symbol, frame)
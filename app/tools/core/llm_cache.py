@@ -0,0 +1,218 @@
+"""
+Persistent cache of chat model responses, for the LLM nodes that opt in.
+
+Reruns, tests and scheduled runs of the same day send the same prompts again. A node listed in
+`llm_cache_nodes` (config.json) gets its chat model with this cache set: a call whose model, bound
+tools and messages were answered before is served from `data/llm_cache.sqlite` instead of the
+provider. Entries expire after `llm_cache_ttl_hours`, and the least recently used ones are evicted
+once the cache grows past `llm_cache_max_mb`.
+
+Hits and misses are recorded on the active `RunTracer` as `llm_cache` events. Nodes whose output
+must be fresh every run, like the summary email, simply do not opt in.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional, Sequence
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+from app import config
+from app.tools.core.spans import active_tracer
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    used REAL NOT NULL
+)
+"""
+
+# Cached usage is not spent again, the tracer counts the tokens of a hit as 0
+_NO_USAGE = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+
+# Message fields that are not part of what the model is asked
+_NOT_SENT = ("id", "usage_metadata", "response_metadata")
+
+
+def make_key(prompt: str, llm_string: str) -> str:
+    """
+    Cache key of a call: sha256 of the model settings with the bound tools (`llm_string`) and the messages.
+
+    Message ids and usage are left out: they differ between runs, a cache hit included, and are not sent to the model.
+    """
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        messages = None
+    if isinstance(messages, list):
+        for message in messages:
+            if isinstance(message, dict) and isinstance(message.get("kwargs"), dict):
+                for field in _NOT_SENT:
+                    message["kwargs"].pop(field, None)
+        prompt = json.dumps(messages, sort_keys=True)
+    return hashlib.sha256(f"{llm_string}\n{prompt}".encode()).hexdigest()
+
+
+class LLMCache:
+    """
+    SQLite store of serialized generations with a TTL and a size limit, evicting the least recently used.
+
+    `for_node(node)` returns the LangChain `BaseCache` a chat model of that node is given.
+    """
+
+    def __init__(self, path: str, ttl_hours: float = 24, max_mb: float = 64):
+        """
+        Args:
+            path (str): SQLite file.
+            ttl_hours (float, optional): Lifetime of an entry. Defaults to 24.
+            max_mb (float, optional): Total size of the stored responses. Defaults to 64.
+        """
+        self.path = path
+        self.ttl_hours = ttl_hours
+        self.max_mb = max_mb
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Nodes of the parallel graph run on other threads, access is serialized by `_lock`.
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(SCHEMA)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_used ON llm_cache (used)")
+        return self._conn
+
+    def get(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """
+        Return the cached generations of a call, None on a miss or when the entry has expired.
+
+        Args:
+            prompt (str): Serialized messages of the call.
+            llm_string (str): Model settings and bound tools of the call.
+
+        Returns:
+            Optional[RETURN_VAL_TYPE]: The generations stored by `put`.
+        """
+        key = make_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_hours * 3600:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE llm_cache SET used = ? WHERE key = ?", (now, key))
+            conn.commit()
+        return loads(row[0], allowed_objects="core")
+
+    def put(self, prompt: str, llm_string: str, generations: RETURN_VAL_TYPE):
+        """Store the generations of a call, then evict the least recently used entries over `max_mb`."""
+        value = dumps(list(generations))
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?)",
+                (make_key(prompt, llm_string), value, len(value), now, now),
+            )
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        excess = total - self.max_mb * 2**20
+        if excess <= 0:
+            return
+        # Oldest use first, up to and including the entry that brings the total under the limit
+        conn.execute(
+            """
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (ORDER BY used, key) - size AS freed FROM llm_cache
+                ) WHERE freed < ?
+            )
+            """,
+            (excess,),
+        )
+
+    def clear(self, expired_only: bool = False) -> int:
+        """Delete every entry, or only the expired ones. Returns the number deleted."""
+        with self._lock:
+            conn = self._connect()
+            if expired_only:
+                deleted = conn.execute(
+                    "DELETE FROM llm_cache WHERE created < ?", (time.time() - self.ttl_hours * 3600,)
+                ).rowcount
+            else:
+                deleted = conn.execute("DELETE FROM llm_cache").rowcount
+            conn.commit()
+        return deleted
+
+    def for_node(self, node: str) -> "NodeLLMCache":
+        """The LangChain cache of the chat model of `node`, counting its hits and misses."""
+        return NodeLLMCache(self, node)
+
+
+class NodeLLMCache(BaseCache):
+    """`LLMCache` as seen by the chat model of one node, recording an `llm_cache` event per lookup."""
+
+    def __init__(self, store: LLMCache, node: str):
+        self.store = store
+        self.node = node
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        generations = self.store.get(prompt, llm_string)
+        tracer = active_tracer.get()
+        if tracer is not None:
+            tracer.record("llm_cache", node=self.node, hit=generations is not None)
+        if generations is None:
+            return None
+
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            if message is not None:
+                # A new id per call, like an answer of the provider: `add_messages` merges messages by id
+                generation.message = message.model_copy(update={"id": None, "usage_metadata": dict(_NO_USAGE)})
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        self.store.put(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs: Any) -> None:
+        self.store.clear()
+
+
+def with_llm_cache(model: Any, node: str, nodes: Optional[Sequence[str]] = None) -> Any:
+    """
+    Return `model` with the LLM cache set when `node` opted in, `model` itself otherwise.
+
+    Args:
+        model (BaseChatModel): Chat model of the node, before its tools are bound.
+        node (str): Graph node making the call, e.g. "generate_sentiment_node".
+        nodes (Sequence[str], optional): Nodes that opted in. Defaults to `llm_cache_nodes` in config.json.
+
+    Returns:
+        BaseChatModel: A copy of `model` using the cache, or `model`.
+    """
+    if node not in (config.LLM_CACHE_NODES if nodes is None else nodes):
+        return model
+    return model.model_copy(update={"cache": llm_cache.for_node(node)})
+
+
+# Create a default instance for import
+llm_cache = LLMCache(
+    os.path.join(config.DATA_DIR, "llm_cache.sqlite"),
+    ttl_hours=config.LLM_CACHE_TTL_HOURS,
+    max_mb=config.LLM_CACHE_MAX_MB,
+)
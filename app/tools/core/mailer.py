@@ -0,0 +1,342 @@
+import atexit
+import contextlib
+import contextvars
+import json
+import os
+import queue
+import smtplib
+import ssl
+import threading
+import time
+import uuid
+from concurrent.futures import Future, wait
+from email.mime.text import MIMEText
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from app import config
+from app.tools.core.spans import span
+
+
+# Hosts a plain SMTP connection without STARTTLS is accepted to
+LOOPBACK_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+
+class SMTPServer(NamedTuple):
+    """Where and how to deliver."""
+
+    host: str
+    port: int = 465
+    use_ssl: bool = True  # implicit TLS (SMTP_SSL), STARTTLS on a plain connection otherwise
+    username: str = ""
+
+
+class OutboundMessage(NamedTuple):
+    """One message to one recipient."""
+
+    id: str
+    server: SMTPServer
+    from_email: str
+    to_email: str
+    subject: str
+    body: str
+
+
+class SMTPConnectionPool:
+    """
+    Authenticated SMTP connections kept open between sends, per server and login.
+
+    A connection is checked out for one send and returned afterwards; a connection that failed
+    is closed instead of returned. One idle for longer than `check_after` is probed with NOOP
+    before reuse, and one idle for longer than `idle_timeout` is closed, as servers drop them.
+    """
+
+    def __init__(self, max_idle: int = 4, idle_timeout: float = 60, check_after: float = 10, timeout: float = 30):
+        """
+        Args:
+            max_idle (int, optional): Idle connections kept per server. Defaults to 4.
+            idle_timeout (float, optional): Seconds an idle connection is reused. Defaults to 60.
+            check_after (float, optional): Idle seconds after which a connection is probed before reuse. Defaults to 10.
+            timeout (float, optional): Socket timeout in seconds. Defaults to 30.
+        """
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.check_after = check_after
+        self.timeout = timeout
+        self.opened = 0
+        self._idle: Dict[SMTPServer, List[Tuple[smtplib.SMTP, float]]] = {}
+        self._lock = threading.Lock()
+
+    def _open(self, server: SMTPServer, password: str) -> smtplib.SMTP:
+        smtp_class = smtplib.SMTP_SSL if server.use_ssl else smtplib.SMTP
+        with span("smtp.connect", host=server.host):
+            conn = smtp_class(server.host, server.port, timeout=self.timeout)
+            try:
+                if not server.use_ssl:
+                    self._starttls(conn, server)
+                conn.login(server.username, password)
+            except Exception:
+                conn.close()
+                raise
+        with self._lock:
+            self.opened += 1
+        return conn
+
+    @staticmethod
+    def _starttls(conn: smtplib.SMTP, server: SMTPServer):
+        """
+        Upgrade a plain connection to TLS before the password is sent.
+
+        Only a relay on the loopback interface, which never leaves the host, may go without it.
+        """
+        conn.ehlo()
+        if conn.has_extn("starttls"):
+            conn.starttls(context=ssl.create_default_context())
+            conn.ehlo()
+        elif server.host not in LOOPBACK_HOSTS:
+            raise smtplib.SMTPNotSupportedError(f"{server.host} does not offer STARTTLS, refusing to log in over plain SMTP")
+
+    @staticmethod
+    def _quit(conn: smtplib.SMTP):
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+    def _checkout(self, server: SMTPServer) -> Optional[smtplib.SMTP]:
+        while True:
+            with self._lock:
+                idle = self._idle.get(server, [])
+                if not idle:
+                    return None
+                conn, idle_since = idle.pop()
+            idle_for = time.monotonic() - idle_since
+            if idle_for > self.idle_timeout:
+                self._quit(conn)
+                continue
+            if idle_for > self.check_after:
+                try:
+                    if conn.noop()[0] != 250:
+                        raise smtplib.SMTPServerDisconnected("NOOP failed")
+                except Exception:
+                    conn.close()
+                    continue
+            return conn
+
+    @contextlib.contextmanager
+    def connection(self, server: SMTPServer, password: str) -> Iterator[smtplib.SMTP]:
+        """Check out a logged-in connection to `server`, opening one if none is idle."""
+        conn = self._checkout(server) or self._open(server, password)
+
+        try:
+            yield conn
+        except Exception:
+            conn.close()
+            raise
+        with self._lock:
+            idle = self._idle.setdefault(server, [])
+            if len(idle) < self.max_idle:
+                idle.append((conn, time.monotonic()))
+                conn = None
+        if conn is not None:
+            self._quit(conn)
+
+    def close(self):
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for conn, _ in connections:
+                self._quit(conn)
+
+
+class Mailer:
+    """
+    Outbound mail queue in front of an SMTP connection pool.
+
+    `submit` returns at once: each recipient gets its own message, queued and delivered by
+    `workers` background threads over pooled connections. A failed delivery is retried with
+    exponential backoff; after `max_attempts` it is appended to the dead-letter file (see
+    `requeue_dead_letters`). Every message has a `Future` resolving to its id once sent.
+    """
+
+    def __init__(
+        self,
+        dead_letter_path: str,
+        workers: int = 2,
+        max_attempts: int = 4,
+        backoff: float = 2.0,
+        max_backoff: float = 60.0,
+        pool: Optional[SMTPConnectionPool] = None,
+    ):
+        """
+        Args:
+            dead_letter_path (str): JSONL file of the messages that could not be delivered.
+            workers (int, optional): Concurrent deliveries. Defaults to 2.
+            max_attempts (int, optional): Deliveries tried per message. Defaults to 4.
+            backoff (float, optional): Seconds before the first retry, doubled for each next one. Defaults to 2.
+            max_backoff (float, optional): Longest wait between two attempts. Defaults to 60.
+            pool (SMTPConnectionPool, optional): Defaults to a new pool.
+        """
+        self.dead_letter_path = dead_letter_path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool = pool or SMTPConnectionPool()
+        self.stats = {"sent": 0, "retried": 0, "dead": 0}
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._futures: Dict[str, Future] = {}
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._threads = [
+                threading.Thread(target=self._work, name=f"mailer-{i}", daemon=True) for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+        # Deliver what is still queued before the interpreter exits
+        atexit.register(self.close, 60)
+
+    def submit(
+        self,
+        subject: str,
+        body: str,
+        from_email: str,
+        to_emails: List[str],
+        smtp_server: str,
+        smtp_port: int = 465,
+        use_ssl: bool = True,
+        personalize: Optional[Callable[[str, str], str]] = None,
+    ) -> List[Future]:
+        """
+        Queue one message per recipient.
+
+        Args:
+            subject (str): Email subject line.
+            body (str): Email body text.
+            from_email (str): Sender email address, also the SMTP login.
+            to_emails (List[str]): Recipient email addresses.
+            smtp_server (str): SMTP server address.
+            smtp_port (int, optional): SMTP server port. Defaults to 465.
+            use_ssl (bool, optional): Connect with implicit TLS (SMTP_SSL), STARTTLS otherwise. Defaults to True.
+            personalize (Callable, optional): `personalize(recipient, body) -> body` for each recipient.
+
+        Returns:
+            List[Future]: One per recipient, resolving to the message id, or failing once the message is dead-lettered.
+        """
+        server = SMTPServer(smtp_server, smtp_port, use_ssl, from_email)
+        futures = []
+        for to_email in to_emails:
+            message = OutboundMessage(
+                id=uuid.uuid4().hex,
+                server=server,
+                from_email=from_email,
+                to_email=to_email,
+                subject=subject,
+                body=personalize(to_email, body) if personalize else body,
+            )
+            futures.append(self._enqueue(message, attempt=1))
+        return futures
+
+    def _enqueue(self, message: OutboundMessage, attempt: int) -> Future:
+        self._start()
+        with self._lock:
+            future = self._futures.setdefault(message.id, Future())
+        # Delivery spans go to the tracer of the run that queued the message
+        self._queue.put((message, attempt, contextvars.copy_context()))
+        return future
+
+    def _work(self):
+        while True:
+            message, attempt, context = self._queue.get()
+            try:
+                context.run(self._deliver, message, attempt)
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, message: OutboundMessage, attempt: int):
+        try:
+            password = os.environ.get("EMAIL_PASSWORD")
+            if not password:
+                raise RuntimeError("EMAIL_PASSWORD environment variable not set")
+
+            msg = MIMEText(message.body)
+            msg["Subject"] = message.subject
+            msg["From"] = message.from_email
+            msg["To"] = message.to_email
+            with self.pool.connection(message.server, password) as conn, span("smtp.send", recipients=1):
+                conn.sendmail(message.from_email, [message.to_email], msg.as_string())
+        except Exception as e:
+            if attempt < self.max_attempts:
+                with self._lock:
+                    self.stats["retried"] += 1
+                delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+                timer = threading.Timer(delay, self._queue.put, ((message, attempt + 1, contextvars.copy_context()),))
+                timer.daemon = True
+                timer.start()
+            else:
+                self._dead_letter(message, attempt, e)
+            return
+
+        with self._lock:
+            self.stats["sent"] += 1
+            future = self._futures.pop(message.id)
+        future.set_result(message.id)
+
+    def _dead_letter(self, message: OutboundMessage, attempts: int, error: Exception):
+        record = dict(message._asdict(), server=message.server._asdict(), attempts=attempts, error=str(error), ts=time.time())
+        with self._lock:
+            os.makedirs(os.path.dirname(self.dead_letter_path) or ".", exist_ok=True)
+            with open(self.dead_letter_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+            self.stats["dead"] += 1
+            future = self._futures.pop(message.id)
+        future.set_exception(RuntimeError(f"Failed to send email to {message.to_email} after {attempts} attempts: {error}"))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued message is sent or dead-lettered, retries included.
+
+        Returns:
+            bool: False if `timeout` seconds passed first.
+        """
+        with self._lock:
+            pending = list(self._futures.values())
+        done, not_done = wait(pending, timeout=timeout)
+        return not not_done
+
+    def requeue_dead_letters(self) -> List[Future]:
+        """Queue the dead-lettered messages again, with fresh attempts, and empty the dead-letter file."""
+        with self._lock:
+            if not os.path.isfile(self.dead_letter_path):
+                return []
+            with open(self.dead_letter_path, "r") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+            os.remove(self.dead_letter_path)
+
+        futures = []
+        for record in records:
+            message = OutboundMessage(
+                id=record["id"],
+                server=SMTPServer(**record["server"]),
+                from_email=record["from_email"],
+                to_email=record["to_email"],
+                subject=record["subject"],
+                body=record["body"],
+            )
+            futures.append(self._enqueue(message, attempt=1))
+        return futures
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush, then close the pooled connections."""
+        self.flush(timeout)
+        self.pool.close()
+
+
+# Create a default instance for import
+mailer = Mailer(os.path.join(config.DATA_DIR, "mail", "dead_letter.jsonl"))
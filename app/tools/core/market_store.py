@@ -0,0 +1,320 @@
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import date
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app import config
+from app.tools.core.providers import get_provider, is_trading_days_period, period_start, slice_period
+
+# Columns kept in the store, in on-disk order. `yf.Ticker.history` returns these for daily bars.
+COLUMNS = ["Open", "High", "Low", "Close", "Volume", "Dividends", "Stock Splits"]
+
+# Periods `prefetch` refreshes stale symbols with, shortest first
+DELTA_PERIODS = ("5d", "1mo", "3mo", "6mo", "1y", "2y", "5y", "10y")
+
+# Seconds a replaced version is kept before it is deleted
+VERSION_GRACE = 60
+
+
+def _provider_history(symbol: str, period: Optional[str] = None, start: Optional[date] = None) -> pd.DataFrame:
+    return get_provider().history(symbol, period=period, start=start)
+
+
+def _provider_download(symbols: List[str], period: str) -> pd.DataFrame:
+    return get_provider().download(symbols, period)
+
+
+def delta_period(since: date, today: Optional[date] = None) -> str:
+    """Shortest download period that still covers every bar from `since` (inclusive) to `today`."""
+    today = today or date.today()
+    for period in DELTA_PERIODS:
+        if is_trading_days_period(period):
+            # N trading days cover at least N calendar days
+            if (today - since).days < int(period[:-1]):
+                return period
+        elif period_start(period, today) <= since:
+            return period
+    return "max"
+
+
+def _symbol_bars(panel: pd.DataFrame, symbol: str) -> pd.DataFrame:
+    if symbol not in panel.columns.get_level_values(1):
+        return panel.iloc[:0, :0]
+    return panel.xs(symbol, axis=1, level=1).dropna(how="all")
+
+
+class MarketDataStore:
+    """
+    Local OHLCV store partitioned by symbol.
+
+    Every symbol lives in `<root>/<SYMBOL>/`, each write in a new version directory:
+      - `<version>/index.npy`: bar timestamps as int64 nanoseconds (UTC)
+      - `<version>/values.npy`: float64 matrix, one column per entry of `COLUMNS`
+      - `<version>/meta.json`: timezone, covered start and last fetch time
+      - `CURRENT`: name of the version to read, swapped in with one `os.replace`
+
+    Reads memory-map the two arrays, so loading a long history does not parse or copy anything, and
+    always see the three files of one write together.
+    Writes only ever extend the contiguous range [coverage start, last bar], which lets `get`
+    answer any period that is already covered with a small trailing delta download.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        fetch: Callable[..., pd.DataFrame] = _provider_history,
+        fetch_many: Callable[[List[str], str], pd.DataFrame] = _provider_download,
+        refresh_ttl: float = 15 * 60,
+    ):
+        """
+        Args:
+            root (str): Store directory.
+            fetch (Callable, optional): `fetch(symbol, period=None, start=None) -> DataFrame`. Defaults to the active market data provider.
+            fetch_many (Callable, optional): `fetch_many(symbols, period) -> panel` with (field, symbol)
+                columns, used by `prefetch`. Defaults to the active market data provider.
+            refresh_ttl (float, optional): Seconds during which a symbol is considered fresh and no
+                delta is downloaded. Defaults to 15 minutes.
+        """
+        self.root = Path(root)
+        self.fetch = fetch
+        self.fetch_many = fetch_many
+        self.refresh_ttl = refresh_ttl
+
+    def _symbol_dir(self, symbol: str) -> Path:
+        return self.root / symbol.upper()
+
+    def _current(self, symbol: str) -> Optional[Path]:
+        """Directory of the current version of `symbol`, None if the symbol is not stored."""
+        symbol_dir = self._symbol_dir(symbol)
+        try:
+            return symbol_dir / (symbol_dir / "CURRENT").read_text().strip()
+        except FileNotFoundError:
+            # Stores written before versioning keep their files in the symbol directory itself
+            return symbol_dir if (symbol_dir / "meta.json").is_file() else None
+
+    def _load(self, symbol: str) -> Tuple[Optional[dict], Optional[pd.DataFrame]]:
+        """Meta and memory-mapped bars of the current version of `symbol`, (None, None) if it is not stored."""
+        for attempt in range(3):
+            version_dir = self._current(symbol)
+            if version_dir is None:
+                return None, None
+            try:
+                with open(version_dir / "meta.json", "r") as f:
+                    meta = json.load(f)
+                index = np.load(version_dir / "index.npy", mmap_mode="r")
+                values = np.load(version_dir / "values.npy", mmap_mode="r")
+                break
+            except FileNotFoundError:
+                # Pruned by writers since `CURRENT` was read, read the version that replaced it
+                if attempt == 2:
+                    raise
+
+        dates = pd.DatetimeIndex(np.asarray(index).view("datetime64[ns]"), name="Date").tz_localize("UTC")
+        if meta.get("tz"):
+            dates = dates.tz_convert(meta["tz"])
+        return meta, pd.DataFrame(values, index=dates, columns=meta["columns"], copy=False)
+
+    def read(self, symbol: str) -> Optional[pd.DataFrame]:
+        """
+        Read everything stored for `symbol` without copying.
+
+        Returns:
+            Optional[pd.DataFrame]: Memory-mapped frame indexed by `Date`, None if the symbol is not stored.
+        """
+        return self._load(symbol)[1]
+
+    def write(self, symbol: str, frame: pd.DataFrame, coverage_start: Optional[str]):
+        """
+        Replace the stored bars of `symbol`.
+
+        Args:
+            symbol (str): Stock symbol.
+            frame (pd.DataFrame): Daily bars indexed by timestamp.
+            coverage_start (Optional[str]): ISO day the data is complete from, `"max"` for full history.
+        """
+        symbol_dir = self._symbol_dir(symbol)
+        symbol_dir.mkdir(parents=True, exist_ok=True)
+
+        frame = frame.sort_index()
+        dates = pd.DatetimeIndex(frame.index)
+        tz = str(dates.tz) if dates.tz is not None else None
+        if tz:
+            dates = dates.tz_convert("UTC").tz_localize(None)
+        columns = [c for c in COLUMNS if c in frame.columns]
+
+        index = dates.as_unit("ns").asi8
+        values = np.ascontiguousarray(frame[columns].to_numpy(dtype=np.float64))
+        meta = {
+            "columns": columns,
+            "tz": tz,
+            "coverage_start": coverage_start,
+            "fetched_at": time.time(),
+        }
+
+        # All files of a write go into a new version directory, then `CURRENT` is swapped to it in one
+        # `os.replace`: readers see either the old or the new version, never a mix, even after a crash.
+        # Concurrent writers of the same symbol (runs of `serve`) each write their own version.
+        version = f"v{time.time_ns()}-{os.getpid()}-{threading.get_ident()}"
+        version_dir = symbol_dir / version
+        version_dir.mkdir()
+        np.save(version_dir / "index.npy", index)
+        np.save(version_dir / "values.npy", values)
+        with open(version_dir / "meta.json", "w") as f:
+            json.dump(meta, f)
+
+        previous = self._current(symbol)
+        tmp = symbol_dir / f".CURRENT.{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp.write_text(version)
+        os.replace(tmp, symbol_dir / "CURRENT")
+        self._prune(symbol_dir, keep={version, previous.name if previous else None})
+
+    def _prune(self, symbol_dir: Path, keep: set):
+        """Delete replaced versions, keeping the one just replaced for readers that are still opening it."""
+        for name in ("index.npy", "values.npy", "meta.json"):
+            (symbol_dir / name).unlink(missing_ok=True)
+        cutoff = time.time() - VERSION_GRACE
+        for path in symbol_dir.glob("v*"):
+            # Young versions may still be being written by a concurrent writer
+            if path.name not in keep and path.is_dir() and path.stat().st_mtime < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _merge(self, stored: Optional[pd.DataFrame], fetched: pd.DataFrame) -> pd.DataFrame:
+        if stored is None or stored.empty:
+            return fetched
+        if stored.index.tz is not None and fetched.index.tz is not None:
+            fetched = fetched.tz_convert(stored.index.tz)
+        merged = pd.concat([stored, fetched[stored.columns.intersection(fetched.columns)]])
+        # Fresh bars win, the last stored bar may have been a partial intraday one.
+        return merged[~merged.index.duplicated(keep="last")].sort_index()
+
+    def _is_covered(self, meta: dict, stored: pd.DataFrame, period: str) -> bool:
+        coverage = meta.get("coverage_start")
+        if coverage == "max":
+            return True
+        if period == "max" or coverage is None:
+            return False
+
+        if is_trading_days_period(period):
+            return len(stored) >= int(period[:-1])
+        return date.fromisoformat(coverage) <= period_start(period, stored.index[-1].date())
+
+    def _write_period(
+        self, symbol: str, period: str, fetched: pd.DataFrame, meta: Optional[dict], stored: Optional[pd.DataFrame]
+    ):
+        """Store a whole-period download, merged with the stored bars when the two ranges overlap."""
+        start = period_start(period, fetched.index[-1].date())
+        if is_trading_days_period(period):
+            # `Nd` is a count of trading days, only the fetched bars themselves are known complete.
+            start = fetched.index[0].date()
+        coverage_start = "max" if start is None else start.isoformat()
+
+        if stored is None or stored.empty or stored.index[-1] < fetched.index[0]:
+            # Nothing stored, or a gap between the stored and the fetched bars: start over.
+            self.write(symbol, fetched, coverage_start)
+            return
+
+        previous = meta.get("coverage_start")
+        if "max" in (previous, coverage_start):
+            coverage_start = "max"
+        elif previous:
+            coverage_start = min(coverage_start, previous)
+        self.write(symbol, self._merge(stored, fetched), coverage_start)
+
+    def get(self, symbol: str, period: str = "5d") -> pd.DataFrame:
+        """
+        Return the daily bars of `symbol` for `period`, fetching only what the store is missing.
+
+        Args:
+            symbol (str): Stock ticker symbol, e.g. "AAPL".
+            period (str, optional): 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max. Defaults to "5d".
+
+        Returns:
+            pd.DataFrame: Bars indexed by `Date`.
+        """
+        meta, stored = self._load(symbol)
+
+        if meta and not stored.empty and self._is_covered(meta, stored, period):
+            coverage_start = meta["coverage_start"]
+            if time.time() - meta.get("fetched_at", 0) > self.refresh_ttl:
+                # Refetch from the last stored bar (inclusive) to pick up the trailing days.
+                last_day = stored.index[-1].date()
+                delta = self.fetch(symbol, start=last_day)
+                if not delta.empty:
+                    self.write(symbol, self._merge(stored, delta), coverage_start)
+                    stored = self.read(symbol)
+        else:
+            fetched = self.fetch(symbol, period=period)
+            if fetched.empty:
+                return fetched
+            self._write_period(symbol, period, fetched, meta, stored)
+            stored = self.read(symbol)
+
+        # Periods are counted back from the last bar, the same way a replayed recording is served.
+        return slice_period(stored, period, stored.index[-1].date())
+
+    def prefetch(self, symbols: List[str], period: str = "5d") -> List[str]:
+        """
+        Load many symbols into the store with one panel download, so later `get` calls are local.
+        Symbols already covered for `period` and fresh are skipped; covered but stale ones are
+        refreshed with a second panel download that only reaches back to their last stored bar.
+
+        Args:
+            symbols (List[str]): Stock ticker symbols.
+            period (str, optional): Period the store must cover. Defaults to "5d".
+
+        Returns:
+            List[str]: The symbols that were downloaded.
+        """
+        missing, stale = [], {}
+        for symbol in symbols:
+            meta, stored = self._load(symbol)
+            if not (meta and not stored.empty and self._is_covered(meta, stored, period)):
+                missing.append(symbol)
+            elif time.time() - meta.get("fetched_at", 0) > self.refresh_ttl:
+                # Covered but old: like `get`, only the days since the last stored bar are downloaded
+                stale[symbol] = stored.index[-1].date()
+
+        if missing:
+            panel = self.fetch_many(missing, period)
+            for symbol in missing:
+                fetched = _symbol_bars(panel, symbol)
+                if not fetched.empty:
+                    self._write_period(symbol, period, fetched, *self._load(symbol))
+
+        if stale:
+            panel = self.fetch_many(list(stale), delta_period(min(stale.values())))
+            for symbol in stale:
+                delta = _symbol_bars(panel, symbol)
+                meta, stored = self._load(symbol)
+                if not delta.empty:
+                    self.write(symbol, self._merge(stored, delta), meta["coverage_start"])
+        return missing + list(stale)
+
+    def panel(self, symbols: List[str], period: str = "5d") -> pd.DataFrame:
+        """
+        Assemble a multi-symbol panel from the store, shaped like a `yf.download` result.
+
+        Args:
+            symbols (List[str]): Stock ticker symbols.
+            period (str, optional): Period for which to return data. Defaults to "5d".
+
+        Returns:
+            pd.DataFrame: Panel with (field, symbol) columns, e.g. `panel["Close"]["AAPL"]`. Symbols without
+                any bars are left out.
+        """
+        frames = {symbol: self.get(symbol, period) for symbol in symbols}
+        frames = {symbol: frame for symbol, frame in frames.items() if not frame.empty}
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, axis=1).swaplevel(axis=1).sort_index(axis=1)
+
+
+# Create a default instance for import
+market_store = MarketDataStore(os.path.join(config.DATA_DIR, "store"))
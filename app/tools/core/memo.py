@@ -0,0 +1,100 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from app import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS memo (
+    node TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    day TEXT NOT NULL,
+    period TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (node, symbol, day, period)
+)
+"""
+
+
+class NodeMemo:
+    """
+    Same-day memo of node results, keyed by (node, symbol, trading day, period).
+
+    A node that computed something for a symbol stores its state update here, and a rerun on the
+    same trading day reuses it instead of downloading, generating or running code again. Values
+    are JSON; artifact refs in them are only reused while the artifact file still exists.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): SQLite file, shared with the run checkpoints.
+        """
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Nodes of the parallel graph run on other threads, access is serialized by `_lock`.
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(SCHEMA)
+        return self._conn
+
+    def get(self, node: str, symbol: str, day: str, period: str) -> Optional[dict]:
+        """
+        Return the memoized update of `node` for the key, None on a miss.
+
+        Args:
+            node (str): Node name, e.g. "generate_analysis_node".
+            symbol (str): Stock symbol.
+            day (str): Trading day, "YYYY-MM-DD".
+            period (str): Analysis period, e.g. "5d".
+
+        Returns:
+            Optional[dict]: The stored value.
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value FROM memo WHERE node = ? AND symbol = ? AND day = ? AND period = ?",
+                (node, symbol, day, str(period)),
+            ).fetchone()
+        if row is None:
+            return None
+
+        value = json.loads(row[0])
+        for item in value.values():
+            # A pruned artifact cannot be reused, recompute it.
+            if isinstance(item, dict) and "path" in item and not os.path.exists(item["path"]):
+                return None
+        return value
+
+    def put(self, node: str, symbol: str, day: str, period: str, value: dict):
+        """Store the update of `node` for the key, replacing an earlier one."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO memo VALUES (?, ?, ?, ?, ?, ?)",
+                (node, symbol, day, str(period), json.dumps(value), time.time()),
+            )
+            conn.commit()
+
+    def clear(self, before_day: Optional[str] = None) -> int:
+        """Delete every entry, or those of trading days before `before_day`. Returns the number deleted."""
+        with self._lock:
+            conn = self._connect()
+            if before_day is None:
+                deleted = conn.execute("DELETE FROM memo").rowcount
+            else:
+                deleted = conn.execute("DELETE FROM memo WHERE day < ?", (before_day,)).rowcount
+            conn.commit()
+        return deleted
+
+
+# Create a default instance for import
+node_memo = NodeMemo(os.path.join(config.DATA_DIR, "checkpoints.sqlite"))
@@ -0,0 +1,151 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from app.tools.core.providers import get_provider
+
+# Articles kept per symbol, older ones fall out when new ones arrive
+MAX_ITEMS = 100
+
+
+def _provider_news(symbol: str) -> list:
+    return get_provider().news(symbol)
+
+
+def _published(item: dict) -> float:
+    """Publish time of a news item as unix seconds, 0 if unknown."""
+    content = item.get("content") or {}
+    published = content.get("pubDate") or content.get("displayTime") or item.get("providerPublishTime")
+    if isinstance(published, (int, float)):
+        return float(published)
+    if isinstance(published, str):
+        try:
+            return datetime.fromisoformat(published.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            return 0.0
+    return 0.0
+
+
+def _item_id(item: dict) -> Optional[str]:
+    return item.get("id") or item.get("uuid") or (item.get("content") or {}).get("id")
+
+
+class NewsService:
+    """
+    Per-symbol news cache in front of the market data provider.
+
+    A symbol is fetched at most once per `ttl`: concurrent callers for the same symbol wait for
+    the one fetch in flight, later callers are served from memory. Fetched items are merged with
+    the cached ones by article id and kept newest first. `get_many` fetches the symbols that are
+    not cached concurrently, on a bounded thread pool.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 15 * 60,
+        max_workers: int = 8,
+        fetch: Callable[[str], list] = _provider_news,
+    ):
+        """
+        Args:
+            ttl (float, optional): Seconds a symbol's news are served without refetching. Defaults to 15 minutes.
+            max_workers (int, optional): Concurrent fetches in `get_many`. Defaults to 8.
+            fetch (Callable, optional): `fetch(symbol) -> news items`. Defaults to the active market data provider.
+        """
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self.fetch = fetch
+
+        self._items: Dict[str, List[dict]] = {}
+        self._fetched_at: Dict[str, float] = {}
+        self._symbol_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _symbol_lock(self, symbol: str) -> threading.Lock:
+        with self._lock:
+            return self._symbol_locks.setdefault(symbol, threading.Lock())
+
+    def _is_fresh(self, symbol: str) -> bool:
+        return time.monotonic() - self._fetched_at.get(symbol, float("-inf")) <= self.ttl
+
+    def _merge(self, symbol: str, fetched: list):
+        merged, seen = [], set()
+        for item in list(fetched) + self._items.get(symbol, []):
+            item_id = _item_id(item)
+            if item_id is not None:
+                if item_id in seen:
+                    continue
+                seen.add(item_id)
+            merged.append(item)
+        # Stable sort: items without a publish time keep the provider's order
+        merged.sort(key=_published, reverse=True)
+        self._items[symbol] = merged[:MAX_ITEMS]
+
+    def _refresh(self, symbol: str) -> List[dict]:
+        with self._symbol_lock(symbol):
+            # Another caller may have fetched it while this one waited for the lock.
+            if not self._is_fresh(symbol):
+                fetched = self.fetch(symbol) or []
+                with self._lock:
+                    self._merge(symbol, fetched)
+                    self._fetched_at[symbol] = time.monotonic()
+        with self._lock:
+            return self._items.get(symbol, [])
+
+    def get(self, symbol: str, last_n: int = 5) -> List[dict]:
+        """
+        Return the `last_n` most recent news items of `symbol`, newest first.
+
+        Args:
+            symbol (str): Stock ticker symbol, e.g. "AAPL".
+            last_n (int, optional): Number of items. Defaults to 5.
+
+        Returns:
+            List[dict]: News items, empty if none were found.
+        """
+        if self._is_fresh(symbol):
+            with self._lock:
+                return self._items.get(symbol, [])[:last_n]
+        return self._refresh(symbol)[:last_n]
+
+    def get_many(self, symbols: List[str], last_n: int = 5) -> Dict[str, List[dict]]:
+        """
+        Return the news of many symbols, fetching the stale ones concurrently.
+
+        Args:
+            symbols (List[str]): Stock ticker symbols.
+            last_n (int, optional): Number of items per symbol. Defaults to 5.
+
+        Returns:
+            Dict[str, List[dict]]: symbol -> news items, newest first. A symbol whose fetch failed maps to [].
+        """
+        stale = [symbol for symbol in dict.fromkeys(symbols) if not self._is_fresh(symbol)]
+        if stale:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="news")
+            futures = {symbol: self._executor.submit(self._refresh, symbol) for symbol in stale}
+            for symbol, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    # One failing symbol should not fail the batch, it is retried on the next call.
+                    print(f"Failed to fetch news for {symbol}: {e}")
+
+        with self._lock:
+            return {symbol: self._items.get(symbol, [])[:last_n] for symbol in symbols}
+
+    def invalidate(self, symbol: Optional[str] = None):
+        """Force the next call to refetch `symbol`, or every symbol."""
+        with self._lock:
+            if symbol is None:
+                self._fetched_at.clear()
+            else:
+                self._fetched_at.pop(symbol, None)
+
+
+# Create a default instance for import
+news_service = NewsService()
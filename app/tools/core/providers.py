@@ -0,0 +1,275 @@
+import json
+import os
+import re
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+import pandas as pd
+
+from app import config
+from app.tools.core.spans import span
+
+_PERIOD_RE = re.compile(r"^(\d+)(d|wk|mo|y)$")
+
+
+def period_start(period: str, today: Optional[date] = None) -> Optional[date]:
+    """
+    Translate a yfinance `period` into the first calendar day it covers.
+
+    Args:
+        period (str): 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max.
+        today (date, optional): Reference day. Defaults to today.
+
+    Returns:
+        Optional[date]: First calendar day of the period, None for `max`.
+    """
+    today = today or date.today()
+    if period == "max":
+        return None
+    if period == "ytd":
+        return date(today.year, 1, 1)
+
+    match = _PERIOD_RE.match(period)
+    if not match:
+        raise ValueError(f"Unsupported period: {period}")
+    n, unit = int(match.group(1)), match.group(2)
+    if unit == "d":
+        # `Nd` means N trading days, leave room for weekends and holidays.
+        return today - timedelta(days=n * 7 // 5 + 4)
+    if unit == "wk":
+        return today - timedelta(weeks=n)
+    if unit == "mo":
+        return (pd.Timestamp(today) - pd.DateOffset(months=n)).date()
+    return (pd.Timestamp(today) - pd.DateOffset(years=n)).date()
+
+
+def is_trading_days_period(period: str) -> bool:
+    """`Nd` periods count trading days (rows), every other period is a calendar range."""
+    match = _PERIOD_RE.match(period)
+    return bool(match) and match.group(2) == "d"
+
+
+def slice_period(frame: pd.DataFrame, period: str, today: Optional[date] = None) -> pd.DataFrame:
+    """Keep the rows of a daily frame that fall in `period`, counted back from `today`."""
+    if is_trading_days_period(period):
+        return frame.tail(int(period[:-1]))
+    start = period_start(period, today)
+    if start is None:
+        return frame
+    return frame[frame.index.date >= start]
+
+
+class MarketDataProvider:
+    """
+    Interface every market data access goes through.
+
+    Implementations return data shaped like yfinance does: daily bars indexed by `Date`, panels
+    with (field, symbol) columns, and news as a list of dicts with an `id` and a `content`.
+    """
+
+    def download(self, tickers: List[str], period: str) -> pd.DataFrame:
+        """Daily bars of many symbols as a (field, symbol) panel."""
+        raise NotImplementedError
+
+    def history(self, symbol: str, period: Optional[str] = None, start: Optional[date] = None) -> pd.DataFrame:
+        """Daily bars of one symbol, either a whole `period` or everything since `start`."""
+        raise NotImplementedError
+
+    def news(self, symbol: str) -> list:
+        """Recent news items of one symbol."""
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    """
+    Live data from Yahoo Finance, every request goes through one shared, pooled HTTP session.
+
+    yfinance and curl_cffi are imported on the first request, replayed runs never load them.
+    """
+
+    def __init__(self, session=None):
+        self._session = session
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                from curl_cffi import requests
+
+                # yfinance requires a curl_cffi session, it keeps connections alive between requests.
+                self._session = requests.Session(impersonate="chrome")
+            return self._session
+
+    def download(self, tickers: List[str], period: str) -> pd.DataFrame:
+        import yfinance as yf
+
+        with span("yfinance.download", symbols=len(tickers), period=period):
+            return yf.download(
+                tickers,
+                period=period,
+                auto_adjust=True,
+                actions=True,
+                threads=True,
+                progress=False,
+                session=self.session,
+            )
+
+    def history(self, symbol: str, period: Optional[str] = None, start: Optional[date] = None) -> pd.DataFrame:
+        import yfinance as yf
+
+        ticker = yf.Ticker(symbol, session=self.session)
+        with span("yfinance.history", symbol=symbol):
+            if start is not None:
+                return ticker.history(start=start.isoformat(), auto_adjust=True)
+            return ticker.history(period=period, auto_adjust=True)
+
+    def news(self, symbol: str) -> list:
+        import yfinance as yf
+
+        with span("yfinance.news", symbol=symbol):
+            return yf.Ticker(symbol, session=self.session).news
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Serves recorded data from disk, for offline benchmarks, load tests and deterministic tests.
+
+    Layout of `root`:
+      - `history/<SYMBOL>.csv`: daily bars, index column `Date`
+      - `news/<SYMBOL>.json`: list of news items
+
+    Periods are counted back from `as_of`, which defaults to the last recorded day, so a
+    recording replays the same way on any day.
+    """
+
+    def __init__(self, root: str, as_of: Optional[date] = None):
+        self.root = Path(root)
+        self.as_of = as_of
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def _frame(self, symbol: str) -> pd.DataFrame:
+        with self._lock:
+            if symbol not in self._frames:
+                path = self.root / "history" / f"{symbol}.csv"
+                if path.is_file():
+                    frame = pd.read_csv(path, index_col="Date")
+                    frame.index = pd.to_datetime(frame.index, utc=True).tz_convert("America/New_York")
+                    frame.index.name = "Date"
+                else:
+                    frame = pd.DataFrame(index=pd.DatetimeIndex([], name="Date", tz="America/New_York"))
+                if self.as_of is not None:
+                    frame = frame[frame.index.date <= self.as_of]
+                self._frames[symbol] = frame
+            return self._frames[symbol]
+
+    def _today(self, frames: List[pd.DataFrame]) -> date:
+        if self.as_of is not None:
+            return self.as_of
+        last_days = [frame.index[-1].date() for frame in frames if not frame.empty]
+        return max(last_days) if last_days else date.today()
+
+    def download(self, tickers: List[str], period: str) -> pd.DataFrame:
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        frames = [self._frame(symbol) for symbol in tickers]
+        today = self._today(frames)
+        panel = pd.concat({symbol: frame for symbol, frame in zip(tickers, frames)}, axis=1)
+        panel = panel.swaplevel(axis=1).sort_index(axis=1)
+        return slice_period(panel, period, today)
+
+    def history(self, symbol: str, period: Optional[str] = None, start: Optional[date] = None) -> pd.DataFrame:
+        frame = self._frame(symbol)
+        if start is not None:
+            return frame[frame.index.date >= start]
+        return slice_period(frame, period, self._today([frame]))
+
+    def news(self, symbol: str) -> list:
+        path = self.root / "news" / f"{symbol}.json"
+        if not path.is_file():
+            return []
+        with open(path, "r") as f:
+            return json.load(f)
+
+
+class RecordingProvider(MarketDataProvider):
+    """Passes calls through to another provider and records what it returns in `ReplayProvider` layout."""
+
+    def __init__(self, provider: MarketDataProvider, root: str):
+        self.provider = provider
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    def _record_history(self, symbol: str, frame: pd.DataFrame):
+        if frame.empty:
+            return
+        path = self.root / "history" / f"{symbol}.csv"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            if path.is_file():
+                recorded = pd.read_csv(path, index_col="Date")
+                recorded.index = pd.to_datetime(recorded.index, utc=True).tz_convert(frame.index.tz or "UTC")
+                frame = pd.concat([recorded, frame])
+                frame = frame[~frame.index.duplicated(keep="last")].sort_index()
+            frame.rename_axis("Date").to_csv(path)
+
+    def download(self, tickers: List[str], period: str) -> pd.DataFrame:
+        panel = self.provider.download(tickers, period)
+        for symbol in panel.columns.get_level_values(1).unique():
+            self._record_history(symbol, panel.xs(symbol, axis=1, level=1).dropna(how="all"))
+        return panel
+
+    def history(self, symbol: str, period: Optional[str] = None, start: Optional[date] = None) -> pd.DataFrame:
+        frame = self.provider.history(symbol, period=period, start=start)
+        self._record_history(symbol, frame)
+        return frame
+
+    def news(self, symbol: str) -> list:
+        news = self.provider.news(symbol)
+        path = self.root / "news" / f"{symbol}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(news, f)
+        return news
+
+
+def create_provider(spec: str) -> MarketDataProvider:
+    """
+    Create a provider from its spec.
+
+    Args:
+        spec (str): `yfinance`, `replay:<dir>` or `record:<dir>` (yfinance, recorded into <dir>).
+
+    Returns:
+        MarketDataProvider: the provider
+    """
+    name, _, path = spec.partition(":")
+    if name == "yfinance":
+        return YFinanceProvider()
+    if name == "replay":
+        return ReplayProvider(path)
+    if name == "record":
+        return RecordingProvider(YFinanceProvider(), path)
+    raise ValueError(f"Unknown market data provider: {spec}")
+
+
+_provider: Optional[MarketDataProvider] = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> MarketDataProvider:
+    """Return the active provider, `MARKET_DATA_PROVIDER` env var first, then `market_data_provider` in config."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = create_provider(os.environ.get("MARKET_DATA_PROVIDER", config.MARKET_DATA_PROVIDER))
+        return _provider
+
+
+def set_provider(provider: MarketDataProvider):
+    """Replace the active provider, e.g. with a `ReplayProvider` in tests and benchmarks."""
+    global _provider
+    with _provider_lock:
+        _provider = provider
@@ -0,0 +1,179 @@
+"""
+Cross-sectional screens over a universe panel.
+
+A screen maps a panel (`yf.download` shape, (field, symbol) columns) to a score per day and symbol
+with column-wise pandas operations, so every symbol and every day is scored in one vectorized pass:
+the last row ranks today, the whole matrix is what `app/tools/core/backtest.py` replays. Screens compose:
+
+    breakout = SCREENS["near_52w_high"].zscore() + 0.5 * SCREENS["volume_spike"].zscore()
+
+and composites can be named in config.json, as weights of the built-in screens:
+
+    "screens": {"breakout": {"near_52w_high": 1.0, "volume_spike": 0.5}}
+
+The panel is downloaded once, over the longest lookback of the screen.
+"""
+
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from app import config
+
+# Standard download periods and the trading days they cover at least
+_PERIODS = (("2d", 2), ("5d", 5), ("1mo", 19), ("3mo", 60), ("6mo", 123), ("1y", 250), ("2y", 500))
+
+
+class Screen:
+    """A named ranking expression: `screen(panel)` scores every symbol as of the last day, higher ranks first."""
+
+    def __init__(self, name: str, score: Callable[[pd.DataFrame], pd.DataFrame], lookback: int = 2):
+        """
+        Args:
+            name (str): Screen name, reported with its results.
+            score (Callable): `score(panel) -> DataFrame` of scores indexed like the panel, one column per symbol.
+                Row t may only read the bars up to day t.
+            lookback (int, optional): Trading days of bars the score of one day reads. Defaults to 2.
+        """
+        self.name = name
+        self.score = score
+        self.lookback = lookback
+
+    def scores(self, panel: pd.DataFrame) -> pd.DataFrame:
+        """Score of every symbol on every day of `panel`, NaN until the lookback is covered."""
+        return self.score(panel).replace([np.inf, -np.inf], np.nan)
+
+    def __call__(self, panel: pd.DataFrame) -> pd.Series:
+        return self.scores(panel).iloc[-1]
+
+    def __add__(self, other: "Screen") -> "Screen":
+        return Screen(
+            f"{self.name} + {other.name}",
+            lambda panel: self.scores(panel) + other.scores(panel),
+            max(self.lookback, other.lookback),
+        )
+
+    def __mul__(self, weight: float) -> "Screen":
+        return Screen(f"{weight:g} * {self.name}", lambda panel: self.scores(panel) * weight, self.lookback)
+
+    __rmul__ = __mul__
+
+    def __neg__(self) -> "Screen":
+        return Screen(f"-{self.name}", lambda panel: -self.scores(panel), self.lookback)
+
+    def zscore(self) -> "Screen":
+        """Standardized across the universe each day, so screens of different scales can be added."""
+
+        def score(panel: pd.DataFrame) -> pd.DataFrame:
+            values = self.scores(panel)
+            return values.sub(values.mean(axis=1), axis=0).div(values.std(axis=1), axis=0)
+
+        return Screen(f"z({self.name})", score, self.lookback)
+
+    def rank(self) -> "Screen":
+        """Percentile rank across the universe each day, in (0, 1]."""
+        return Screen(f"rank({self.name})", lambda panel: self.scores(panel).rank(axis=1, pct=True), self.lookback)
+
+
+# === Built-in screens ===
+def _daily_return(panel: pd.DataFrame) -> pd.DataFrame:
+    close = panel["Close"]
+    return close / close.shift() - 1
+
+
+def _volume_spike(panel: pd.DataFrame) -> pd.DataFrame:
+    volume = panel["Volume"]
+    return volume / volume.shift().rolling(20).mean()
+
+
+def _gap_up(panel: pd.DataFrame) -> pd.DataFrame:
+    return panel["Open"] / panel["Close"].shift() - 1
+
+
+def _return_zscore(panel: pd.DataFrame) -> pd.DataFrame:
+    returns = _daily_return(panel)
+    history = returns.shift().rolling(20)
+    return (returns - history.mean()) / history.std()
+
+
+def _near_52w_high(panel: pd.DataFrame) -> pd.DataFrame:
+    return panel["Close"] / panel["High"].rolling(252, min_periods=1).max()
+
+
+SCREENS: Dict[str, Screen] = {
+    # Last-day percent change, what `get_top_nasdaq_gainer` always ranked by
+    "gainers": Screen("gainers", _daily_return, lookback=2),
+    "losers": Screen("losers", lambda panel: -_daily_return(panel), lookback=2),
+    # Last-day volume over the 20-day average volume
+    "volume_spike": Screen("volume_spike", _volume_spike, lookback=21),
+    # Open over the prior close
+    "gap_up": Screen("gap_up", _gap_up, lookback=2),
+    # Last-day return in standard deviations of the 20 days before
+    "return_zscore": Screen("return_zscore", _return_zscore, lookback=21),
+    # Close over the 52-week high, 1 at a new high
+    "near_52w_high": Screen("near_52w_high", _near_52w_high, lookback=250),
+}
+
+
+def get_screen(name: str) -> Screen:
+    """
+    Look up a screen by name: a built-in one, or a weighted composite from `screens` in config.json.
+
+    Raises:
+        ValueError: If no screen has that name.
+    """
+    if name in SCREENS:
+        return SCREENS[name]
+    weights = config.SCREENS.get(name)
+    if not weights:
+        raise ValueError(f"Unknown screen {name!r}, expected one of {sorted(SCREENS) + sorted(config.SCREENS)}")
+
+    terms = [weight * get_screen(part).zscore() for part, weight in weights.items()]
+    composite = sum(terms[1:], terms[0])
+    return Screen(name, composite.scores, composite.lookback)
+
+
+def lookback_period(days: int) -> str:
+    """Shortest standard download period covering `days` trading days."""
+    for period, covered in _PERIODS:
+        if covered >= days:
+            return period
+    return "max"
+
+
+def rank(screen: Screen, panel: pd.DataFrame, top_k: int = 5) -> List[dict]:
+    """
+    Score every symbol of `panel` and return the best `top_k`.
+
+    Args:
+        screen (Screen): The ranking expression.
+        panel (pd.DataFrame): Panel with (field, symbol) columns, covering `screen.lookback` days.
+        top_k (int, optional): Number of symbols returned. Defaults to 5.
+
+    Returns:
+        List[dict]: [{
+            "symbol": str,
+            "score": float,    # Screen score, rounded to 4 decimals
+            "rank": int,       # 1 for the best
+            "pct": str,        # Last-day percent change, formatted to 2 decimals
+            "day": str,        # Day of the last bar, ISO format
+            "screen": str,     # Screen name
+        }]
+    """
+    panel = panel.dropna(how="all")
+    scores = screen(panel).dropna().nlargest(top_k)
+    pct = _daily_return(panel).iloc[-1]
+    day = panel.index[-1]
+    day = day.date().isoformat() if hasattr(day, "date") else str(day)
+    return [
+        {
+            "symbol": symbol,
+            "score": round(float(score), 4),
+            "rank": position,
+            "pct": f"{pct[symbol]:.2f}",
+            "day": day,
+            "screen": screen.name,
+        }
+        for position, (symbol, score) in enumerate(scores.items(), start=1)
+    ]
@@ -0,0 +1,39 @@
+"""
+Timed spans around external calls (market data, the code sandbox, SMTP).
+
+Kept free of heavy imports: the sandbox zygote imports `code_execution`, which uses `span`. Spans
+are recorded on the tracer made active by `app.tracing.RunTracer.activate`, and are no-ops otherwise.
+"""
+
+import contextlib
+import contextvars
+import time
+from typing import Iterator
+
+# Anything with a `record(kind, **fields)` method, normally an `app.tracing.RunTracer`
+active_tracer: contextvars.ContextVar = contextvars.ContextVar("active_tracer", default=None)
+
+
+@contextlib.contextmanager
+def span(name: str, **attrs) -> Iterator[None]:
+    """
+    Time a block and record it on the active tracer, a no-op when no run is being traced.
+
+    Args:
+        name (str): Span name, e.g. "yfinance.download".
+        **attrs: Extra JSON-serializable fields stored with the span, e.g. `symbol="AAPL"`.
+    """
+    tracer = active_tracer.get()
+    if tracer is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        tracer.record("span", name=name, ms=(time.perf_counter() - start) * 1000, status=status, **attrs)
@@ -1,52 +1,105 @@
 from typing import List, Optional
-from langchain.tools import tool
-from pathlib import Path
-import yfinance as yf
 import pandas as pd
 from app import config
+from app.tools.core.gainer_tracker import get_active_tracker
+from app.tools.core.market_store import market_store
+from app.tools.core.news import news_service
+from app.tools.core.providers import get_provider
+from app.tools.core.screener import get_screen, lookback_period, rank
+from app.tools.core.universe import universe_manager
 
 # tickers = ["AAPL", "MSFT", "NVDA", "GOOGL", "AMZN", "TSLA", "META"]  # example subset
 
 
-def get_top_nasdaq_gainer() -> dict:
+def get_top_nasdaq_gainer(universe: Optional[str] = None, screen: Optional[str] = None) -> dict:
     """
-    Get the NASDAQ stock with the highest percentage gain today.
+    Get the NASDAQ stock ranked first by a screen, by default the highest percentage gain today.
+    The gainer is answered instantly from the live tracker when `main.py track` is running one.
+
+    Args:
+        universe (str, optional): Symbol universe to pick from. Defaults to `universe` in config,
+            which is the one the live tracker follows.
+        screen (str, optional): Screen to rank by, see `app/tools/core/screener.py`. Defaults to `screen` in config.
 
     Returns:
         dict: {
-            "symbol": str,     # Stock symbol with highest gain
+            "symbol": str,     # Stock symbol ranked first
             "pct": str,        # Percentage gain as string formatted to 2 decimals
             "day": str         # Date string in ISO format (YYYY-MM-DD)
         }
     """
-    if config.STOCK_SYMBOLS:
-        # Get NASDAQ-100 symbols from Wikipedia
-        url = "https://en.wikipedia.org/wiki/NASDAQ-100"
-        tables = pd.read_html(url)
-        df = tables[4]  # The 5th table contains the companies list
-        nasdaq_100_symbols = df["Ticker"].tolist()
-        tickers = nasdaq_100_symbols
-    else:
-        tickers = config.STOCK_SYMBOLS
-
-    data = yf.download(tickers, period="2d", threads=True, progress=False)
-    pct = data["Close"].pct_change()
-    pct.columns = pd.MultiIndex.from_product([["pct"], pct.columns])
-    data = pd.concat([data, pct], axis=1)
-    top_stock_symbol = data["pct"].iloc[-1].idxmax()
-    top_stock_gain = data["pct"].iloc[-1].max()
-    day = data["pct"].iloc[-1].name
+    screen = screen or config.SCREEN
+    tracker = get_active_tracker()
+    top = tracker.leader if tracker and universe is None and screen == "gainers" else None
+    if top is None:
+        top = get_top_nasdaq_movers(top_n=1, universe=universe, screen=screen)[0]
 
     return {
-        "symbol": top_stock_symbol,
-        "pct": f"{top_stock_gain:.2f}",
-        "day": day.isoformat(),
+        "symbol": top["symbol"],
+        "pct": top["pct"],
+        "day": top["day"],
     }
 
 
+def get_top_nasdaq_movers(
+    top_n: int = 5, direction: str = "gainers", universe: Optional[str] = None, screen: Optional[str] = None
+) -> List[dict]:
+    """
+    Get the NASDAQ stocks with the largest percentage move today, or ranked first by a screen,
+    from a single panel download.
+
+    Args:
+        top_n (int, optional): Number of stocks per direction. Defaults to 5.
+        direction (str, optional): "gainers", "losers" or "both". Defaults to "gainers".
+        universe (str, optional): Symbol universe to pick from. Defaults to `universe` in config.
+        screen (str, optional): Rank by this screen instead of `direction`, see `app/tools/core/screener.py`.
+
+    Returns:
+        List[dict]: [{
+            "symbol": str,     # Stock symbol
+            "pct": str,        # Percentage change as string formatted to 2 decimals
+            "day": str,        # Date string in ISO format (YYYY-MM-DD)
+            "direction": str,  # "gainers", "losers" or the screen name
+            "score": float,    # Screen score
+            "rank": int,       # Rank within its direction
+            "screen": str      # Screen name
+        }], gainers first, each direction ordered by the size of the move
+    """
+    if screen:
+        screens = [get_screen(screen)]
+    elif direction in ("gainers", "losers", "both"):
+        screens = [get_screen(side) for side in ("gainers", "losers") if direction in (side, "both")]
+    else:
+        raise ValueError(f"Unsupported direction: {direction}")
+
+    # Served from memory, a stale list is refreshed in the background
+    tickers = universe_manager.get(universe or config.UNIVERSE)
+
+    # One download covers every screen
+    data = get_universe_panel(tickers, period=lookback_period(max(s.lookback for s in screens)))
+
+    return [dict(mover, direction=s.name) for s in screens for mover in rank(s, data, top_n)]
+
+
+def get_universe_panel(tickers: List[str], period: str = "2d") -> pd.DataFrame:
+    """
+    Download daily bars for many symbols in one request.
+
+    Args:
+        tickers (List[str]): Stock ticker symbols.
+        period (str, optional): Period for which to fetch data. Defaults to "2d".
+
+    Returns:
+        pd.DataFrame: Panel with (field, symbol) columns, e.g. `panel["Close"]["AAPL"]`.
+    """
+    return get_provider().download(tickers, period)
+
+
 def get_stock_data(symbol: str, period: str = "5d") -> pd.DataFrame:
     """
     Fetch stock data for the given symbol and period.
+    Bars are served from the local market data store, only the missing trailing days are downloaded.
+
     Args:
         symbol (str): Stock ticker symbol, e.g. "AAPL".
         period (str, optional): Period for which to fetch data. Defaults to "5d".
@@ -54,7 +107,7 @@ def get_stock_data(symbol: str, period: str = "5d") -> pd.DataFrame:
         pd.DataFrame: DataFrame containing stock data.
     """
 
-    data = yf.Ticker(symbol).history(period=period)
+    data = market_store.get(symbol, period)
 
     return data
 
@@ -62,13 +115,13 @@ def get_stock_data(symbol: str, period: str = "5d") -> pd.DataFrame:
 def get_stock_news(symbol: str, last_n_news: int = 5) -> list:
     """
     Fetch recent news headlines for the given stock symbol.
+    Served from the news cache, a symbol is fetched at most once per cache TTL.
 
     Args:
         symbol (str): Stock ticker symbol, e.g. "AAPL".
         last_n_news (int, optional): Number of recent news articles to retrieve. Defaults to 5.
 
     Returns:
-        list: List of news items (dictionaries). Empty list if no news found.
+        list: List of news items (dictionaries), newest first. Empty list if no news found.
     """
-    ticker = yf.Ticker(symbol)
-    return ticker.news[-last_n_news:-1]
+    return news_service.get(symbol, last_n_news)
@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+import time
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from app import config
+
+# Universes scraped from Wikipedia: page and the column holding the symbols in the constituents table
+WIKIPEDIA_UNIVERSES = {
+    "nasdaq100": ("https://en.wikipedia.org/wiki/NASDAQ-100", "Ticker"),
+    "sp500": ("https://en.wikipedia.org/wiki/List_of_S%26P_500_companies", "Symbol"),
+}
+
+
+def scrape_wikipedia_universe(name: str) -> List[str]:
+    """
+    Scrape the constituents of a universe listed in `WIKIPEDIA_UNIVERSES`.
+
+    Args:
+        name (str): Universe name, e.g. "nasdaq100".
+
+    Returns:
+        List[str]: Stock symbols.
+    """
+    url, column = WIKIPEDIA_UNIVERSES[name]
+    for table in pd.read_html(url):
+        if column in table.columns:
+            # Yahoo spells class shares with a dash, e.g. BRK-B
+            return [str(symbol).replace(".", "-") for symbol in table[column].tolist()]
+    raise RuntimeError(f"No constituents table with a `{column}` column in {url}")
+
+
+class UniverseManager:
+    """
+    Named symbol universes, served from memory and refreshed off the hot path.
+
+    Every refresh writes a dated snapshot to `<root>/<name>/<YYYY-MM-DD>.json`. `get` returns the
+    in-memory list (loaded once from the latest snapshot, or from a seed list), and when that list
+    is older than `ttl` it starts a background refresh instead of waiting for it. `get(as_of=...)`
+    returns the snapshot that was current on that day, so historical runs use historical
+    constituents. Custom universes are fixed lists and are never refreshed.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        ttl: float = 24 * 3600,
+        custom: Optional[Dict[str, List[str]]] = None,
+        seeds: Optional[Dict[str, List[str]]] = None,
+        scrape: Callable[[str], List[str]] = scrape_wikipedia_universe,
+    ):
+        """
+        Args:
+            root (str): Snapshot directory.
+            ttl (float, optional): Seconds before a universe is refreshed. Defaults to one day.
+            custom (Dict[str, List[str]], optional): Fixed universes, name -> symbols.
+            seeds (Dict[str, List[str]], optional): Lists used until the first snapshot exists.
+            scrape (Callable, optional): `scrape(name) -> symbols`. Defaults to Wikipedia.
+        """
+        self.root = Path(root)
+        self.ttl = ttl
+        self.custom = custom or {}
+        self.seeds = seeds or {}
+        self.scrape = scrape
+
+        self._current: Dict[str, dict] = {}
+        self._refreshing: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def names(self) -> List[str]:
+        return sorted(set(WIKIPEDIA_UNIVERSES) | set(self.custom))
+
+    def snapshots(self, name: str) -> List[date]:
+        """Days with a stored snapshot of `name`, oldest first."""
+        directory = self.root / name
+        if not directory.is_dir():
+            return []
+        return sorted(date.fromisoformat(path.stem) for path in directory.glob("*.json"))
+
+    def _read_snapshot(self, name: str, day: date) -> dict:
+        with open(self.root / name / f"{day.isoformat()}.json", "r") as f:
+            return json.load(f)
+
+    def _write_snapshot(self, name: str, symbols: List[str]) -> dict:
+        snapshot = {"name": name, "date": date.today().isoformat(), "fetched_at": time.time(), "symbols": symbols}
+        directory = self.root / name
+        directory.mkdir(parents=True, exist_ok=True)
+        tmp = directory / ".snapshot.tmp"
+        with open(tmp, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, directory / f"{snapshot['date']}.json")
+        return snapshot
+
+    def refresh(self, name: str) -> List[str]:
+        """Scrape `name` now and store a snapshot for today."""
+        snapshot = self._write_snapshot(name, self.scrape(name))
+        with self._lock:
+            self._current[name] = snapshot
+        return snapshot["symbols"]
+
+    def refresh_in_background(self, name: str):
+        """Start a refresh of `name` in a daemon thread, unless one is already running."""
+        with self._lock:
+            running = self._refreshing.get(name)
+            if running is not None and running.is_alive():
+                return
+            thread = threading.Thread(target=self._refresh_quietly, args=(name,), daemon=True)
+            self._refreshing[name] = thread
+        thread.start()
+
+    def _refresh_quietly(self, name: str):
+        try:
+            self.refresh(name)
+        except Exception as e:
+            # Keep serving the previous list, the next `get` after the TTL tries again.
+            print(f"Failed to refresh universe {name}: {e}")
+
+    def _load_current(self, name: str) -> Optional[dict]:
+        days = self.snapshots(name)
+        if days:
+            return self._read_snapshot(name, days[-1])
+        if name in self.seeds:
+            # Seeds count as stale, so the first `get` also schedules a refresh.
+            return {"name": name, "date": None, "fetched_at": 0, "symbols": self.seeds[name]}
+        return None
+
+    def get(self, name: str = "nasdaq100", as_of: Optional[date] = None) -> List[str]:
+        """
+        Return the symbols of a universe.
+
+        Args:
+            name (str, optional): "nasdaq100", "sp500" or a custom universe. Defaults to "nasdaq100".
+            as_of (date, optional): Return the constituents as of this day, from the latest snapshot
+                taken on or before it (the oldest snapshot if there is none). Defaults to now.
+
+        Returns:
+            List[str]: Stock symbols.
+        """
+        if name in self.custom:
+            return self.custom[name]
+        if name not in WIKIPEDIA_UNIVERSES:
+            raise ValueError(f"Unknown universe: {name}")
+
+        if as_of is not None:
+            days = self.snapshots(name)
+            if days:
+                candidates = [day for day in days if day <= as_of] or days[:1]
+                return self._read_snapshot(name, candidates[-1])["symbols"]
+
+        with self._lock:
+            current = self._current.get(name)
+        if current is None:
+            current = self._load_current(name)
+            if current is None:
+                # Nothing cached at all, the only time a caller waits on the scrape.
+                return self.refresh(name)
+            with self._lock:
+                self._current.setdefault(name, current)
+
+        if time.time() - current["fetched_at"] > self.ttl:
+            self.refresh_in_background(name)
+        return current["symbols"]
+
+
+# Create a default instance for import
+universe_manager = UniverseManager(
+    os.path.join(config.DATA_DIR, "universes"),
+    ttl=config.UNIVERSE_TTL_HOURS * 3600,
+    custom=config.UNIVERSES,
+    seeds={"nasdaq100": config.STOCK_SYMBOLS} if config.STOCK_SYMBOLS else None,
+)
@@ -1,29 +1,22 @@
 # === Imports ===
-from typing import TypedDict, Annotated, Literal
-from pathlib import Path
-import uuid
+from typing import TypedDict, Annotated, Optional
 import json
-import pandas as pd
-from tenacity import retry, stop_after_attempt, wait_fixed
 
-from langchain_core.runnables import RunnableLambda
-from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.messages import ToolMessage
 from langchain_core.tools import InjectedToolCallId, tool
 
-from langgraph.graph import StateGraph, MessagesState, START, END
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode
+from langgraph.prebuilt import InjectedState
 from langgraph.types import Command
 from langchain_core.runnables import RunnableConfig
 
-from langchain.chat_models import init_chat_model
-
 # === App Imports ===
-from app import config
-from app.tools.core.analysis import *
-from app.tools.core.stock_data import *
-from app.tools.core.code_execution import *
-from app.tools.core.email import *
+from app.tools.core.stock_data import get_stock_data, get_stock_news, get_top_nasdaq_gainer
+from app.tools.core.analysis import validate_analysis
+from app.tools.core.code_execution import run_python_candidates, run_python_code
+from app.tools.core.email import greeting_personalizer, queue_email
+from app.tools.core.artifacts import ArtifactRef, artifact_store
+from app.tools.core.memo import node_memo
 
 
 # === Specify config schema ===
@@ -31,30 +24,49 @@ class ConfigSchema(TypedDict):
     from_email: str
     to_emails: list[str]
     smtp_server: str
+    smtp_port: int
+    smtp_ssl: bool
     period: str
     num_news: int
     data_dir: str
+    top_n: int
+    direction: str
+    universe: str
+    screen: str
+    memo: bool
+    candidates: int
 
 # === Define Graph State ===
 class State(TypedDict):
     messages: Annotated[list, add_messages]
+    sentiment_messages: Annotated[list, add_messages]
     stock_symbol: str
     stock_pct: float
     day: str
-    stock_data: dict
-    stock_data_saved_path: str
-    stock_analysis: str
+    # Large values live in the artifact store, the state only holds their handles
+    stock_data_ref: ArtifactRef
+    stock_analysis_ref: ArtifactRef
     stock_sentiment: str
     tool_status: bool
 
 
+def memo_key(state: dict, config: RunnableConfig) -> Optional[tuple]:
+    """(symbol, trading day, period) of the run for `node_memo`, None when the run is not memoized."""
+    if not config["configurable"].get("memo") or not state.get("stock_symbol") or not state.get("day"):
+        return None
+    return state["stock_symbol"], state["day"], config["configurable"]["period"]
+
+
 # === Stateful Tool  ===
 @tool
 def execute_python_code_tool(
     code: str,
+    state: Annotated[dict, InjectedState],
+    config: RunnableConfig,
     tool_call_id: Annotated[str, InjectedToolCallId],
 ):
-    """Execute Python code to analyze stock data.
+    """Execute Python code to analyze stock data. The stock data is available to the code as the pandas DataFrame `df`,
+    and the code returns its analysis with `set_result(analysis)`.
 
     Args:
         code (str): python code
@@ -63,23 +75,59 @@ def execute_python_code_tool(
     Returns:
         _type_: _description_
     """
-    result = execute_python_code(code)
+    # The saved frame is mapped into the sandbox, the analysis comes back validated against its schema
+    frame = artifact_store.get(state["stock_data_ref"]) if state.get("stock_data_ref") else None
+    return _analysis_command(run_python_code(code, frame, validate_analysis), state, config, tool_call_id)
+
+
+@tool
+def execute_python_code_candidates_tool(
+    codes: list[str],
+    state: Annotated[dict, InjectedState],
+    config: RunnableConfig,
+    tool_call_id: Annotated[str, InjectedToolCallId],
+):
+    """Execute several alternative Python scripts analyzing the same stock data side by side, the first one whose
+    analysis is valid is kept. Each script reads the pandas DataFrame `df` and returns with `set_result(analysis)`.
+
+    Args:
+        codes (list[str]): python code of every candidate
+        tool_call_id (Annotated[str, InjectedToolCallId]): _description_
+
+    Returns:
+        _type_: _description_
+    """
+    # One frame mapped into every sandbox, the losing candidates are stopped as soon as one validates
+    frame = artifact_store.get(state["stock_data_ref"]) if state.get("stock_data_ref") else None
+    return _analysis_command(run_python_candidates(codes, frame, validate_analysis), state, config, tool_call_id)
+
 
-    if result["status"] != "success" or not result["output"]:
+def _analysis_command(result: dict, state: dict, config: RunnableConfig, tool_call_id: str) -> Command:
+    """State update of a sandbox run: the stored analysis on success, the error for the LLM to fix otherwise."""
+    if result["status"] != "success":
         return Command(
             update={
                 "tool_status": False,
                 "messages": [ToolMessage(result["error"], tool_call_id=tool_call_id)],
             }
         )
-    else:
-        return Command(
-            update={
-                "tool_status": True,
-                "stock_analysis": result["output"],
-                "messages": [ToolMessage(result["output"], tool_call_id=tool_call_id)],
-            }
-        )
+
+    analysis_ref = artifact_store.put(json.dumps(result["result"]), "analysis", state.get("stock_symbol"))
+    key = memo_key(state, config)
+    if key:
+        node_memo.put("generate_analysis_node", *key, {"stock_analysis_ref": analysis_ref})
+    summary = {"analysis": analysis_ref["id"]}
+    if "candidate" in result:
+        summary["candidate"] = result["candidate"]
+    return Command(
+        update={
+            "tool_status": True,
+            "stock_analysis_ref": analysis_ref,
+            "messages": [
+                ToolMessage("Successfully analyzed the stock data" + json.dumps(summary), tool_call_id=tool_call_id)
+            ],
+        }
+    )
 
 
 @tool
@@ -87,11 +135,11 @@ def get_top_nasdaq_gainer_tool(
     # # access information that's dynamically updated inside the agent
     # state: Annotated[State, InjectedState],
     # # access static data that is passed at agent invocation
-    # config: RunnableConfig,
+    config: RunnableConfig,
     tool_call_id: Annotated[str, InjectedToolCallId],
 ):
-    """Retrieve today's top NASDAQ stock gainer."""
-    data = get_top_nasdaq_gainer()
+    """Retrieve today's top NASDAQ stock gainer, or the stock ranked first by the configured screen."""
+    data = get_top_nasdaq_gainer(config["configurable"].get("universe"), config["configurable"].get("screen"))
 
     symbol = data.get("symbol")
     day = data.get("day")
@@ -121,38 +169,38 @@ def get_top_nasdaq_gainer_tool(
 def get_and_save_stock_data_tool(
     symbol: str,
     period: str,
-    saved_path: str,
+    state: Annotated[dict, InjectedState],
+    config: RunnableConfig,
     tool_call_id: Annotated[str, InjectedToolCallId],
 ):
-    """Fetch and save stock data to CSV.
+    """Fetch stock data and store it as a frame artifact, which the analysis code gets as the DataFrame `df`.
 
     Args:
         symbol (str): stock symbol
         period (str): 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max,
-        saved_path (str): file path
         tool_call_id (Annotated[str, InjectedToolCallId]): _description_
 
     Returns:
         _type_: _description_
     """
-    data = get_stock_data(symbol, period)
-
-    data.to_csv(saved_path, index=True)
-
-    state_update = {
-        "stock_data": data.to_dict(),
-        "stock_data_saved_path": saved_path,
-    }
+    key = memo_key(dict(state, stock_symbol=symbol), config)
+    memoized = node_memo.get("get_stock_data_tool_node", symbol, key[1], period) if key else None
+    if memoized:
+        data_ref = memoized["stock_data_ref"]
+    else:
+        data = get_stock_data(symbol, period)
+        data_ref = artifact_store.put(data, "frame", symbol)
+        if key:
+            node_memo.put("get_stock_data_tool_node", symbol, key[1], period, {"stock_data_ref": data_ref})
 
     # We return a Command object in the tool to update our state.
     return Command(
         update={
-            # "stock_data": data.to_dict(),
-            "stock_data_saved_path": saved_path,
+            "stock_data_ref": data_ref,
             # update the message history
             "messages": [
                 ToolMessage(
-                    "Successfully get and save the stock data" + json.dumps({"stock_data_saved_path": saved_path}),
+                    "Successfully get and save the stock data" + json.dumps({"stock_data": data_ref["id"]}),
                     tool_call_id=tool_call_id,
                 )
             ],
@@ -160,6 +208,26 @@ def get_and_save_stock_data_tool(
     )
 
 
+@tool
+def get_stock_news_tool(symbol: str, last_n_news: int = 5) -> str:
+    """
+    Fetch recent news headlines for the given stock symbol.
+
+    Args:
+        symbol (str): Stock ticker symbol, e.g. "AAPL".
+        last_n_news (int, optional): Number of recent news articles to retrieve. Defaults to 5.
+
+    Returns:
+        str: The headlines, newest first, and the id of the stored news batch.
+    """
+    news = get_stock_news(symbol, last_n_news)
+    news_ref = artifact_store.put(news, "news", symbol)
+
+    # Only the headlines go into the transcript, the full items stay in the artifact store.
+    headlines = [(item.get("content") or {}).get("title") or item.get("title") for item in news]
+    return json.dumps({"news": news_ref["id"], "headlines": [h for h in headlines if h]})
+
+
 @tool
 def send_email_tool(
     subject: str,
@@ -178,14 +246,28 @@ def send_email_tool(
         subject (str): Email subject line.
         body (str): Email body text.
     Returns:
-        str: Success message if email sent.
+        str: Confirmation that the email is queued for delivery.
 
     Raises:
-        RuntimeError: If email sending fails.
+        RuntimeError: If the email cannot be queued.
     """
 
     from_email = config["configurable"]["from_email"]
     to_emails = config["configurable"]["to_emails"]
     smtp_server = config["configurable"]["smtp_server"]
+    smtp_port = config["configurable"].get("smtp_port", 465)
+    smtp_ssl = config["configurable"].get("smtp_ssl", True)
+    greeting = config["configurable"].get("greeting")
 
-    return send_email_by_smtp(subject=subject, body=body, from_email=from_email, to_emails=to_emails, smtp_server=smtp_server)
+    # Delivered in the background, the run does not wait for SMTP
+    deliveries = queue_email(
+        subject=subject,
+        body=body,
+        from_email=from_email,
+        to_emails=to_emails,
+        smtp_server=smtp_server,
+        smtp_port=smtp_port,
+        use_ssl=smtp_ssl,
+        personalize=greeting_personalizer(greeting) if greeting else None,
+    )
+    return f"Email queued for delivery to {len(deliveries)} recipient(s)."
@@ -0,0 +1,294 @@
+"""
+Run tracing: per-node latency, LLM token usage and timed spans around external calls.
+
+`RunTracer` is a LangChain callback handler. Pass it in the run config's `callbacks` and wrap the
+run in `tracer.activate()`; it then records
+
+  - `node`: wall time of every graph node run (from the `langgraph_node` metadata)
+  - `llm`: time and prompt/completion tokens of every chat model call, with the calling node
+  - `context`: prompt tokens of an LLM node before and after its context policy
+    (`app.context_policy`)
+  - `llm_cache`: hit or miss of every lookup in the LLM response cache (`app.tools.core.llm_cache`)
+  - `span`: time of the external calls wrapped in `span(...)` (`app.tools.core.spans`): market data,
+    the code sandbox, SMTP
+  - `run`: total time and status, written when the run ends
+
+Events go to `<trace_dir>/<YYYY-MM-DD>.jsonl`, and `export_prometheus` turns the recent history into
+a node_exporter textfile with p50/p95 per node and span plus token and cache counters.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from app import config
+from app.tools.core.spans import active_tracer
+
+TRACE_DIR = os.path.join(config.DATA_DIR, "traces")
+PROMETHEUS_FILE = "stock_agent.prom"
+
+
+def _token_usage(response) -> Dict[str, int]:
+    """Prompt/completion tokens of an `LLMResult`, from the message usage metadata or `llm_output`."""
+    prompt_tokens = completion_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            prompt_tokens += usage.get("input_tokens", 0)
+            completion_tokens += usage.get("output_tokens", 0)
+    if not (prompt_tokens or completion_tokens):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+
+
+class RunTracer(BaseCallbackHandler):
+    """Callback handler collecting the trace events of one agent run."""
+
+    # Called in the thread/task of the run itself, so timings are not skewed by an executor hop
+    run_inline = True
+
+    def __init__(self, graph: str = "", trace_dir: Optional[str] = TRACE_DIR, run_id: Optional[str] = None):
+        """
+        Args:
+            graph (str, optional): Name of the traced graph, stored with every event.
+            trace_dir (str, optional): Directory of the JSONL files, None to keep the events in memory only.
+                Defaults to `data/traces`.
+            run_id (str, optional): Run id. Defaults to a new uuid.
+        """
+        self.graph = graph
+        self.trace_dir = trace_dir
+        self.run_id = run_id or uuid.uuid4().hex
+        self.events: List[dict] = []
+        self._started: Dict[uuid.UUID, tuple] = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, **fields):
+        event = {"type": kind, "run_id": self.run_id, "graph": self.graph, "ts": time.time(), **fields}
+        if "ms" in event:
+            event["ms"] = round(event["ms"], 3)
+        with self._lock:
+            self.events.append(event)
+
+    # === Callbacks ===
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        # Runnables nested in a node carry the same metadata, only the node run itself has its name.
+        if node and kwargs.get("name") == node:
+            self._started[run_id] = ("node", node, time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish(run_id, "ok")
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, "error")
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._started[run_id] = ("llm", (metadata or {}).get("langgraph_node"), time.perf_counter())
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._started[run_id] = ("llm", (metadata or {}).get("langgraph_node"), time.perf_counter())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, "ok", **_token_usage(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, "error")
+
+    def _finish(self, run_id: uuid.UUID, status: str, **fields):
+        started = self._started.pop(run_id, None)
+        if started is None:
+            return
+        kind, node, start = started
+        self.record(kind, node=node, ms=(time.perf_counter() - start) * 1000, status=status, **fields)
+
+    # === Run scope ===
+    @contextlib.contextmanager
+    def activate(self) -> Iterator["RunTracer"]:
+        """
+        Trace a run: make this tracer receive `span`s, record the run event at the end and write
+        the events plus the Prometheus export when a `trace_dir` is set.
+        """
+        token = active_tracer.set(self)
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield self
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            active_tracer.reset(token)
+            self.record("run", ms=(time.perf_counter() - start) * 1000, status=status)
+            if self.trace_dir:
+                self.write()
+                export_prometheus(self.trace_dir)
+
+    def write(self):
+        """Append the events to today's JSONL file."""
+        os.makedirs(self.trace_dir, exist_ok=True)
+        with open(os.path.join(self.trace_dir, f"{date.today().isoformat()}.jsonl"), "a") as f:
+            for event in self.events:
+                f.write(json.dumps(event) + "\n")
+
+    def durations(self, kind: str = "node") -> Dict[str, List[float]]:
+        """Milliseconds per node (or span name), for `kind` in "node", "llm", "span"."""
+        key = "name" if kind == "span" else "node"
+        result = defaultdict(list)
+        for event in self.events:
+            if event["type"] == kind:
+                result[event[key]].append(event["ms"])
+        return dict(result)
+
+    def summary(self) -> str:
+        """Human readable per-node / per-span table of this run."""
+        tokens = defaultdict(lambda: [0, 0])
+        context = defaultdict(lambda: [0, 0])
+        cache = defaultdict(lambda: [0, 0])
+        for event in self.events:
+            if event["type"] == "llm":
+                tokens[event["node"]][0] += event.get("prompt_tokens", 0)
+                tokens[event["node"]][1] += event.get("completion_tokens", 0)
+            elif event["type"] == "context":
+                context[event["node"]][0] += event["tokens_before"]
+                context[event["node"]][1] += event["tokens_after"]
+            elif event["type"] == "llm_cache":
+                cache[event["node"]][0 if event["hit"] else 1] += 1
+
+        lines = [f"Run {self.run_id} ({self.graph})"]
+        for node, values in self.durations("node").items():
+            prompt, completion = tokens.get(node, (0, 0))
+            token_info = f"  tokens {prompt}/{completion}" if prompt or completion else ""
+            if node in context:
+                token_info += "  context ~{} -> ~{} tokens".format(*context[node])
+            if node in cache:
+                token_info += "  cache {} hit / {} miss".format(*cache[node])
+            lines.append(f"  {node:<36} {sum(values):>10.1f} ms{token_info}")
+        for name, values in self.durations("span").items():
+            lines.append(f"  [{name}]{'':<{max(0, 34 - len(name))}} {sum(values):>10.1f} ms  x{len(values)}")
+        for event in self.events:
+            if event["type"] == "run":
+                lines.append(f"  {'total':<36} {event['ms']:>10.1f} ms")
+        return "\n".join(lines)
+
+
+# === Prometheus export ===
+def load_events(trace_dir: str = TRACE_DIR, history_days: int = 7) -> List[dict]:
+    """Events of the last `history_days` days, oldest first."""
+    first_day = date.today() - timedelta(days=history_days - 1)
+    events = []
+    for path in sorted(Path(trace_dir).glob("*.jsonl")):
+        try:
+            if date.fromisoformat(path.stem) < first_day:
+                continue
+        except ValueError:
+            continue
+        with open(path, "r") as f:
+            events += [json.loads(line) for line in f if line.strip()]
+    return events
+
+
+def _quantile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def export_prometheus(trace_dir: str = TRACE_DIR, path: Optional[str] = None, history_days: int = 7) -> str:
+    """
+    Write a Prometheus textfile (node_exporter textfile collector format) from the trace history.
+
+    Latencies are exported as summaries with p50/p95 over the last `history_days`, tokens as counters.
+
+    Args:
+        trace_dir (str, optional): Directory of the JSONL trace files. Defaults to `data/traces`.
+        path (str, optional): Output file. Defaults to `<trace_dir>/stock_agent.prom`.
+        history_days (int, optional): Days of history the quantiles cover. Defaults to 7.
+
+    Returns:
+        str: The output file path.
+    """
+    path = path or os.path.join(trace_dir, PROMETHEUS_FILE)
+    latencies = {"run": defaultdict(list), "node": defaultdict(list), "llm": defaultdict(list), "span": defaultdict(list)}
+    tokens = defaultdict(int)
+    context_tokens = defaultdict(int)
+    cache_lookups = defaultdict(int)
+
+    for event in load_events(trace_dir, history_days):
+        kind = event.get("type")
+        if kind == "run":
+            latencies["run"][(("graph", event["graph"]),)].append(event["ms"])
+        elif kind in ("node", "llm"):
+            # LLM calls made outside of a graph node have no node
+            node = event["node"] or ""
+            latencies[kind][(("graph", event["graph"]), ("node", node))].append(event["ms"])
+            if kind == "llm":
+                for direction in ("prompt", "completion"):
+                    tokens[(("graph", event["graph"]), ("node", node), ("kind", direction))] += event.get(
+                        f"{direction}_tokens", 0
+                    )
+        elif kind == "span":
+            latencies["span"][(("span", event["name"]),)].append(event["ms"])
+        elif kind == "context":
+            for stage in ("before", "after"):
+                context_tokens[(("graph", event["graph"]), ("node", event["node"]), ("stage", stage))] += event[
+                    f"tokens_{stage}"
+                ]
+        elif kind == "llm_cache":
+            result = "hit" if event["hit"] else "miss"
+            cache_lookups[(("graph", event["graph"]), ("node", event["node"]), ("result", result))] += 1
+
+    lines = []
+    for kind, series in latencies.items():
+        metric = f"stock_agent_{kind}_latency_seconds"
+        lines += [f"# HELP {metric} Latency of agent {kind}s over the last {history_days} days.", f"# TYPE {metric} summary"]
+        for labels, values in sorted(series.items()):
+            seconds = [v / 1000 for v in values]
+            for q in (0.5, 0.95):
+                lines.append(f"{metric}{_labels(**dict(labels), quantile=q)} {_quantile(seconds, q):.6f}")
+            lines.append(f"{metric}_sum{_labels(**dict(labels))} {sum(seconds):.6f}")
+            lines.append(f"{metric}_count{_labels(**dict(labels))} {len(seconds)}")
+
+    metric = "stock_agent_llm_tokens_total"
+    lines += [f"# HELP {metric} LLM tokens used over the last {history_days} days.", f"# TYPE {metric} counter"]
+    lines += [f"{metric}{_labels(**dict(labels))} {count}" for labels, count in sorted(tokens.items())]
+
+    metric = "stock_agent_context_tokens_total"
+    lines += [
+        f"# HELP {metric} Estimated LLM node prompt tokens before and after the context policy over the last {history_days} days.",
+        f"# TYPE {metric} counter",
+    ]
+    lines += [f"{metric}{_labels(**dict(labels))} {count}" for labels, count in sorted(context_tokens.items())]
+
+    metric = "stock_agent_llm_cache_lookups_total"
+    lines += [
+        f"# HELP {metric} LLM response cache hits and misses over the last {history_days} days.",
+        f"# TYPE {metric} counter",
+    ]
+    lines += [f"{metric}{_labels(**dict(labels))} {count}" for labels, count in sorted(cache_lookups.items())]
+
+    # The textfile collector may read at any time, swap the file in atomically.
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Runs of `serve` finish concurrently, each writes its own temporary file.
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, path)
+    return path
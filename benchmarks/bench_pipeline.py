@@ -0,0 +1,339 @@
+"""
+End-to-end benchmark of the agent graphs, fully offline.
+
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --rounds 10 --llm-latency 0.2
+    python -m benchmarks.bench_pipeline --update-baseline
+
+Runs `graph_agent.build_graph()` (sync, parallel and fast path) and `full_auto_agent.build_graph()` with a
+scripted chat model, a synthetic `ReplayProvider` recording and a local SMTP sink. It reports
+per-node and total latency, the subprocess overhead of `execute_python_code`, SMTP delivery
+throughput and memory high-water marks, and exits non-zero when a gated metric regresses past `baseline.json`.
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from benchmarks.fakes import ScriptedChatModel, SMTPSink, full_auto_script, graph_agent_script, write_replay_dataset
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+
+# Absolute slack added on top of the relative tolerance, so tiny metrics do not flap on noisy runners
+SLACK = {"ms": 25.0, "mb": 16.0}
+
+
+# === Environment ===
+def prepare(workdir: Path, sink: SMTPSink, symbols: int, llm_latency: float) -> dict:
+    """Point the app at the recording, the sink and `workdir`, then import the graphs with the scripted model."""
+    universe = [f"SYM{i:03d}" for i in range(symbols)]
+    recording = write_replay_dataset(str(workdir / "recording"), universe)
+
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ.setdefault("EMAIL_PASSWORD", "benchmark")
+    # Also seen by the sandbox processes
+    os.environ["MARKET_DATA_PROVIDER"] = f"replay:{recording}"
+
+    from app import config
+
+    config.DATA_DIR = str(workdir / "data")
+    os.makedirs(config.DATA_DIR, exist_ok=True)
+    config.UNIVERSE = "benchmark"
+    config.SMTP_SERVER, config.SMTP_PORT, config.SMTP_SSL = sink.host, sink.port, False
+    # The timed rounds repeat the same prompts, they measure the model calls rather than LLM cache hits
+    config.LLM_CACHE_NODES = []
+
+    # Imported after the config is set, `full_auto_agent` formats its prompt at import time
+    from app import full_auto_agent, graph_agent
+    from app.tools.core.artifacts import artifact_store
+    from app.tools.core.code_cache import code_cache
+    from app.tools.core.mailer import mailer
+    from app.tools.core.market_store import market_store
+    from app.tools.core.providers import ReplayProvider, set_provider
+    from app.tools.core.universe import universe_manager
+
+    set_provider(ReplayProvider(recording))
+    universe_manager.custom["benchmark"] = universe
+    market_store.root = workdir / "store"
+    artifact_store.root = workdir / "artifacts"
+    code_cache.path = str(workdir / "code_cache.json")
+    mailer.dead_letter_path = str(workdir / "dead_letter.jsonl")
+
+    graph_agent.llm = ScriptedChatModel(script=graph_agent_script, latency=llm_latency)
+    full_auto_agent.model = ScriptedChatModel(script=full_auto_script, latency=llm_latency)
+
+    run_config = {
+        "configurable": {
+            "period": config.PERIOD,
+            "from_email": config.FROM_EMAIL,
+            "to_emails": config.TO_EMAILS,
+            "smtp_server": config.SMTP_SERVER,
+            "smtp_port": config.SMTP_PORT,
+            "smtp_ssl": config.SMTP_SSL,
+            "num_news": config.NUM_NEWS,
+            "data_dir": config.DATA_DIR,
+        }
+    }
+
+    return {
+        "graph_agent": (graph_agent.build_graph(), False, run_config),
+        "graph_agent_parallel": (graph_agent.build_graph(parallel=True), True, run_config),
+        "graph_agent_fast": (graph_agent.build_graph(fast=True), False, run_config),
+        "full_auto_agent": (full_auto_agent.build_graph(), False, run_config),
+    }
+
+
+def run_once(graph, is_async: bool, run_config: dict, sink: SMTPSink, tracer=None) -> float:
+    """Run a graph to the end and return its wall time in ms; it must have sent exactly one email."""
+    from app.tools.core.mailer import mailer
+
+    run_config = dict(run_config, callbacks=[tracer] if tracer else [])
+    inputs = {"messages": [{"role": "user", "content": ""}]}
+    sent = len(sink.messages)
+
+    start = time.perf_counter()
+    with tracer.activate() if tracer else contextlib.nullcontext():
+        if is_async:
+            asyncio.run(graph.ainvoke(inputs, run_config))
+        else:
+            graph.invoke(inputs, run_config)
+        # The graph only queues the email, delivery counts towards the run like in `main.py`
+        mailer.flush()
+    elapsed = (time.perf_counter() - start) * 1000
+
+    if len(sink.messages) != sent + 1:
+        raise RuntimeError(f"Expected one email, the sink received {len(sink.messages) - sent}")
+    return elapsed
+
+
+def bench_scenario(graph, is_async: bool, run_config: dict, sink: SMTPSink, rounds: int) -> dict:
+    """Cold run, `rounds` timed warm runs, then one run under tracemalloc for the allocation peak."""
+    from app.tracing import RunTracer
+
+    cold_ms = run_once(graph, is_async, run_config, sink)
+
+    # One in-memory tracer across the rounds, so every node and span has `rounds` samples
+    tracer = RunTracer(trace_dir=None)
+    totals = [run_once(graph, is_async, run_config, sink, tracer) for _ in range(rounds)]
+
+    tracemalloc.start()
+    run_once(graph, is_async, run_config, sink)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "cold_ms": round(cold_ms, 2),
+        "total_ms": round(statistics.median(totals), 2),
+        "total_p95_ms": round(sorted(totals)[max(0, int(len(totals) * 0.95) - 1)], 2),
+        "peak_alloc_mb": round(peak / 2**20, 2),
+        "nodes": {node: round(statistics.median(durations), 2) for node, durations in sorted(tracer.durations("node").items())},
+        "spans": {name: round(statistics.median(durations), 2) for name, durations in sorted(tracer.durations("span").items())},
+        "context_tokens": context_tokens(tracer.events, rounds),
+    }
+
+
+def context_tokens(events: List[dict], rounds: int) -> Dict[str, List[int]]:
+    """Estimated prompt tokens per LLM node and run, [before, after] the node's context policy."""
+    tokens = {}
+    for event in events:
+        if event["type"] == "context":
+            before_after = tokens.setdefault(event["node"], [0, 0])
+            before_after[0] += event["tokens_before"]
+            before_after[1] += event["tokens_after"]
+    return {node: [before // rounds, after // rounds] for node, (before, after) in sorted(tokens.items())}
+
+
+def bench_sandbox(rounds: int) -> dict:
+    """Overhead of running code out of process: a fresh pool (zygote start) and the warm shared pool."""
+    from app.tools.core.code_execution import SandboxPool, execute_python_code
+
+    code = "print('ok')"
+
+    def timed(fn: Callable) -> float:
+        start = time.perf_counter()
+        fn()
+        return (time.perf_counter() - start) * 1000
+
+    pool = SandboxPool(size=1)
+    try:
+        cold_ms = timed(lambda: pool.run(code))
+    finally:
+        pool.shutdown()
+
+    execute_python_code(code)
+    warm = [timed(lambda: execute_python_code(code)) for _ in range(max(rounds, 10))]
+    inline = [timed(lambda: exec(compile(code, "<bench>", "exec"), {"print": lambda *a: None})) for _ in range(10)]
+
+    return {
+        "cold_ms": round(cold_ms, 2),
+        "warm_ms": round(statistics.median(warm), 2),
+        "overhead_ms": round(statistics.median(warm) - statistics.median(inline), 2),
+    }
+
+
+def bench_mailer(sink: SMTPSink, messages: int = 50) -> dict:
+    """Delivery throughput: one connection and login per message vs the pooled, queued mailer."""
+    import smtplib
+    from email.mime.text import MIMEText
+
+    from app.tools.core.mailer import Mailer
+
+    recipients = [f"user{i}@example.com" for i in range(messages)]
+    sent = len(sink.messages)
+
+    start = time.perf_counter()
+    for recipient in recipients:
+        msg = MIMEText("body")
+        msg["Subject"], msg["From"], msg["To"] = "bench", "bench@example.com", recipient
+        with smtplib.SMTP(sink.host, sink.port) as server:
+            server.login("bench@example.com", "benchmark")
+            server.sendmail("bench@example.com", [recipient], msg.as_string())
+    per_connection = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory(prefix="bench-mail-") as workdir:
+        mailer = Mailer(os.path.join(workdir, "dead_letter.jsonl"))
+        start = time.perf_counter()
+        mailer.submit("bench", "body", "bench@example.com", recipients, sink.host, sink.port, use_ssl=False)
+        mailer.flush()
+        pooled = time.perf_counter() - start
+        mailer.close()
+
+    if len(sink.messages) != sent + 2 * messages or mailer.stats["sent"] != messages:
+        raise RuntimeError("The mailer benchmark lost messages")
+    return {
+        "messages": messages,
+        "per_connection_msgs_per_s": round(messages / per_connection, 1),
+        "pooled_msgs_per_s": round(messages / pooled, 1),
+        "connections": mailer.pool.opened,
+    }
+
+
+def run_benchmarks(rounds: int = 5, symbols: int = 100, llm_latency: float = 0.0) -> dict:
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir, SMTPSink() as sink:
+        scenarios = prepare(Path(workdir), sink, symbols, llm_latency)
+        results = {
+            "scenarios": {
+                name: bench_scenario(graph, is_async, run_config, sink, rounds)
+                for name, (graph, is_async, run_config) in scenarios.items()
+            },
+            "sandbox": bench_sandbox(rounds),
+            "mailer": bench_mailer(sink),
+        }
+
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results["max_rss_mb"] = round(max_rss / (2**20 if sys.platform == "darwin" else 2**10), 2)
+    results["environment"] = {"python": platform.python_version(), "platform": sys.platform, "rounds": rounds}
+    return results
+
+
+# === Baseline comparison ===
+def gated_metrics(results: dict) -> Dict[str, float]:
+    """Metrics that fail the run when they regress; per-node timings are reported only."""
+    metrics = {}
+    for name, scenario in results["scenarios"].items():
+        metrics[f"{name}.total_ms"] = scenario["total_ms"]
+        metrics[f"{name}.peak_alloc_mb"] = scenario["peak_alloc_mb"]
+    metrics["sandbox.cold_ms"] = results["sandbox"]["cold_ms"]
+    metrics["sandbox.warm_ms"] = results["sandbox"]["warm_ms"]
+    metrics["max_rss_mb"] = results["max_rss_mb"]
+    return metrics
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Compare gated metrics against the baseline.
+
+    Args:
+        results (dict): Output of `run_benchmarks`.
+        baseline (dict): A stored `run_benchmarks` output.
+        tolerance (float): Allowed relative increase, e.g. 0.5 for +50%.
+
+    Returns:
+        List[str]: One line per regression, empty if none.
+    """
+    regressions = []
+    expected = gated_metrics(baseline)
+    for key, value in gated_metrics(results).items():
+        if key not in expected:
+            continue
+        limit = expected[key] * (1 + tolerance) + SLACK[key.rsplit("_", 1)[-1]]
+        if value > limit:
+            regressions.append(f"{key}: {value} > {limit:.2f} (baseline {expected[key]})")
+    return regressions
+
+
+def print_report(results: dict):
+    for name, scenario in results["scenarios"].items():
+        print(f"\n{name}: total {scenario['total_ms']} ms (p95 {scenario['total_p95_ms']}, cold {scenario['cold_ms']}),"
+              f" peak alloc {scenario['peak_alloc_mb']} MB")
+        for node, ms in scenario["nodes"].items():
+            print(f"    {node:<36} {ms:>10.2f} ms")
+        for name, ms in scenario["spans"].items():
+            print(f"    [{name}]{'':<{max(0, 34 - len(name))}} {ms:>10.2f} ms")
+        for node, (before, after) in scenario.get("context_tokens", {}).items():
+            print(f"    {node:<36} context ~{before} -> ~{after} tokens")
+    scenarios = results["scenarios"]
+    if "graph_agent_fast" in scenarios:
+        saved = scenarios["graph_agent"]["total_ms"] - scenarios["graph_agent_fast"]["total_ms"]
+        print(f"\nfast path: {saved:.2f} ms saved per run vs graph_agent")
+    sandbox = results["sandbox"]
+    print(f"\nexecute_python_code: warm {sandbox['warm_ms']} ms (overhead {sandbox['overhead_ms']}),"
+          f" fresh pool {sandbox['cold_ms']} ms")
+    mail = results["mailer"]
+    print(f"mailer: {mail['pooled_msgs_per_s']} msgs/s pooled over {mail['connections']} connection(s),"
+          f" {mail['per_connection_msgs_per_s']} msgs/s with a connection per message")
+    print(f"max RSS: {results['max_rss_mb']} MB")
+
+
+def main(argv: List[str] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5, help="Timed runs per scenario")
+    parser.add_argument("--symbols", type=int, default=100, help="Symbols in the synthetic universe")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds slept per fake LLM call")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed relative regression")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="Baseline file")
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(rounds=args.rounds, symbols=args.symbols, llm_latency=args.llm_latency)
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not os.path.isfile(args.baseline):
+        print(f"\nNo baseline at {args.baseline}, run with --update-baseline to create one")
+        return 0
+    with open(args.baseline, "r") as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        return 1
+    print("\nNo regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+"""
+Offline stand-ins used by the benchmarks: a scripted chat model, a synthetic market data
+recording for `ReplayProvider`, and a local SMTP sink.
+"""
+
+import asyncio
+import json
+import re
+import socketserver
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+import pandas as pd
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+
+# === Scripted chat model ===
+def tool_call_message(name: str, args: dict) -> AIMessage:
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": str(uuid.uuid4()), "type": "tool_call"}])
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Chat model whose replies come from a script instead of an API.
+
+    `script(messages, tool_names)` returns the next `AIMessage`, `tool_names` are the tools bound
+    with `bind_tools`. `latency` seconds are slept per call to stand in for the API round trip.
+    """
+
+    script: Callable[[List[BaseMessage], List[str]], AIMessage]
+    latency: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _reply(self, messages: List[BaseMessage], tools: Optional[list]) -> ChatResult:
+        self.calls += 1
+        tool_names = [t["function"]["name"] for t in tools or []]
+        return ChatResult(generations=[ChatGeneration(message=self.script(messages, tool_names))])
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._reply(messages, tools)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tools=None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._reply(messages, tools)
+
+
+ANALYSIS_CODE = """change = df["Close"].pct_change().dropna()
+analysis = {{
+    "stock": {symbol!r},
+    "period": {period!r},
+    "average_daily_change": round(float(change.mean()), 4),
+    "volatility": round(float(change.std()), 4),
+    "trend": "UP" if df["Close"].iloc[-1] > df["Close"].iloc[0] else "DOWN",
+    "close_prices": df["Close"].round(2).tolist(),
+}}
+set_result(analysis)
+"""
+
+
+def _search(pattern: str, text: str) -> str:
+    match = re.search(pattern, text)
+    if not match:
+        raise ValueError(f"Unexpected prompt, no match for {pattern!r}:\n{text}")
+    return match.group(1)
+
+
+def graph_agent_script(messages: List[BaseMessage], tool_names: List[str]) -> AIMessage:
+    """Replies of the controlled agents (`graph_agent`, `digest_agent`), keyed on the tool each node binds."""
+    prompt = messages[0].content
+    last = messages[-1]
+
+    if "get_top_nasdaq_gainer_tool" in tool_names:
+        return tool_call_message("get_top_nasdaq_gainer_tool", {})
+    if "get_and_save_stock_data_tool" in tool_names:
+        symbol, period = re.search(r"Get the stock (\S+) past (\S+) days data", prompt).groups()
+        return tool_call_message("get_and_save_stock_data_tool", {"symbol": symbol, "period": period})
+    if "execute_python_code_tool" in tool_names:
+        code = ANALYSIS_CODE.format(
+            symbol=_search(r"analyze the stock (\S+):", prompt),
+            period=_search(r"The last (\S+) trading days", prompt),
+        )
+        return tool_call_message("execute_python_code_tool", {"code": code})
+    if "execute_python_code_candidates_tool" in tool_names:
+        code = ANALYSIS_CODE.format(
+            symbol=_search(r"analyze the stock (\S+):", prompt),
+            period=_search(r"The last (\S+) trading days", prompt),
+        )
+        candidates = int(_search(r"Write (\d+) different", prompt))
+        # One broken script among valid ones, the race has to skip it
+        return tool_call_message("execute_python_code_candidates_tool", {"codes": ["raise ValueError"] + [code] * (candidates - 1)})
+    if "get_stock_news_tool" in tool_names:
+        if last.type == "tool" and last.name == "get_stock_news_tool":
+            return AIMessage(content="Neutral to positive: recent headlines are mostly about steady demand.")
+        symbol = _search(r"sentiment the stock (\S+):", prompt)
+        num_news = int(_search(r"recent (\d+) news", prompt))
+        return tool_call_message("get_stock_news_tool", {"symbol": symbol, "last_n_news": num_news})
+    if "send_email_tool" in tool_names:
+        return tool_call_message("send_email_tool", {"subject": "Daily stock summary", "body": prompt})
+    if not tool_names:
+        # Plain completion, e.g. the per-symbol sentiment of the digest graph
+        return AIMessage(content="Neutral to positive: recent headlines are mostly about steady demand.")
+    raise ValueError(f"No scripted reply for tools {tool_names}")
+
+
+def full_auto_script(messages: List[BaseMessage], tool_names: List[str]) -> AIMessage:
+    """Replies of the ReAct agent (`full_auto_agent`), one step per tool result seen so far."""
+    prompt = messages[0].content
+    results = {message.name: message.content for message in messages if message.type == "tool"}
+
+    if "get_top_nasdaq_gainer" not in results:
+        return tool_call_message("get_top_nasdaq_gainer", {})
+    gainer = json.loads(results["get_top_nasdaq_gainer"])
+    period = _search(r"Analyze past (\S+) days", prompt)
+
+    if "execute_python_code" not in results:
+        # Offline the generated script cannot download anything, which sends the agent to the fallback.
+        code = f"import yfinance as yf\nraise ConnectionError('no network for {gainer['symbol']}')\n"
+        return tool_call_message("execute_python_code", {"code": code})
+    if "generate_analysis_fallback" not in results:
+        return tool_call_message("generate_analysis_fallback", {"stock_symbol": gainer["symbol"], "period": period})
+    if "get_stock_news" not in results:
+        num_news = int(_search(r"get the latest (\d+) stock news", prompt))
+        return tool_call_message("get_stock_news", {"symbol": gainer["symbol"], "last_n_news": num_news})
+    if "send_email_by_smtp" not in results:
+        args = {
+            "subject": f"Daily stock summary: {gainer['symbol']}",
+            "body": results["generate_analysis_fallback"],
+            "from_email": _search(r"sender email: (\S+)", prompt),
+            "to_emails": json.loads(_search(r"recipient email address: (\[.*\])", prompt).replace("'", '"')),
+            "smtp_server": _search(r"SMTP server: (\S+)", prompt),
+            "smtp_port": int(_search(r"SMTP port: (\d+)", prompt)),
+            "use_ssl": _search(r"use SSL: (\S+)", prompt) == "True",
+        }
+        return tool_call_message("send_email_by_smtp", args)
+    return AIMessage(content="The summary was sent by email.")
+
+
+# === Synthetic market data ===
+def write_replay_dataset(root: str, symbols: List[str], days: int = 260, news: int = 10, seed: int = 7) -> str:
+    """
+    Write a random-walk recording of `symbols` in `ReplayProvider` layout.
+
+    Args:
+        root (str): Recording directory.
+        symbols (List[str]): Stock symbols.
+        days (int, optional): Trading days per symbol. Defaults to 260.
+        news (int, optional): News items per symbol. Defaults to 10.
+        seed (int, optional): Random seed, the same seed always writes the same data. Defaults to 7.
+
+    Returns:
+        str: `root`
+    """
+    rng = np.random.default_rng(seed)
+    history_dir, news_dir = Path(root) / "history", Path(root) / "news"
+    history_dir.mkdir(parents=True, exist_ok=True)
+    news_dir.mkdir(parents=True, exist_ok=True)
+
+    index = pd.bdate_range(end="2025-06-30", periods=days, tz="America/New_York", name="Date")
+    for symbol in symbols:
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, days)))
+        spread = np.abs(rng.normal(0, 0.01, days)) * close
+        frame = pd.DataFrame(
+            {
+                "Open": close + rng.normal(0, 0.5, days),
+                "High": close + spread,
+                "Low": close - spread,
+                "Close": close,
+                "Volume": rng.integers(1_000_000, 10_000_000, days).astype(float),
+                "Dividends": 0.0,
+                "Stock Splits": 0.0,
+            },
+            index=index,
+        )
+        frame.to_csv(history_dir / f"{symbol}.csv")
+
+        items = [
+            {
+                "id": f"{symbol}-{i}",
+                "content": {"title": f"{symbol} headline {i}", "pubDate": f"2025-06-{30 - i:02d}T12:00:00Z"},
+            }
+            for i in range(news)
+        ]
+        with open(news_dir / f"{symbol}.json", "w") as f:
+            json.dump(items, f)
+    return root
+
+
+# === Local SMTP sink ===
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for `smtplib`: EHLO, AUTH, MAIL, RCPT, DATA, RSET, NOOP, QUIT."""
+
+    def _reply(self, line: str):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        envelope = {"from": None, "to": []}
+        self._reply("220 localhost SMTP sink")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+
+            if verb in ("EHLO", "HELO"):
+                self._reply("250-localhost")
+                self._reply("250 AUTH PLAIN LOGIN")
+            elif verb == "AUTH":
+                parts = command.split()
+                if parts[1].upper() == "LOGIN":
+                    for prompt in ("VXNlcm5hbWU6", "UGFzc3dvcmQ6"):
+                        self._reply(f"334 {prompt}")
+                        self.rfile.readline()
+                elif len(parts) == 2:
+                    self._reply("334 ")
+                    self.rfile.readline()
+                self._reply("235 Authentication successful")
+            elif verb == "MAIL":
+                envelope = {"from": command.split(":", 1)[1].strip(" <>"), "to": []}
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                envelope["to"].append(command.split(":", 1)[1].strip(" <>"))
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b".\r\n", b".\n"):
+                        break
+                    lines.append(data[1:] if data.startswith(b"..") else data)
+                self.server.messages.append(dict(envelope, data=b"".join(lines).decode()))
+                self._reply("250 OK")
+            elif verb in ("RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """
+    Local SMTP server that accepts every message and keeps it in `messages`.
+
+    Use it as a context manager; it listens on 127.0.0.1 on a free port (`port`) and speaks plain
+    SMTP, so point the mailer at it with SSL off.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _SMTPHandler)
+        self.messages: List[dict] = []
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def host(self) -> str:
+        return self.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
@@ -1,9 +1,17 @@
-import pandas as pd
+"""
+python download_save_stock_symbols.py [nasdaq100|sp500]
+
+Refresh a symbol universe now and store a dated snapshot. The NASDAQ-100 list is also saved to
+`stock_symbols.json`, which seeds the universe on a fresh checkout.
+"""
 import json
+import sys
+
+from app.tools.core.universe import universe_manager
 
-url = "https://en.wikipedia.org/wiki/NASDAQ-100"
-tables = pd.read_html(url)
-df = tables[4]  # The 5th table contains the companies list
-symbols = df["Ticker"].tolist()
-with open("./stock_symbols.json", "w") as f:
-    json.dump(symbols, f)
\ No newline at end of file
+name = sys.argv[1] if len(sys.argv) > 1 else "nasdaq100"
+symbols = universe_manager.refresh(name)
+if name == "nasdaq100":
+    with open("./stock_symbols.json", "w") as f:
+        json.dump(symbols, f)
+print(f"Saved {len(symbols)} {name} symbols")
@@ -1,61 +1,518 @@
 """
 python main.py --full-auto
+python main.py --parallel
+python main.py --fast
+python main.py --top-n 20 --direction both
+python main.py --no-trace
+python main.py --resume <run-id>
+python main.py retry-mail
+python main.py track --replay ticks.csv
+python main.py serve
+python main.py backtest --period 10y
 """
 
+import asyncio
+import contextlib
+import contextvars
+import itertools
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import typer
 from dotenv import load_dotenv, find_dotenv
 import getpass
 import json
 import os
-from app import graph_agent, full_auto_agent, config
+from app import config
+from app.scheduler import load_jobs, Scheduler
+from app.tools.core.mailer import mailer
+from app.tools.core.memo import node_memo
+
+# The graphs, LLM clients, checkpoint savers and market data stack are imported by the commands that
+# use them, so `--help` and the commands that need none of them start without loading them.
 
 load_dotenv(find_dotenv())
 
-if "OPENAI_API_KEY" not in os.environ:
-    os.environ["OPENAI_API_KEY"] = getpass.getpass(prompt="Enter your OpenAI API key (required if using OpenAI): ")
 
-if "EMAIL_PASSWORD" not in os.environ:
-    os.environ["EMAIL_PASSWORD"] = getpass.getpass(
-        prompt="Enter your EMAIL_PASSWORD (required if google_app_password ): "
-    )
+def prompt_credentials(openai: bool = True, email: bool = True):
+    """Ask for the secrets missing from the environment, only once a command needs them."""
+    if openai and "OPENAI_API_KEY" not in os.environ:
+        os.environ["OPENAI_API_KEY"] = getpass.getpass(prompt="Enter your OpenAI API key (required if using OpenAI): ")
+
+    if email and "EMAIL_PASSWORD" not in os.environ:
+        os.environ["EMAIL_PASSWORD"] = getpass.getpass(
+            prompt="Enter your EMAIL_PASSWORD (required if google_app_password ): "
+        )
 
 
 app = typer.Typer()
 
 
-@app.command()
-def run(full_auto: bool = typer.Option(False, help="RUN full autonomous ReAct agent")):
+def print_update(step: dict):
+    for _, v in step.items():
+        # Join nodes of the parallel graph return no update, its sentiment branch writes `sentiment_messages`
+        for key in ("messages", "sentiment_messages"):
+            if v and v.get(key):
+                v[key][-1].pretty_print()
+
+
+def make_run_config(
+    top_n: int = 0,
+    direction: str = "gainers",
+    max_concurrency: int = 8,
+    memo: bool = True,
+    universe: str = None,
+    screen: str = None,
+    candidates: int = None,
+) -> dict:
+    return {
+        "configurable": {
+            "period": config.PERIOD,
+            "from_email": config.FROM_EMAIL,
+            "to_emails": config.TO_EMAILS,
+            "smtp_server": config.SMTP_SERVER,
+            "smtp_port": config.SMTP_PORT,
+            "smtp_ssl": config.SMTP_SSL,
+            "greeting": config.EMAIL_GREETING,
+            "num_news": config.NUM_NEWS,
+            "data_dir": config.DATA_DIR,
+            "top_n": top_n,
+            "direction": direction,
+            "universe": universe,
+            "screen": screen,
+            "memo": memo,
+            "candidates": candidates or config.ANALYSIS_CANDIDATES,
+        },
+        "max_concurrency": max_concurrency,
+    }
+
+
+# Run checkpoints, next to the same-day node memo
+CHECKPOINT_DB = node_memo.path
+
+
+def checkpoint_saver(asynchronous: bool = False):
+    """Saver of `CHECKPOINT_DB` as a context manager, creating its directory on first use."""
+    os.makedirs(os.path.dirname(CHECKPOINT_DB) or ".", exist_ok=True)
+    if asynchronous:
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+        return AsyncSqliteSaver.from_conn_string(CHECKPOINT_DB)
+
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    return SqliteSaver.from_conn_string(CHECKPOINT_DB)
+
+
+def build_agent(graph_name: str, checkpointer=None):
+    """Build a graph by its run name: full_auto_agent, digest_agent, graph_agent[_parallel][_fast]."""
+    if graph_name == "full_auto_agent":
+        from app import full_auto_agent
+
+        return full_auto_agent.build_graph(checkpointer=checkpointer)
+    if graph_name == "digest_agent":
+        from app import digest_agent
+
+        return digest_agent.build_graph(checkpointer=checkpointer)
+
+    from app import graph_agent
+
+    return graph_agent.build_graph(
+        parallel="_parallel" in graph_name, fast=graph_name.endswith("_fast"), checkpointer=checkpointer
+    )
+
+
+def is_async(graph_name: str) -> bool:
+    return graph_name == "digest_agent" or "_parallel" in graph_name
+
+
+class WarmAgents:
+    """
+    Compiled graphs and checkpoint savers kept for the lifetime of `serve` and shared by its jobs.
+
+    Async graphs run on one long-lived event loop thread, which also owns the async saver, so no
+    job pays for building graphs or opening the checkpoint database.
+    """
+
+    def __init__(self, checkpoint: bool = True):
+        self.checkpoint = checkpoint
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="agents-loop", daemon=True)
+        self._thread.start()
+        self._stack = contextlib.ExitStack()
+        self._saver = self._stack.enter_context(checkpoint_saver()) if checkpoint else None
+        self._async_saver_cm = None
+        self._async_saver = None
+        self._agents = {}
+        self._lock = threading.Lock()
+
+    def get(self, graph_name: str):
+        """The compiled graph, built on first use."""
+        with self._lock:
+            if graph_name not in self._agents:
+                checkpointer = None
+                if self.checkpoint:
+                    checkpointer = self._async_checkpointer() if is_async(graph_name) else self._saver
+                self._agents[graph_name] = build_agent(graph_name, checkpointer)
+            return self._agents[graph_name]
+
+    def _async_checkpointer(self):
+        if self._async_saver is None:
+            self._async_saver_cm = checkpoint_saver(asynchronous=True)
+            self._async_saver = self.run(self._async_saver_cm.__aenter__())
+        return self._async_saver
+
+    def run(self, coroutine):
+        """Run a coroutine on the shared loop and wait for it, in the caller's context (e.g. its tracer)."""
+        context = contextvars.copy_context()
+
+        async def in_context():
+            for var, value in context.items():
+                var.set(value)
+            return await coroutine
+
+        return asyncio.run_coroutine_threadsafe(in_context(), self.loop).result()
+
+    def close(self):
+        if self._async_saver_cm is not None:
+            self.run(self._async_saver_cm.__aexit__(None, None, None))
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self._stack.close()
+
+
+def run_agent(
+    graph_name: str,
+    run_config: dict,
+    trace: bool = True,
+    checkpoint: bool = True,
+    run_id: str = None,
+    resume: bool = False,
+    agents: WarmAgents = None,
+):
+    """
+    Stream one run of a graph, printing every update, and the trace summary at the end.
+
+    With `checkpoint`, every step is saved to `CHECKPOINT_DB` under the run id, and a failed run can
+    be continued with `resume=True` from the step that failed. With `agents`, the warm graph (and
+    its checkpoint setting) is used instead of building one for this run.
+    """
+    from app.tracing import RunTracer
+
+    inputs = None if resume else {"messages": []}
+
+    run_id = run_id or uuid.uuid4().hex
+    run_config = dict(run_config, metadata={"graph": graph_name})
+    run_config["configurable"] = dict(run_config["configurable"], thread_id=run_id)
+    print(f"Run {run_id}")
+
+    tracer = RunTracer(graph=graph_name, run_id=run_id)
+    if trace:
+        run_config = dict(run_config, callbacks=[tracer])
+
+    checkpoint = agents.checkpoint if agents else checkpoint
+
+    async def astream(agent):
+        async for step in agent.astream(inputs, config=run_config, stream_mode="updates"):
+            print_update(step)
+
+    def stream(agent):
+        for step in agent.stream(
+            inputs,
+            config=run_config,
+            # config,
+            stream_mode="updates",
+        ):
+            # print(step)
+            print_update(step)
+
+    try:
+        with tracer.activate() if trace else contextlib.nullcontext():
+            if agents:
+                if is_async(graph_name):
+                    agents.run(astream(agents.get(graph_name)))
+                else:
+                    stream(agents.get(graph_name))
+            elif is_async(graph_name):
+
+                async def cold_astream():
+                    saver = checkpoint_saver(asynchronous=True) if checkpoint else contextlib.nullcontext()
+                    async with saver as checkpointer:
+                        await astream(build_agent(graph_name, checkpointer))
+
+                asyncio.run(cold_astream())
+            else:
+                saver = checkpoint_saver() if checkpoint else contextlib.nullcontext()
+                with saver as checkpointer:
+                    stream(build_agent(graph_name, checkpointer))
+            # The graph only queues its emails, wait for their delivery before the run ends
+            flush_mail()
+            prune_artifacts()
+    except Exception:
+        if checkpoint:
+            print(f"Run {run_id} failed, continue it with: python main.py --resume {run_id}")
+        raise
+    finally:
+        if trace:
+            print(tracer.summary())
+
+
+def flush_mail():
+    """Wait for the emails queued by the run, and point at the dead letters if some could not be delivered."""
+    dead = mailer.stats["dead"]
+    mailer.flush()
+    if mailer.stats["dead"] > dead:
+        print(
+            f"{mailer.stats['dead'] - dead} email(s) could not be delivered, see {mailer.dead_letter_path};"
+            " send them again with: python main.py retry-mail"
+        )
+
+
+def prune_artifacts():
+    """Delete the run artifacts not written for `artifact_max_age_days`, the ones of recent runs stay resumable."""
+    from app.tools.core.artifacts import artifact_store
+
+    deleted = artifact_store.prune(config.ARTIFACT_MAX_AGE_DAYS)
+    if deleted:
+        print(f"Deleted {deleted} artifact(s) older than {config.ARTIFACT_MAX_AGE_DAYS} days")
+
+
+def resume_run(run_id: str, trace: bool = True):
+    """Continue a checkpointed run from its last completed step, with the graph and options it started with."""
+    with checkpoint_saver() as saver:
+        checkpoint = saver.get_tuple({"configurable": {"thread_id": run_id}})
+    if checkpoint is None:
+        print(f"No checkpoint for run {run_id} in {CHECKPOINT_DB}")
+        return
+
+    # The run config's scalar options are stored with every checkpoint
+    metadata = checkpoint.metadata
+    run_config = make_run_config(
+        top_n=metadata.get("top_n", 0),
+        direction=metadata.get("direction", "gainers"),
+        memo=metadata.get("memo", True),
+        universe=metadata.get("universe"),
+        screen=metadata.get("screen"),
+        candidates=metadata.get("candidates"),
+    )
+    run_agent(metadata["graph"], run_config, trace, run_id=run_id, resume=True)
+
+
+@app.callback(invoke_without_command=True)
+def run(
+    ctx: typer.Context,
+    full_auto: bool = typer.Option(False, help="RUN full autonomous ReAct agent"),
+    parallel: bool = typer.Option(False, help="Run the analysis and sentiment branches concurrently (async graph)"),
+    top_n: int = typer.Option(0, help="Analyze the top N movers concurrently and send one digest email"),
+    direction: str = typer.Option("gainers", help="Movers for --top-n: gainers, losers or both"),
+    screen: str = typer.Option(None, help="Screen ranking the symbols, defaults to `screen` in config.json"),
+    max_concurrency: int = typer.Option(8, help="Maximum number of symbols analyzed at once with --top-n"),
+    candidates: int = typer.Option(
+        None, help="Analysis scripts generated per LLM call and raced, defaults to `analysis_candidates` in config.json"
+    ),
+    fast: bool = typer.Option(False, help="Get the top gainer and its data without LLM calls"),
+    memo: bool = typer.Option(True, help="Reuse today's data, analysis and sentiment of the same symbol"),
+    checkpoint: bool = typer.Option(True, help="Save a checkpoint after every step, to resume failed runs"),
+    resume: str = typer.Option(None, help="Continue a failed run by its run id"),
+    trace: bool = typer.Option(True, help="Record node latency, LLM tokens and tool times to data/traces"),
+):
+    """Run the agent once, unless a command is given."""
+    if ctx.invoked_subcommand is not None:
+        return
+    prompt_credentials()
+
+    if resume:
+        resume_run(resume, trace)
+        return
+
     if full_auto:
-        agent = full_auto_agent.build_graph()
+        graph_name = "full_auto_agent"
+    elif top_n > 0:
+        graph_name = "digest_agent"
     else:
-        agent = graph_agent.build_graph()
+        graph_name = ("graph_agent_parallel" if parallel else "graph_agent") + ("_fast" if fast else "")
 
-    print(agent.get_graph().draw_ascii())
+    print(build_agent(graph_name).get_graph().draw_ascii())
 
     # png_bytes = agent.get_graph().draw_mermaid_png()
     # with open("graph.png", "wb") as f:
     #     f.write(png_bytes)
 
-    for step in agent.stream(
-        {
-            "messages": [],
-        },
-        config={
-            "configurable": {
-                "period": config.PERIOD,
-                "from_email": config.FROM_EMAIL,
-                "to_emails": config.TO_EMAILS,
-                "smtp_server": config.SMTP_SERVER,
-                "num_news": config.NUM_NEWS,
-                "data_dir": config.DATA_DIR,
-            }
-        },
-        # config,
-        stream_mode="updates",
-    ):
-        # print(step)
-        for _, v in step.items():
-            v["messages"][-1].pretty_print()
+    run_config = make_run_config(top_n, direction, max_concurrency, memo, screen=screen, candidates=candidates)
+    run_agent(graph_name, run_config, trace, checkpoint)
+
+
+@app.command("retry-mail")
+def retry_mail():
+    """Send the emails that could not be delivered again."""
+    prompt_credentials(openai=False)
+    futures = mailer.requeue_dead_letters()
+    flush_mail()
+    sent = sum(1 for future in futures if future.exception() is None)
+    print(f"{sent}/{len(futures)} email(s) delivered")
+
+
+@app.command()
+def track(
+    top_k: int = typer.Option(10, help="Number of leaders kept ranked"),
+    interval: float = typer.Option(60, help="Seconds between price polls"),
+    replay: str = typer.Option(None, help="Replay a tick file (CSV: timestamp,symbol,price) instead of polling"),
+    speed: float = typer.Option(0, help="Replay speed relative to real time, 0 for as fast as possible"),
+    universe: str = typer.Option(None, help="Symbol universe, defaults to `universe` in config.json"),
+    run_on_change: bool = typer.Option(True, help="Run the agent on the new top gainer when the leader changes"),
+    min_run_interval: float = typer.Option(900, help="Minimum seconds between two triggered runs"),
+    fast: bool = typer.Option(False, help="Get the top gainer and its data without LLM calls"),
+    trace: bool = typer.Option(True, help="Record node latency, LLM tokens and tool times to data/traces"),
+):
+    """Track the top gainers live and run the agent whenever the leader changes."""
+    from app.tools.core.gainer_tracker import (
+        GainerTracker,
+        load_prior_closes,
+        poll_ticks,
+        replay_ticks,
+        session_day,
+        set_active_tracker,
+    )
+    from app.tools.core.universe import universe_manager
+
+    if run_on_change:
+        prompt_credentials()
+    symbols = universe_manager.get(universe or config.UNIVERSE)
+
+    if replay:
+        ticks = replay_ticks(replay, speed)
+        first = next(ticks, None)
+        if first is None:
+            print(f"No ticks in {replay}")
+            return
+        day = session_day(first.ts)
+        ticks = itertools.chain([first], ticks)
+    else:
+        ticks = poll_ticks(symbols, interval)
+        # Today's session, started or not: before the open there is no bar of it yet
+        day = session_day()
+
+    tracker = GainerTracker(top_k=top_k, prior_closes=load_prior_closes(symbols, day))
+    # The agent's symbol tool now answers from the tracker instead of downloading a panel.
+    set_active_tracker(tracker)
+
+    graph_name = "graph_agent_fast" if fast else "graph_agent"
+    runner = ThreadPoolExecutor(max_workers=1)
+    running = None
+    last_run = float("-inf")
+
+    def on_leader_change(previous, current):
+        nonlocal running, last_run
+        print(f"New leader: {current['symbol']} {current['pct']} (was {previous['symbol'] if previous else '-'})")
+        if not run_on_change or (running and not running.done()):
+            return
+        if time.monotonic() - last_run < min_run_interval:
+            return
+        last_run = time.monotonic()
+        running = runner.submit(run_agent, graph_name, make_run_config(), trace)
+
+    tracker.on_leader_change(on_leader_change)
+    try:
+        changes = tracker.run(ticks)
+    except KeyboardInterrupt:
+        changes = None
+    finally:
+        runner.shutdown(wait=True)
+        set_active_tracker(None)
+
+    if changes is not None:
+        print(f"Stream ended after {changes} leader changes")
+    for rank, leader in enumerate(tracker.leaders(), start=1):
+        print(f"{rank:>3}. {leader['symbol']:<6} {leader['pct']:>7} {leader['price']:>10.2f}")
+
+
+@app.command()
+def serve(
+    max_concurrency: int = typer.Option(2, help="Jobs run at once"),
+    checkpoint: bool = typer.Option(True, help="Save a checkpoint after every step, to resume failed runs"),
+    trace: bool = typer.Option(True, help="Record node latency, LLM tokens and tool times to data/traces"),
+):
+    """Run the jobs of `schedules` in config.json on their cron schedules, with warm graphs and clients."""
+    jobs = load_jobs(config.SCHEDULES)
+    if not jobs:
+        print("No schedules in config.json, see app/scheduler.py for the format")
+        return
+    prompt_credentials()
+
+    from app.tools.core.universe import universe_manager
+
+    # Pay the startup costs once: graphs, checkpoint savers, symbol universes. Old artifacts are deleted
+    # now, then after every run
+    prune_artifacts()
+    agents = WarmAgents(checkpoint)
+    for job in jobs:
+        agents.get(job["graph"])
+        universe_manager.get(job.get("universe") or config.UNIVERSE)
+
+    def run_job(job: dict):
+        print(f"Job {job['name']} started")
+        run_config = make_run_config(
+            top_n=job.get("top_n", 5 if job["graph"] == "digest_agent" else 0),
+            direction=job.get("direction", "gainers"),
+            universe=job.get("universe"),
+            screen=job.get("screen"),
+            candidates=job.get("candidates"),
+        )
+        run_agent(job["graph"], run_config, trace, agents=agents)
+
+    scheduler = Scheduler(jobs, run_job, max_concurrency)
+    for name, due in scheduler.next_runs().items():
+        print(f"{name:<24} next run {due.isoformat()}")
+
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        print("Stopping, waiting for running jobs")
+    finally:
+        scheduler.shutdown()
+        agents.close()
+
+
+@app.command()
+def backtest(
+    screen: str = typer.Option(None, help="Screen picking the stocks, defaults to `screen` in config.json"),
+    universe: str = typer.Option(None, help="Symbol universe, defaults to `universe` in config.json"),
+    period: str = typer.Option("10y", help="History replayed, e.g. 2y, 5y, 10y, max"),
+    top_k: int = typer.Option(1, help="Stocks picked per day"),
+    horizons: str = typer.Option("1,5,20", help="Forward holding periods in trading days, comma-separated"),
+):
+    """Replay the stock selection over years of daily bars: forward returns, hit rates and drawdowns of the picks."""
+    from app.tools.core.backtest import run_backtest
+
+    result = run_backtest(universe, screen, period, top_k, [int(h) for h in horizons.split(",")])
+    print(
+        f"{result['screen']} on {result['universe']} ({result['symbols']} symbols), top {result['top_k']},"
+        f" {result['start']} .. {result['end']}, {result['days']} days"
+    )
+    columns = {
+        "picks": "signals",
+        "mean": "mean_return",
+        "median": "median_return",
+        "hit": "hit_rate",
+        "universe": "universe_return",
+        "excess": "excess_return",
+        "beat": "beat_rate",
+        "avg dd": "avg_drawdown",
+        "worst dd": "worst_drawdown",
+    }
+
+    def cell(value) -> str:
+        return "-" if value is None else str(value) if isinstance(value, int) else f"{value:.2%}"
+
+    print(f"{'':<5}" + "".join(f"{title:>10}" for title in columns))
+    for name, stats in result["horizons"].items():
+        print(f"{name:<5}" + "".join(f"{cell(stats[key]):>10}" for key in columns.values()))
+    equity = result["equity"]
+    print(
+        f"Held one day at a time: {cell(equity['total_return'])} total, {cell(equity['max_drawdown'])} max drawdown"
+        f" (universe {cell(equity['universe_total_return'])}, {cell(equity['universe_max_drawdown'])})"
+    )
 
 
 # for step in agent.stream(
@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.fakes import ScriptedChatModel, SMTPSink, graph_agent_script, write_replay_dataset
+
+
+@pytest.fixture
+def offline_app(tmp_path, monkeypatch):
+    """
+    The app pointed at a synthetic replay recording, a scripted chat model and a local SMTP sink,
+    with every store under `tmp_path`, like `benchmarks.bench_pipeline.prepare` but undone after the test.
+
+    Yields a namespace with `llm` (the `ScriptedChatModel`, counting its `calls`), `sink`, `symbols`
+    and `run_config` (as built by `main.make_run_config`).
+    """
+    from app import config, graph_agent
+    from app.tools.core import providers
+    from app.tools.core.artifacts import artifact_store
+    from app.tools.core.code_cache import code_cache
+    from app.tools.core.indicators import indicator_store
+    from app.tools.core.mailer import mailer
+    from app.tools.core.market_store import market_store
+    from app.tools.core.memo import node_memo
+    from app.tools.core.universe import universe_manager
+
+    symbols = [f"SYM{i:03d}" for i in range(8)]
+    recording = write_replay_dataset(str(tmp_path / "recording"), symbols)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("EMAIL_PASSWORD", "test")
+    monkeypatch.setenv("MARKET_DATA_PROVIDER", f"replay:{recording}")
+    monkeypatch.setattr(providers, "_provider", providers.ReplayProvider(recording))
+
+    data_dir = tmp_path / "data"
+    monkeypatch.setattr(config, "DATA_DIR", str(data_dir))
+    monkeypatch.setattr(config, "UNIVERSE", "offline")
+    monkeypatch.setattr(config, "LLM_CACHE_NODES", [])
+    monkeypatch.setitem(universe_manager.custom, "offline", symbols)
+    monkeypatch.setattr(market_store, "root", data_dir / "store")
+    monkeypatch.setattr(artifact_store, "root", data_dir / "artifacts")
+    monkeypatch.setattr(indicator_store, "root", data_dir / "indicators")
+    monkeypatch.setattr(code_cache, "path", str(data_dir / "code_cache.json"))
+    monkeypatch.setattr(code_cache, "_entries", None)
+    monkeypatch.setattr(node_memo, "path", str(data_dir / "checkpoints.sqlite"))
+    monkeypatch.setattr(node_memo, "_conn", None)
+    monkeypatch.setattr(mailer, "dead_letter_path", str(data_dir / "dead_letter.jsonl"))
+
+    llm = ScriptedChatModel(script=graph_agent_script)
+    monkeypatch.setattr(graph_agent, "llm", llm, raising=False)
+
+    with SMTPSink() as sink:
+        monkeypatch.setattr(config, "SMTP_SERVER", sink.host)
+        monkeypatch.setattr(config, "SMTP_PORT", sink.port)
+        monkeypatch.setattr(config, "SMTP_SSL", False)
+
+        from main import make_run_config
+
+        yield SimpleNamespace(llm=llm, sink=sink, symbols=symbols, run_config=make_run_config(memo=False))
+        mailer.flush()
@@ -1,4 +1,105 @@
-from app.tools.core.analysis import generate_stock_analysis_code
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.tools.core import analysis
+from app.tools.core.analysis import (
+    analyze_panel,
+    generate_analysis_batch,
+    generate_stock_analysis_code,
+    validate_analysis,
+)
+from app.tools.core.market_store import MarketDataStore
 
 def test_generate_stock_analysis_code():
-    print(generate_stock_analysis_code("TSLA"))
\ No newline at end of file
+    print(generate_stock_analysis_code("TSLA"))
+
+def test_generated_code_is_tracked_without_its_markdown_fence(tmp_path, monkeypatch):
+    from app.tools.core.code_cache import code_cache
+
+    reply = 'Here is the code:\n```python\nset_result({"stock": "TSLA", "rows": len(df)})\n```\n'
+    model = SimpleNamespace(invoke=lambda prompt: SimpleNamespace(content=reply))
+    monkeypatch.setattr(analysis, "init_chat_model", lambda name: model)
+    monkeypatch.setattr(code_cache, "path", str(tmp_path / "code_cache.json"))
+    monkeypatch.setattr(code_cache, "_entries", None)
+
+    code = generate_stock_analysis_code("TSLA")
+    assert code == 'set_result({"stock": "TSLA", "rows": len(df)})'
+
+    # The script that runs is the one cached, and replayed for another symbol
+    code_cache.report(code, succeeded=True)
+    assert generate_stock_analysis_code("NVDA") == 'set_result({"stock": "NVDA", "rows": len(df)})'
+
+
+def test_analyze_panel():
+    index = pd.bdate_range("2025-01-01", periods=6, name="Date")
+    close = pd.DataFrame(
+        {
+            "UP": [10.0, 11.0, 12.0, 13.0, 14.0, 15.0],
+            "DOWN": [15.0, 14.0, 13.0, 12.0, 11.0, 10.0],
+            "FLAT": [5.0] * 6,
+        },
+        index=index,
+    )
+    panel = pd.concat({"Close": close}, axis=1)
+
+    result = analyze_panel(panel, period="5d")
+
+    assert result["UP"]["trend"] == "upward 📈"
+    assert result["DOWN"]["trend"] == "downward 📉"
+    assert result["FLAT"]["trend"] == "flat ➖"
+    assert result["UP"]["close_prices"] == [11.0, 12.0, 13.0, 14.0, 15.0]
+    expected = close["UP"].pct_change().tail(5)
+    assert result["UP"]["average_daily_change"] == round(expected.mean(), 4)
+    assert np.isclose(result["UP"]["volatility"], expected.std())
+    # The fallback matches the schema of the generated analysis
+    assert validate_analysis(result["UP"]) is result["UP"]
+
+
+def test_validate_analysis():
+    analysis = {
+        "stock": "AAPL",
+        "period": "5d",
+        "average_daily_change": 0.2,
+        "volatility": 1,
+        "trend": "UP",
+        "close_prices": [1.0, 2],
+        "extra": "kept",
+    }
+    assert validate_analysis(analysis) is analysis
+
+    with pytest.raises(ValueError, match="expected an analysis dict"):
+        validate_analysis("AAPL is up")
+    with pytest.raises(ValueError, match="^volatility should be a number, close_prices is missing$"):
+        invalid = {key: value for key, value in analysis.items() if key != "close_prices"}
+        validate_analysis(dict(invalid, volatility="1"))
+
+
+def test_generate_analysis_batch_reads_one_panel_from_the_store(tmp_path, monkeypatch):
+    rng = np.random.default_rng(5)
+    index = pd.bdate_range(end="2025-06-30", periods=30, tz="America/New_York", name="Date")
+    history = {}
+    for symbol in ("AAPL", "MSFT", "NVDA"):
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(index))))
+        history[symbol] = pd.DataFrame({field: close for field in ("Open", "High", "Low", "Close", "Volume")}, index)
+    downloads = []
+
+    def fetch_many(symbols, period):
+        downloads.append(symbols)
+        # NVDA has no bars
+        frames = {symbol: history[symbol].tail(5) for symbol in symbols if symbol != "NVDA"}
+        return pd.concat(frames, axis=1).swaplevel(axis=1)
+
+    store = MarketDataStore(tmp_path, fetch=lambda *args, **kwargs: pd.DataFrame(), fetch_many=fetch_many)
+    monkeypatch.setattr(analysis, "market_store", store)
+
+    result = generate_analysis_batch(["AAPL", "MSFT", "NVDA"], "5d")
+
+    assert downloads == [["AAPL", "MSFT", "NVDA"]]
+    assert sorted(result) == ["AAPL", "MSFT"]
+    for symbol in result:
+        # The same analysis as the single-symbol fallback
+        frame = store.get(symbol, "5d")
+        assert result[symbol] == analyze_panel(frame[["Close"]].set_axis([symbol], axis=1), period="5d")[symbol]
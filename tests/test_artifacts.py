@@ -0,0 +1,47 @@
+import os
+import time
+
+import pandas as pd
+
+from app.tools.core.artifacts import ArtifactStore
+
+
+def test_put_and_get_round_trip(tmp_path):
+    store = ArtifactStore(str(tmp_path), cache_size=1)
+    index = pd.bdate_range("2025-03-03", periods=3, tz="America/New_York", name="Date").as_unit("ns")
+    frame = pd.DataFrame({"Close": [1.0, 2.0, 3.1], "Volume": [1e6, 2e6, 3e6]}, index=index)
+
+    frame_ref = store.put(frame, "frame", "AAPL")
+    news_ref = store.put([{"id": "n1", "content": {"title": "t"}}], "news", "AAPL")
+    text_ref = store.put('{"stock": "AAPL"}', "analysis", "AAPL")
+
+    assert frame_ref["symbol"] == "AAPL" and frame_ref["bytes"] > 0
+    assert set(frame_ref) == {"id", "kind", "symbol", "path", "bytes"}
+    assert sorted(os.listdir(frame_ref["path"])) == ["index.npy", "meta.json", "values.npy"]
+
+    # The cache holds one value, the others are read back from disk: the frame that was put, memory-mapped
+    reloaded = ArtifactStore(str(tmp_path))
+    loaded = reloaded.get(frame_ref)
+    pd.testing.assert_frame_equal(loaded, frame, check_freq=False)
+    assert str(loaded.index.tz) == "America/New_York"
+    assert reloaded.get(news_ref) == [{"id": "n1", "content": {"title": "t"}}]
+    assert reloaded.get(text_ref) == '{"stock": "AAPL"}'
+
+
+def test_same_content_is_stored_once_and_pruned_by_age(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    first = store.put("same", "analysis")
+    second = store.put("same", "analysis", "MSFT")
+    assert first["id"] == second["id"] and first["path"] == second["path"]
+    assert len(list((tmp_path / "analysis").iterdir())) == 1
+
+    store.put("other", "analysis")
+    index = pd.bdate_range("2025-03-03", periods=2, tz="UTC", name="Date")
+    frame = store.put(pd.DataFrame({"Close": [1.0, 2.0]}, index=index), "frame")
+    assert store.put(pd.DataFrame({"Close": [1.0, 2.0]}, index=index), "frame") == frame
+
+    old = time.time() - 10 * 86400
+    os.utime(first["path"], (old, old))
+    os.utime(frame["path"], (old, old))
+    assert store.prune(max_age_days=7) == 2
+    assert not os.path.exists(first["path"]) and not os.path.exists(frame["path"])
@@ -0,0 +1,94 @@
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.tools.core import backtest as backtest_module
+from app.tools.core.backtest import backtest, universe_membership
+from app.tools.core.screener import SCREENS, rank
+from app.tools.core.universe import UniverseManager
+
+
+def _panel(days: int = 120, symbols: int = 12, seed: int = 11) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end="2025-06-30", periods=days, tz="America/New_York", name="Date")
+    columns = [f"S{i}" for i in range(symbols)]
+    close = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.02, (days, symbols)), axis=0)), index, columns)
+    # A symbol listed halfway through, and a missing bar
+    close.iloc[: days // 2, 3] = np.nan
+    close.iloc[days // 3, 5] = np.nan
+    fields = {"Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close, "Volume": close * 0 + 1e6}
+    return pd.concat(fields, axis=1)
+
+
+def test_backtest_matches_a_day_by_day_replay():
+    panel = _panel()
+    close = panel["Close"]
+    result = backtest(panel, SCREENS["gainers"], top_k=2, horizons=(1, 5))
+
+    # Replay the live selection rule one day at a time
+    picks, forward, worst = [], [], []
+    for t in range(1, len(panel)):
+        for row in rank(SCREENS["gainers"], panel.iloc[: t + 1], top_k=2):
+            entry = close[row["symbol"]].iloc[t]
+            if t + 5 < len(panel):
+                future = close[row["symbol"]].iloc[t + 1 : t + 6]
+                forward.append(future.iloc[-1] / entry - 1)
+                worst.append(min(future.min() / entry - 1, 0))
+            picks.append(t)
+
+    stats = result["horizons"]["5d"]
+    known = ~np.isnan(forward)
+    assert result["days"] == len(set(picks))
+    assert stats["signals"] == known.sum()
+    assert stats["mean_return"] == pytest.approx(np.mean(np.array(forward)[known]), abs=1e-4)
+    assert stats["hit_rate"] == pytest.approx(np.mean(np.array(forward)[known] > 0), abs=1e-4)
+    assert stats["worst_drawdown"] == pytest.approx(np.nanmin(worst), abs=1e-4)
+
+    universe = (close.shift(-1) / close - 1).iloc[1:-1].mean(axis=1).mean()
+    assert result["horizons"]["1d"]["universe_return"] == pytest.approx(universe, abs=1e-4)
+
+
+def test_backtest_without_enough_history_reports_no_picks():
+    result = backtest(_panel(days=2), SCREENS["gainers"], horizons=(20,))
+
+    assert result["days"] == 1
+    assert result["horizons"]["20d"]["signals"] == 0
+    assert result["horizons"]["20d"]["mean_return"] is None
+    assert result["equity"]["total_return"] == 0
+
+
+def test_backtest_only_ranks_the_constituents_of_each_day(tmp_path, monkeypatch):
+    panel = _panel()
+    close = panel["Close"]
+    # The universe lost S0-S3 and gained S8-S11 on April 1st
+    for day, symbols in (("2024-12-02", range(0, 8)), ("2025-04-01", range(4, 12))):
+        (tmp_path / "sp500").mkdir(exist_ok=True)
+        snapshot = {"name": "sp500", "date": day, "fetched_at": time.time(), "symbols": [f"S{i}" for i in symbols]}
+        (tmp_path / "sp500" / f"{day}.json").write_text(json.dumps(snapshot))
+    manager = UniverseManager(str(tmp_path), custom={"watchlist": ["S0", "S1"]})
+    monkeypatch.setattr(backtest_module, "universe_manager", manager)
+    assert universe_membership("watchlist", panel.index).all().all()
+
+    members = universe_membership("sp500", panel.index)
+    april = members.index.searchsorted(pd.Timestamp("2025-04-01", tz="America/New_York"))
+    assert members.iloc[:april].sum().to_dict() == {f"S{i}": april if i < 8 else 0 for i in range(12)}
+    assert members.iloc[april:].sum().to_dict() == {f"S{i}": 0 if i < 4 else len(panel) - april for i in range(12)}
+
+    result = backtest(panel, SCREENS["gainers"], top_k=2, horizons=(1,), members=members)
+
+    # Replay with the constituents of each day only
+    forward, universe = [], []
+    for t in range(1, len(panel) - 1):
+        symbols = members.columns[members.iloc[t].to_numpy()]
+        returns = close[symbols].iloc[t + 1] / close[symbols].iloc[t] - 1
+        picks = rank(SCREENS["gainers"], panel.iloc[: t + 1].loc[:, (slice(None), symbols)], top_k=2)
+        forward += [returns[row["symbol"]] for row in picks if not np.isnan(returns[row["symbol"]])]
+        universe.append(returns.mean())
+
+    stats = result["horizons"]["1d"]
+    assert stats["signals"] == len(forward)
+    assert stats["mean_return"] == pytest.approx(np.mean(forward), abs=1e-4)
+    assert stats["universe_return"] == pytest.approx(np.mean(universe), abs=1e-4)
@@ -0,0 +1,43 @@
+from app.tools.core.code_cache import CodeCache, make_key
+
+
+def test_make_key_normalizes_whitespace():
+    assert make_key("analyze  {symbol}\n  now", "5d") == make_key("analyze {symbol} now", "5d")
+    assert make_key("analyze {symbol}", "5d") != make_key("analyze {symbol}", "1mo")
+
+
+def test_successful_script_is_reused_for_other_symbols(tmp_path):
+    cache = CodeCache(str(tmp_path / "code_cache.json"))
+    key = make_key("prompt", "5d")
+    code = 'change = df["Close"].pct_change()\nset_result({"stock": "AAPL", "average_daily_change": change.mean()})'
+
+    cache.track(code, key, "AAPL")
+    assert cache.get(key, "MSFT") is None
+    cache.report(code, succeeded=True)
+
+    reloaded = CodeCache(cache.path)
+    assert reloaded.get(key, "MSFT") == (
+        'change = df["Close"].pct_change()\nset_result({"stock": "MSFT", "average_daily_change": change.mean()})'
+    )
+
+
+def test_symbol_is_only_replaced_as_a_quoted_literal(tmp_path):
+    cache = CodeCache(str(tmp_path / "code_cache.json"))
+    key = make_key("prompt", "5d")
+    code = 'set_result({"stock": "A", "close_prices": df["Close"].tolist()})'
+    cache.track(code, key, "A")
+    cache.report(code, succeeded=True)
+
+    assert cache.get(key, "B") == 'set_result({"stock": "B", "close_prices": df["Close"].tolist()})'
+
+
+def test_failed_cached_script_is_invalidated(tmp_path):
+    cache = CodeCache(str(tmp_path / "code_cache.json"))
+    key = make_key("prompt", "5d")
+    cache.track("print('A')", key, "A")
+    cache.report("print('A')", succeeded=True)
+
+    code = cache.get(key, "B")
+    assert code == "print('B')"
+    cache.report(code, succeeded=False)
+    assert cache.get(key, "B") is None
@@ -0,0 +1,127 @@
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.tools.core.code_execution import SandboxPool, execute_python_code, run_python_candidates, run_python_code
+
+
+@pytest.fixture
+def pool():
+    pool = SandboxPool(size=1, max_jobs=2, cpu_limit=1)
+    yield pool
+    pool.shutdown()
+
+
+def test_execute_python_code():
+    result = execute_python_code("import pandas as pd\nprint(pd.Series([1, 2]).sum())")
+    assert result == {"status": "success", "output": "3\n", "error": "", "result": None}
+
+    # A failing script is a failure even when it printed nothing
+    failed = execute_python_code("import sys\nsys.exit(2)")
+    assert failed["status"] == "failed"
+    assert failed["error"] == "Exited with code 2"
+
+
+def test_pool_reuses_and_recycles_workers(pool):
+    pids = [pool.run("import os\nprint(os.getpid())")["stdout"] for _ in range(3)]
+    assert pids[0] == pids[1]
+    assert pids[2] != pids[1]
+
+
+def test_pool_timeout_kills_worker(pool):
+    with pytest.raises(TimeoutError):
+        pool.run("import time\ntime.sleep(10)", timeout=0.5)
+    assert pool.run("print('alive')")["stdout"] == "alive\n"
+
+
+def test_pool_drops_a_worker_killed_while_idle(pool):
+    pool.run("print('warm')")
+    # A losing candidate's worker killed just as it was put back
+    worker = pool._idle.get_nowait()
+    worker.kill()
+    pool._idle.put(worker)
+
+    assert pool.run("print('alive')")["stdout"] == "alive\n"
+    assert worker not in pool._workers
+
+
+def test_pool_cpu_limit(pool):
+    with pytest.raises(RuntimeError):
+        pool.run("while True:\n    pass", timeout=10)
+
+
+def test_frame_in_and_typed_result_out():
+    index = pd.bdate_range(end="2025-06-30", periods=5, tz="America/New_York", name="Date")
+    frame = pd.DataFrame({"Close": [10.0, 11.0, 12.0, 11.5, 13.0], "Volume": np.arange(5) * 100}, index=index)
+    code = """
+assert df.index.tz is not None
+df["Change"] = df["Close"].diff()
+set_result({"last": df["Close"].iloc[-1], "changes": df["Change"].dropna().to_numpy(), "day": df.index[-1]})
+"""
+
+    result = run_python_code(code, frame)
+    assert result["status"] == "success"
+    assert result["output"] == ""
+    assert result["result"] == {"last": 13.0, "changes": [1.0, 1.0, -0.5, 1.5], "day": index[-1].isoformat()}
+    # Writes from the sandbox never reach the caller's frame
+    assert list(frame.columns) == ["Close", "Volume"]
+
+    def validate(value):
+        if value["last"] < 100:
+            raise ValueError("last < 100")
+        return value
+
+    invalid = run_python_code(code, frame, validate)
+    assert invalid["status"] == "failed"
+    assert invalid["error"] == "Invalid result: last < 100"
+
+
+def test_first_valid_candidate_wins_and_the_rest_are_cancelled():
+    pool = SandboxPool(size=3)
+    try:
+        codes = [
+            "raise ValueError('broken')",
+            "set_result({'ok': True})",
+            "import time\ntime.sleep(30)\nset_result({'ok': 'late'})",
+        ]
+        accepted = []
+
+        def accept(index, result):
+            accepted.append(index)
+            return result["returncode"] == 0
+
+        start = time.perf_counter()
+        winner, outcomes = pool.run_first(codes, accept, timeout=60)
+        assert time.perf_counter() - start < 10
+        assert winner == 1
+        # The broken one finishes about when the winner does: failed, or cancelled if it lost the race
+        assert outcomes[0] is None or outcomes[0]["returncode"] == 1
+        assert json.loads(outcomes[1]["result"]) == {"ok": True}
+        # The sleeping candidate was killed, not waited for
+        assert outcomes[2] is None
+        assert 2 not in accepted
+        assert pool.run("print('alive')")["stdout"] == "alive\n"
+    finally:
+        pool.shutdown()
+
+
+def _expect_dict(value):
+    if not isinstance(value, dict):
+        raise ValueError("expected a dict")
+    return value
+
+
+def test_run_python_candidates_reports_every_failure():
+    result = run_python_candidates(["import sys\nsys.exit(3)", "set_result([1, 2])"], validate=_expect_dict)
+
+    assert result["status"] == "failed"
+    assert result["candidate"] is None
+    assert result["error"].splitlines()[0] == "Candidate 1: Exited with code 3"
+    assert result["error"].splitlines()[1] == "Candidate 2: Invalid result: expected a dict"
+
+    result = run_python_candidates(["import sys\nsys.exit(3)", "set_result({'a': 1})"], validate=_expect_dict)
+    assert result["status"] == "success"
+    assert (result["candidate"], result["result"]) == (1, {"a": 1})
@@ -0,0 +1,58 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from app.context_policy import ContextPolicy, apply_context_policy, count_tokens, select_messages
+from app.tracing import RunTracer
+
+SYSTEM = {"role": "system", "content": "Generate a sentiment"}
+
+
+def _tool_turn(name: str, call_id: str, content: str) -> list:
+    call = AIMessage(content="", tool_calls=[{"name": name, "args": {}, "id": call_id, "type": "tool_call"}])
+    return [call, ToolMessage(content=content, name=name, tool_call_id=call_id)]
+
+
+def _transcript() -> list:
+    return (
+        [HumanMessage(content="daily run")]
+        + _tool_turn("get_top_nasdaq_gainer_tool", "1", '{"symbol": "AAPL"}')
+        + _tool_turn("execute_python_code_tool", "2", "x" * 10_000)
+        + [AIMessage(content="fallback to generate analysis: analysis-1")]
+        + _tool_turn("get_stock_news_tool", "3", "n" * 10_000)
+        # A result without its call, e.g. from a trimmed checkpoint
+        + [ToolMessage(content="orphan", name="get_stock_news_tool", tool_call_id="missing")]
+    )
+
+
+def test_select_messages_keeps_declared_tool_turns_whole():
+    messages = _transcript()
+
+    assert select_messages(ContextPolicy(), SYSTEM, messages) == [SYSTEM, messages[0]]
+
+    selected = select_messages(ContextPolicy(tools=("get_stock_news_tool",), max_tool_chars=100), SYSTEM, messages)
+    assert [m.type for m in selected[1:]] == ["human", "ai", "tool"]
+    call, result = selected[2], selected[3]
+    assert result.tool_call_id == call.tool_calls[0]["id"] == "3"
+    assert result.content.startswith("n" * 100) and "9900 characters cut" in result.content
+
+    # Over budget: the oldest declared tool turn goes, the latest one and the user's messages stay
+    policy = ContextPolicy(tools=("get_top_nasdaq_gainer_tool", "get_stock_news_tool"), max_tool_chars=None, max_tokens=50)
+    selected = select_messages(policy, SYSTEM, messages)
+    assert [m.type for m in selected[1:]] == ["human", "ai", "tool"]
+    assert selected[2].tool_calls[0]["name"] == "get_stock_news_tool"
+
+
+def test_apply_context_policy_records_token_counts():
+    messages = _transcript()
+    tracer = RunTracer(graph="test", trace_dir=None)
+
+    assert len(apply_context_policy("node", ContextPolicy(), SYSTEM, messages)) == 2  # no active tracer
+    assert tracer.events == []
+
+    with tracer.activate():
+        selected = apply_context_policy("generate_summary_node", ContextPolicy(), SYSTEM, messages)
+
+    (event,) = [event for event in tracer.events if event["type"] == "context"]
+    assert event["node"] == "generate_summary_node"
+    assert event["tokens_before"] == count_tokens([SYSTEM] + messages) > 5000
+    assert event["tokens_after"] == count_tokens(selected) < 50
+    assert (event["messages_before"], event["messages_after"]) == (len(messages) + 1, 2)
@@ -0,0 +1,65 @@
+import asyncio
+import json
+import threading
+import time
+
+from app import digest_agent
+from app.tools.core.analysis import generate_analysis_batch, validate_analysis
+from app.tools.core.artifacts import ArtifactStore, artifact_store
+from app.tools.core.mailer import mailer
+from benchmarks.fakes import graph_agent_script, tool_call_message
+from main import make_run_config
+
+
+def _run_digest(top_n: int, max_concurrency: int) -> dict:
+    run_config = make_run_config(top_n=top_n, max_concurrency=max_concurrency, memo=False)
+    state = asyncio.run(digest_agent.build_graph().ainvoke({"messages": []}, run_config))
+    mailer.flush()
+    return state
+
+
+def test_digest_reports_every_mover_within_max_concurrency(offline_app, monkeypatch):
+    get_indicators = digest_agent.get_indicators
+    running, most = [], []
+    lock = threading.Lock()
+
+    def counting_indicators(symbol):
+        # One call per mover, inside `analyze_symbol_node`
+        with lock:
+            running.append(symbol)
+            most.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(symbol)
+        return get_indicators(symbol)
+
+    monkeypatch.setattr(digest_agent, "get_indicators", counting_indicators)
+    state = _run_digest(top_n=5, max_concurrency=2)
+
+    symbols = [mover["symbol"] for mover in state["movers"]]
+    assert len(symbols) == 5
+    assert sorted(report["symbol"] for report in state["reports"]) == sorted(symbols)
+    assert max(most) == 2
+    assert len(offline_app.sink.messages) == 1
+
+    # The reports hold a reference, resolved from disk by a store that never saw the value
+    for report in state["reports"]:
+        analysis = ArtifactStore(str(artifact_store.root)).get(report["analysis_ref"])
+        assert validate_analysis(json.loads(analysis))["stock"] == report["symbol"]
+        assert report["sentiment"] and report["indicators"]["as_of"]
+
+
+def test_digest_falls_back_to_the_batch_analysis(offline_app):
+    def script(messages, tool_names):
+        if "execute_python_code_tool" in tool_names:
+            return tool_call_message("execute_python_code_tool", {"code": "raise ValueError('broken')"})
+        return graph_agent_script(messages, tool_names)
+
+    offline_app.llm.script = script
+    state = _run_digest(top_n=3, max_concurrency=3)
+
+    period = make_run_config()["configurable"]["period"]
+    fallbacks = generate_analysis_batch([mover["symbol"] for mover in state["movers"]], period)
+    for report in state["reports"]:
+        analysis = json.loads(artifact_store.get(report["analysis_ref"]))
+        assert analysis == dict(fallbacks[report["symbol"]], indicators=report["indicators"])
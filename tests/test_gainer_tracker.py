@@ -0,0 +1,98 @@
+import random
+from datetime import date
+
+import pandas as pd
+
+from app.tools.core import gainer_tracker, stock_data
+from app.tools.core.gainer_tracker import (
+    GainerTracker,
+    IndexedHeap,
+    Tick,
+    load_prior_closes,
+    replay_ticks,
+    session_day,
+    set_active_tracker,
+)
+from app.tools.core.providers import ReplayProvider
+
+
+def test_indexed_heap_matches_sorted_order():
+    rng = random.Random(1)
+    heap, expected = IndexedHeap(), {}
+    for _ in range(2000):
+        symbol = f"S{rng.randrange(50)}"
+        action = rng.random()
+        if symbol in expected and action < 0.2:
+            assert heap.remove(symbol) == expected.pop(symbol)
+        elif symbol in expected:
+            expected[symbol] = rng.uniform(-1, 1)
+            heap.update(symbol, expected[symbol])
+        else:
+            expected[symbol] = rng.uniform(-1, 1)
+            heap.push(symbol, expected[symbol])
+        assert len(heap) == len(expected)
+        if expected:
+            assert heap.peek()[1] == min(expected.values())
+
+    drained = [heap.pop()[1] for _ in range(len(heap))]
+    assert drained == sorted(expected.values())
+
+
+def test_tracker_keeps_top_k_and_reports_leader_changes():
+    rng = random.Random(2)
+    symbols = [f"S{i}" for i in range(40)]
+    tracker = GainerTracker(top_k=5, prior_closes={symbol: 100.0 for symbol in symbols})
+    changes = []
+    tracker.on_leader_change(lambda previous, current: changes.append(current["symbol"]))
+
+    prices = {}
+    for i in range(3000):
+        symbol = rng.choice(symbols)
+        prices[symbol] = rng.uniform(80, 120)
+        tracker.update(symbol, prices[symbol], ts=1_750_000_000 + i)
+
+        ranked = sorted(prices, key=prices.get, reverse=True)[:5]
+        assert [leader["symbol"] for leader in tracker.leaders()] == ranked
+        assert tracker.leader["symbol"] == ranked[0]
+
+    assert changes and changes[-1] == tracker.leader["symbol"]
+    assert tracker.update("UNKNOWN", 1.0) is False
+
+
+def test_replay_ticks_and_prior_closes(tmp_path, monkeypatch):
+    (tmp_path / "history").mkdir()
+    index = pd.bdate_range("2025-03-03", periods=2, tz="America/New_York", name="Date")
+    for symbol, closes in {"AAA": [10.0, 11.0], "BBB": [20.0, 19.0]}.items():
+        pd.DataFrame({"Close": closes}, index=index).to_csv(tmp_path / "history" / f"{symbol}.csv")
+    (tmp_path / "ticks.csv").write_text(
+        "timestamp,symbol,price\n"
+        "2025-03-04T14:30:00Z,AAA,10.5\n"
+        "2025-03-04T14:31:00Z,BBB,22.0\n"
+        "2025-03-04T14:32:00Z,AAA,11.5\n"
+    )
+
+    ticks = list(replay_ticks(str(tmp_path / "ticks.csv")))
+    assert ticks[0] == Tick(pd.Timestamp("2025-03-04T14:30:00Z").timestamp(), "AAA", 10.5)
+
+    # The ticks are of the session of 2025-03-04, its own bar is not the reference
+    day = session_day(ticks[0].ts)
+    assert day == date(2025, 3, 4)
+    prior_closes = load_prior_closes(["AAA", "BBB"], day, provider=ReplayProvider(str(tmp_path)))
+    assert prior_closes == {"AAA": 10.0, "BBB": 20.0}
+    # Before the open of 2025-03-05 there is no bar of it yet, the reference is the close of 2025-03-04
+    before_open = load_prior_closes(["AAA", "BBB"], date(2025, 3, 5), provider=ReplayProvider(str(tmp_path)))
+    assert before_open == {"AAA": 11.0, "BBB": 19.0}
+    # Polling tracks today's session
+    monkeypatch.setattr(gainer_tracker, "session_day", lambda ts=None: date(2025, 3, 5))
+    assert load_prior_closes(["AAA", "BBB"], provider=ReplayProvider(str(tmp_path))) == before_open
+
+    tracker = GainerTracker(top_k=1, prior_closes=prior_closes)
+    assert tracker.run(ticks) == 3  # AAA (+5%), then BBB (+10%), then AAA again (+15%)
+    assert tracker.leader["symbol"] == "AAA" and tracker.leader["pct"] == "0.15"
+    assert tracker.leaders() == [tracker.leader]
+
+    set_active_tracker(tracker)
+    try:
+        assert stock_data.get_top_nasdaq_gainer() == {"symbol": "AAA", "pct": "0.15", "day": tracker.leader["day"]}
+    finally:
+        set_active_tracker(None)
@@ -0,0 +1,77 @@
+import asyncio
+import email
+
+from app import graph_agent
+from app.tools.core.code_cache import code_cache
+from app.tools.core.mailer import mailer
+from benchmarks.fakes import graph_agent_script
+
+
+def _transcript(messages: list) -> list:
+    """What a run said, without the message ids."""
+    return [
+        (message.type, message.name, message.content, [(call["name"], call["args"]) for call in message.tool_calls])
+        if message.type == "ai"
+        else (message.type, message.name, message.content)
+        for message in messages
+    ]
+
+
+def _run(graph, run_config: dict, sink, is_async: bool = False) -> tuple:
+    """Run `graph` with an empty code cache, return its final state and the body of the email it sent."""
+    code_cache._entries = {}
+    sent = len(sink.messages)
+    if is_async:
+        state = asyncio.run(graph.ainvoke({"messages": []}, run_config))
+    else:
+        state = graph.invoke({"messages": []}, run_config)
+    mailer.flush()
+
+    assert len(sink.messages) == sent + 1
+    body = email.message_from_string(sink.messages[-1]["data"]).get_payload(decode=True).decode()
+    return state, body
+
+
+def test_parallel_graph_matches_the_sync_graph(offline_app):
+    sync_state, sync_body = _run(graph_agent.build_graph(), offline_app.run_config, offline_app.sink)
+    sync_calls = offline_app.llm.calls
+    parallel_state, parallel_body = _run(
+        graph_agent.build_graph(parallel=True), offline_app.run_config, offline_app.sink, is_async=True
+    )
+
+    # The same LLM calls, and the summary waited for both branches: it saw the analysis and the sentiment
+    assert offline_app.llm.calls == 2 * sync_calls
+    assert parallel_body == sync_body
+    assert parallel_state["stock_sentiment"] in parallel_body
+    for key in sync_state.keys() - {"messages", "sentiment_messages"}:
+        assert parallel_state[key] == sync_state[key], key
+
+    # The sentiment branch keeps its own transcript, the rest is the transcript of the sync graph
+    sentiment = _transcript(parallel_state["sentiment_messages"])
+    transcript = _transcript(sync_state["messages"])
+    assert sentiment == [entry for entry in transcript if entry in sentiment]
+    assert _transcript(parallel_state["messages"]) == [entry for entry in transcript if entry not in sentiment]
+
+
+def test_fast_graph_skips_the_symbol_and_data_llm_calls(offline_app):
+    bound = []
+
+    def script(messages, tool_names):
+        bound.append(tool_names)
+        return graph_agent_script(messages, tool_names)
+
+    offline_app.llm.script = script
+    state, body = _run(graph_agent.build_graph(), offline_app.run_config, offline_app.sink)
+    calls, bound[:] = list(bound), []
+    fast_state, fast_body = _run(graph_agent.build_graph(fast=True), offline_app.run_config, offline_app.sink)
+
+    assert ["get_top_nasdaq_gainer_tool"] in calls and ["get_and_save_stock_data_tool"] in calls
+    skipped = (["get_top_nasdaq_gainer_tool"], ["get_and_save_stock_data_tool"])
+    assert bound == [tools for tools in calls if tools not in skipped]
+    assert len(bound) == len(calls) - 2
+
+    # The tool nodes still run, with the same result
+    assert fast_body == body
+    assert _transcript(fast_state["messages"]) == _transcript(state["messages"])
+    for key in ("stock_symbol", "day", "stock_data_ref", "stock_analysis_ref", "stock_sentiment"):
+        assert fast_state[key] == state[key]
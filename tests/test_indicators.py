@@ -0,0 +1,109 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.tools.core.indicators import IndicatorSet, IndicatorStore
+
+
+def _bars(days: int = 300, seed: int = 3) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, days)))
+    spread = np.abs(rng.normal(0, 0.01, days)) * close
+    index = pd.bdate_range(end="2025-06-30", periods=days, tz="America/New_York", name="Date")
+    return pd.DataFrame({"High": close + spread, "Low": close - spread, "Close": close}, index=index)
+
+
+def _wilder(values: pd.Series, period: int) -> float:
+    average = values.iloc[:period].mean()
+    for value in values.iloc[period:]:
+        average = (average * (period - 1) + value) / period
+    return average
+
+
+def test_streaming_indicators_match_batch_computation():
+    bars = _bars()
+    close = bars["Close"]
+    indicators = IndicatorSet()
+    for high, low, last in bars.to_numpy():
+        indicators.update(high, low, last)
+    values = indicators.values()
+
+    assert values["bars"] == len(bars)
+    assert values["sma_20"] == pytest.approx(close.rolling(20).mean().iloc[-1], abs=1e-4)
+    assert values["std_20"] == pytest.approx(close.rolling(20).std().iloc[-1], abs=1e-4)
+    bollinger_std = close.rolling(20).std(ddof=0).iloc[-1]
+    assert values["bollinger_upper"] == pytest.approx(close.rolling(20).mean().iloc[-1] + 2 * bollinger_std, abs=1e-4)
+
+    ema_12, ema_26 = close.ewm(span=12, adjust=False).mean(), close.ewm(span=26, adjust=False).mean()
+    macd = ema_12 - ema_26
+    assert values["ema_12"] == pytest.approx(ema_12.iloc[-1], abs=1e-4)
+    assert values["macd"] == pytest.approx(macd.iloc[-1], abs=1e-4)
+    assert values["macd_signal"] == pytest.approx(macd.ewm(span=9, adjust=False).mean().iloc[-1], abs=1e-4)
+
+    change = close.diff().dropna()
+    gain, loss = _wilder(change.clip(lower=0), 14), _wilder(-change.clip(upper=0), 14)
+    assert values["rsi_14"] == pytest.approx(100 - 100 / (1 + gain / loss), abs=1e-4)
+
+    previous = close.shift()
+    true_range = pd.concat(
+        [bars["High"] - bars["Low"], (bars["High"] - previous).abs(), (bars["Low"] - previous).abs()], axis=1
+    ).max(axis=1)
+    assert values["atr_14"] == pytest.approx(_wilder(true_range, 14), abs=1e-4)
+
+    drawdown = close / close.cummax() - 1
+    assert values["max_drawdown"] == pytest.approx(drawdown.min(), abs=1e-4)
+    assert values["drawdown"] == pytest.approx(drawdown.iloc[-1], abs=1e-4)
+
+    # Too short a history leaves the windowed indicators empty
+    short = IndicatorSet()
+    short.update(11.0, 9.0, 10.0)
+    assert short.values()["sma_20"] is None and short.values()["rsi_14"] is None
+
+
+def test_store_extends_persisted_state_one_bar_at_a_time(tmp_path):
+    bars = _bars()
+    full = IndicatorStore(str(tmp_path / "full")).latest("AAPL", bars)
+
+    store = IndicatorStore(str(tmp_path / "incremental"))
+    store.latest("AAPL", bars.iloc[:200])
+    # A partial last bar, revised by the next download, is never folded into the saved state
+    partial = bars.iloc[:201].copy()
+    partial.iloc[-1, partial.columns.get_loc("Close")] *= 1.05
+    store.latest("AAPL", partial)
+    for end in range(201, len(bars) + 1):
+        latest = store.latest("AAPL", bars.iloc[:end])
+    assert latest == full
+    assert latest["as_of"] == "2025-06-30"
+
+    with open(tmp_path / "incremental" / "AAPL.json") as f:
+        saved = json.load(f)
+    assert saved["timestamp"] == bars.index[-2].value
+
+    # Adjusted history (e.g. after a dividend) no longer matches the saved close: rebuilt from scratch
+    adjusted = bars.copy()
+    adjusted[["High", "Low", "Close"]] *= 0.99
+    assert store.latest("AAPL", adjusted) == IndicatorStore(str(tmp_path / "adjusted")).latest("AAPL", adjusted)
+
+
+def test_store_reseeds_when_the_history_goes_further_back(tmp_path):
+    bars = _bars()
+
+    def batch(frame: pd.DataFrame) -> dict:
+        return IndicatorStore(str(tmp_path / f"batch{len(frame)}")).latest("AAPL", frame)
+
+    # A short period first, then a longer one: the state seeded from the short window is not reused
+    store = IndicatorStore(str(tmp_path / "short_first"))
+    store.latest("AAPL", bars.iloc[150:250])
+    assert store.latest("AAPL", bars.iloc[:260]) == batch(bars.iloc[:260])
+    for end in range(261, len(bars) + 1):
+        latest = store.latest("AAPL", bars.iloc[:end])
+    assert latest == batch(bars)
+
+    # The long period first: a later-starting history extends the state of the longest one
+    store = IndicatorStore(str(tmp_path / "long_first"))
+    store.latest("AAPL", bars.iloc[:260])
+    assert store.latest("AAPL", bars.iloc[150:]) == batch(bars)
+    with open(tmp_path / "long_first" / "AAPL.json") as f:
+        assert json.load(f)["start"] == bars.index[0].value
@@ -0,0 +1,70 @@
+import time
+
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+
+from app.tools.core.llm_cache import LLMCache, with_llm_cache
+from app.tools.graph_agent_tools import get_stock_news_tool, send_email_tool
+from app.tracing import RunTracer
+from benchmarks.fakes import ScriptedChatModel, tool_call_message
+
+
+def test_cached_node_answers_repeated_prompts_from_disk(tmp_path):
+    calls = []
+
+    def script(messages, tools):
+        calls.append(tools)
+        usage = {"input_tokens": 10, "output_tokens": 2, "total_tokens": 12}
+        return AIMessage(content="positive", usage_metadata=usage) if not tools else tool_call_message(tools[0], {})
+
+    llm = ScriptedChatModel(script=script)
+    cache = LLMCache(str(tmp_path / "llm_cache.sqlite"))
+    # `with_llm_cache` takes the default cache, point it at this one
+    cached = llm.model_copy(update={"cache": cache.for_node("generate_sentiment_node")})
+
+    tracer = RunTracer(trace_dir=None)
+    with tracer.activate():
+        first = cached.invoke("news")
+        second = cached.invoke("news")
+        cached.bind_tools([get_stock_news_tool]).invoke("news")
+        cached.bind_tools([get_stock_news_tool]).invoke("news")
+        cached.bind_tools([send_email_tool]).invoke("news")
+
+    # Model, bound tools and messages make the key
+    assert calls == [[], ["get_stock_news_tool"], ["send_email_tool"]]
+    assert second.content == first.content == "positive"
+    assert second.id != first.id
+    assert second.usage_metadata["input_tokens"] == 0
+    hits = [event["hit"] for event in tracer.events if event["type"] == "llm_cache"]
+    assert hits == [False, True, False, True, False]
+
+    # Survives a restart, other nodes are not cached
+    reopened = llm.model_copy(update={"cache": LLMCache(cache.path).for_node("generate_sentiment_node")})
+    reopened.invoke("news")
+    assert len(calls) == 3
+    assert with_llm_cache(llm, "generate_summary_node", nodes=["generate_sentiment_node"]) is llm
+
+
+def test_entries_expire_and_least_recently_used_are_evicted(tmp_path):
+    def generations(text: str):
+        return [ChatGeneration(message=AIMessage(content=text * 1000))]
+
+    # Room for three entries
+    max_mb = 3.5 * len(dumps(generations("a"))) / 2**20
+    cache = LLMCache(str(tmp_path / "llm_cache.sqlite"), ttl_hours=1, max_mb=max_mb)
+
+    for prompt in ("a", "b", "c"):
+        cache.put(prompt, "model", generations(prompt))
+        time.sleep(0.01)
+    assert cache.get("a", "model")[0].message.content == "a" * 1000
+    assert cache.get("a", "other model") is None
+
+    # Over the limit: "b" is the least recently used, "a" was just read
+    cache.put("d", "model", generations("d"))
+    assert cache.get("b", "model") is None
+    assert all(cache.get(prompt, "model") for prompt in ("a", "c", "d"))
+
+    cache.ttl_hours = 0
+    assert cache.get("a", "model") is None
+    assert cache.clear(expired_only=True) == 2
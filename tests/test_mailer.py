@@ -0,0 +1,105 @@
+import json
+import smtplib
+
+import pytest
+
+from app.tools.core.mailer import Mailer, SMTPConnectionPool, SMTPServer
+from benchmarks.fakes import SMTPSink
+
+
+def test_mailer_sends_one_message_per_recipient_over_pooled_connections(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMAIL_PASSWORD", "secret")
+    mailer = Mailer(str(tmp_path / "dead_letter.jsonl"), workers=2)
+    recipients = [f"user{i}@example.com" for i in range(10)]
+
+    with SMTPSink() as sink:
+        futures = mailer.submit(
+            "Hello",
+            "Hi there",
+            "bot@example.com",
+            recipients,
+            sink.host,
+            sink.port,
+            use_ssl=False,
+            personalize=lambda recipient, body: f"{body}, {recipient.split('@')[0]}",
+        )
+        assert mailer.flush(timeout=10)
+        # A second batch reuses the logged-in connections
+        mailer.submit("Again", "Hi", "bot@example.com", recipients[:2], sink.host, sink.port, use_ssl=False)
+        assert mailer.flush(timeout=10)
+        mailer.close()
+
+    assert all(future.result() for future in futures)
+    assert mailer.stats == {"sent": 12, "retried": 0, "dead": 0}
+    assert mailer.pool.opened <= 2
+    assert sorted(message["to"][0] for message in sink.messages[:10]) == sorted(recipients)
+    for message in sink.messages[:10]:
+        assert len(message["to"]) == 1
+        assert f"To: {message['to'][0]}" in message["data"]
+        assert f"Hi there, {message['to'][0].split('@')[0]}" in message["data"]
+
+
+def test_mailer_retries_then_dead_letters_and_requeues(tmp_path, monkeypatch):
+    monkeypatch.delenv("EMAIL_PASSWORD", raising=False)
+    dead_letter_path = tmp_path / "dead_letter.jsonl"
+    mailer = Mailer(str(dead_letter_path), max_attempts=3, backoff=0.01)
+
+    with SMTPSink() as sink:
+        (future,) = mailer.submit("Hello", "Hi", "bot@example.com", ["a@example.com"], sink.host, sink.port, use_ssl=False)
+        assert mailer.flush(timeout=10)
+        assert "after 3 attempts" in str(future.exception())
+        assert mailer.stats == {"sent": 0, "retried": 2, "dead": 1}
+
+        with open(dead_letter_path) as f:
+            (record,) = [json.loads(line) for line in f]
+        assert record["to_email"] == "a@example.com" and record["attempts"] == 3
+        assert sink.messages == []
+
+        monkeypatch.setenv("EMAIL_PASSWORD", "secret")
+        (future,) = mailer.requeue_dead_letters()
+        assert mailer.flush(timeout=10)
+        mailer.close()
+
+    assert future.result() == record["id"]
+    assert not dead_letter_path.exists()
+    assert [message["to"] for message in sink.messages] == [["a@example.com"]]
+
+
+class FakeSMTP:
+    """Records the commands of a plain SMTP connection."""
+
+    extensions = ("starttls",)
+
+    def __init__(self, host, port, timeout=None):
+        self.host = host
+        self.calls = []
+
+    def ehlo(self):
+        self.calls.append("ehlo")
+
+    def has_extn(self, name):
+        return name in self.extensions
+
+    def starttls(self, context=None):
+        self.calls.append("starttls")
+
+    def login(self, username, password):
+        self.calls.append("login")
+
+    def close(self):
+        self.calls.append("close")
+
+
+def test_plain_connection_is_upgraded_with_starttls_before_login(monkeypatch):
+    pool = SMTPConnectionPool()
+    monkeypatch.setattr(smtplib, "SMTP", FakeSMTP)
+
+    conn = pool._open(SMTPServer("smtp.example.com", 587, use_ssl=False, username="bot"), "secret")
+    assert conn.calls == ["ehlo", "starttls", "ehlo", "login"]
+
+    # A remote server without STARTTLS never sees the password, a loopback relay may go without it
+    monkeypatch.setattr(FakeSMTP, "extensions", ())
+    with pytest.raises(smtplib.SMTPNotSupportedError):
+        pool._open(SMTPServer("smtp.example.com", 587, use_ssl=False, username="bot"), "secret")
+    conn = pool._open(SMTPServer("127.0.0.1", 2525, use_ssl=False, username="bot"), "secret")
+    assert conn.calls == ["ehlo", "login"]
@@ -0,0 +1,66 @@
+import os
+import time
+
+import pytest
+
+import main
+from app.tools import graph_agent_tools
+from benchmarks.fakes import graph_agent_script
+
+
+@pytest.mark.parametrize("graph_name", ["graph_agent", "graph_agent_parallel"])
+def test_resume_continues_from_the_failed_step(offline_app, monkeypatch, graph_name):
+    from app.tools.core.memo import node_memo
+
+    monkeypatch.setattr(main, "CHECKPOINT_DB", node_memo.path)
+    bound, gainer_calls, email_calls = [], [], []
+
+    def script(messages, tool_names):
+        bound.append(tool_names)
+        return graph_agent_script(messages, tool_names)
+
+    def get_top_nasdaq_gainer(*args):
+        gainer_calls.append(args)
+        return top_nasdaq_gainer(*args)
+
+    def queue_email(**kwargs):
+        email_calls.append(kwargs["subject"])
+        # The SMTP queue is down for the first run only
+        if len(email_calls) == 1:
+            raise RuntimeError("Failed to queue the email")
+        return queue(**kwargs)
+
+    top_nasdaq_gainer, queue = graph_agent_tools.get_top_nasdaq_gainer, graph_agent_tools.queue_email
+    offline_app.llm.script = script
+    monkeypatch.setattr(graph_agent_tools, "get_top_nasdaq_gainer", get_top_nasdaq_gainer)
+    monkeypatch.setattr(graph_agent_tools, "queue_email", queue_email)
+
+    with pytest.raises(RuntimeError, match="Failed to queue the email"):
+        main.run_agent(graph_name, offline_app.run_config, trace=False, run_id="run-1")
+    first_run = list(bound)
+    assert offline_app.sink.messages == []
+
+    main.resume_run("run-1", trace=False)
+
+    # Only the send step ran again: no LLM call, no new pick of the stock, one email
+    assert bound == first_run
+    assert len(gainer_calls) == 1
+    assert len(email_calls) == 2
+    assert len(offline_app.sink.messages) == 1
+
+
+def test_run_deletes_the_artifacts_older_than_the_max_age(offline_app, monkeypatch):
+    from app import config
+    from app.tools.core.artifacts import artifact_store
+
+    monkeypatch.setattr(config, "ARTIFACT_MAX_AGE_DAYS", 7)
+    old = artifact_store.put("an analysis of last month", kind="analysis")
+    month_ago = time.time() - 30 * 86400
+    os.utime(old["path"], (month_ago, month_ago))
+
+    main.run_agent("graph_agent", offline_app.run_config, trace=False, checkpoint=False)
+
+    assert not os.path.exists(old["path"])
+    # The artifacts of this run are kept
+    assert list((artifact_store.root / "frame").iterdir())
+    assert len(offline_app.sink.messages) == 1
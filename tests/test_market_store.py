@@ -0,0 +1,130 @@
+import threading
+from datetime import date, timedelta
+
+import pandas as pd
+
+from app.tools.core.market_store import MarketDataStore, delta_period, period_start
+from app.tools.core.providers import slice_period
+
+
+def _bars(start: str, periods: int) -> pd.DataFrame:
+    index = pd.bdate_range(start, periods=periods, tz="America/New_York", name="Date")
+    close = [100.0 + i for i in range(periods)]
+    return pd.DataFrame(
+        {"Open": close, "High": close, "Low": close, "Close": close, "Volume": [1000.0] * periods},
+        index=index,
+    )
+
+
+class FakeFetch:
+    def __init__(self, history: pd.DataFrame):
+        self.history = history
+        self.calls = []
+
+    def __call__(self, symbol, period=None, start=None):
+        self.calls.append({"period": period, "start": start})
+        if start is not None:
+            return self.history[self.history.index.date >= start]
+        return self.history.tail(int(period[:-1])) if period.endswith("d") else self.history
+
+
+def test_period_start():
+    assert period_start("max") is None
+    assert delta_period(date(2025, 6, 12), date(2025, 6, 13)) == "5d"
+    assert delta_period(date(2025, 6, 1), date(2025, 6, 13)) == "1mo"
+    assert delta_period(date(2020, 7, 1), date(2025, 6, 13)) == "5y"
+    assert period_start("ytd", date(2025, 6, 1)) == date(2025, 1, 1)
+    assert period_start("1mo", date(2025, 6, 15)) == date(2025, 5, 15)
+
+
+def test_get_reuses_store_and_fetches_delta(tmp_path):
+    fetch = FakeFetch(_bars("2025-01-01", 30))
+    store = MarketDataStore(tmp_path, fetch=fetch, refresh_ttl=0)
+
+    first = store.get("AAPL", "5d")
+    assert len(first) == 5
+    assert fetch.calls[-1] == {"period": "5d", "start": None}
+
+    # New bars arrive, a repeat run only asks for the days since the last stored bar.
+    fetch.history = _bars("2025-01-01", 32)
+    second = store.get("AAPL", "5d")
+    assert fetch.calls[-1]["start"] == first.index[-1].date()
+    assert second["Close"].tolist() == fetch.history["Close"].tail(5).tolist()
+    assert second.index.name == "Date"
+
+
+def test_read_is_memory_mapped(tmp_path):
+    store = MarketDataStore(tmp_path, fetch=FakeFetch(_bars("2025-01-01", 10)))
+    store.get("MSFT", "5d")
+
+    frame = store.read("MSFT")
+    assert len(frame) == 5
+    assert str(frame.index.tz) == "America/New_York"
+
+
+def test_prefetch_downloads_missing_symbols_in_one_panel(tmp_path):
+    panels = []
+
+    def fetch_many(symbols, period):
+        panels.append(symbols)
+        return pd.concat({symbol: _bars("2025-01-01", 5) for symbol in symbols}, axis=1).swaplevel(axis=1)
+
+    fetch = FakeFetch(_bars("2025-01-01", 5))
+    store = MarketDataStore(tmp_path, fetch=fetch, fetch_many=fetch_many)
+
+    assert store.prefetch(["AAPL", "MSFT"], "5d") == ["AAPL", "MSFT"]
+    assert store.prefetch(["AAPL", "MSFT", "NVDA"], "5d") == ["NVDA"]
+    assert panels == [["AAPL", "MSFT"], ["NVDA"]]
+
+    assert len(store.get("MSFT", "5d")) == 5
+    assert fetch.calls == []
+
+
+def test_concurrent_reads_never_mix_two_writes(tmp_path):
+    store = MarketDataStore(tmp_path, fetch=FakeFetch(_bars("2025-01-01", 10)))
+    short, long = _bars("2025-01-01", 5), _bars("2024-01-01", 300)
+    store.write("AAPL", short, "2025-01-01")
+    stop = threading.Event()
+
+    def writer():
+        while not stop.is_set():
+            for frame in (long, short):
+                store.write("AAPL", frame, None)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        for _ in range(300):
+            frame = store.read("AAPL")
+            # Index, values and meta of one write: never a new index with old values
+            assert len(frame) in (len(short), len(long))
+            expected = short if len(frame) == len(short) else long
+            assert frame["Close"].tolist() == expected["Close"].tolist()
+            assert frame.index.equals(expected.index)
+    finally:
+        stop.set()
+        thread.join()
+    assert store.read("AAPL") is not None
+    assert list(tmp_path.joinpath("AAPL").glob("*.npy")) == []
+
+
+def test_prefetch_refreshes_stale_symbols_from_their_last_bar(tmp_path):
+    requests = []
+    history = _bars((date.today() - timedelta(days=500)).isoformat(), 360)
+
+    def fetch_many(symbols, period):
+        requests.append((symbols, period))
+        frame = slice_period(history, period, history.index[-1].date())
+        return pd.concat({symbol: frame for symbol in symbols}, axis=1).swaplevel(axis=1)
+
+    store = MarketDataStore(tmp_path, fetch=FakeFetch(history), fetch_many=fetch_many, refresh_ttl=0)
+    assert store.prefetch(["AAPL", "MSFT"], "1y") == ["AAPL", "MSFT"]
+
+    # Two new bars: the covered symbols only download the days since their last bar, NVDA the whole period
+    last = history.index[-1].date()
+    history = _bars(history.index[0].date().isoformat(), 362)
+    assert store.prefetch(["AAPL", "MSFT", "NVDA"], "1y") == ["NVDA", "AAPL", "MSFT"]
+    assert requests == [(["AAPL", "MSFT"], "1y"), (["NVDA"], "1y"), (["AAPL", "MSFT"], delta_period(last))]
+    assert requests[-1][1] in ("5d", "1mo")
+    assert store.read("AAPL").index[-1] == history.index[-1]
+    assert store.read("AAPL")["Close"].tolist()[-5:] == history["Close"].tolist()[-5:]
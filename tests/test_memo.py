@@ -0,0 +1,35 @@
+import os
+
+from app.tools.core.artifacts import ArtifactStore
+from app.tools.core.memo import NodeMemo
+
+
+def test_memo_is_keyed_by_node_symbol_day_and_period(tmp_path):
+    memo = NodeMemo(str(tmp_path / "checkpoints.sqlite"))
+    memo.put("generate_sentiment_node", "AAPL", "2025-06-30", "5d", {"stock_sentiment": "positive"})
+
+    assert memo.get("generate_sentiment_node", "AAPL", "2025-06-30", "5d") == {"stock_sentiment": "positive"}
+    assert memo.get("generate_sentiment_node", "AAPL", "2025-07-01", "5d") is None
+    assert memo.get("generate_sentiment_node", "AAPL", "2025-06-30", "1mo") is None
+    assert memo.get("generate_sentiment_node", "MSFT", "2025-06-30", "5d") is None
+    assert memo.get("generate_analysis_node", "AAPL", "2025-06-30", "5d") is None
+
+    # Survives a restart, the latest value wins
+    memo.put("generate_sentiment_node", "AAPL", "2025-06-30", "5d", {"stock_sentiment": "negative"})
+    reopened = NodeMemo(str(tmp_path / "checkpoints.sqlite"))
+    assert reopened.get("generate_sentiment_node", "AAPL", "2025-06-30", "5d") == {"stock_sentiment": "negative"}
+
+    memo.put("generate_sentiment_node", "AAPL", "2025-07-01", "5d", {"stock_sentiment": "neutral"})
+    assert memo.clear(before_day="2025-07-01") == 1
+    assert memo.get("generate_sentiment_node", "AAPL", "2025-07-01", "5d") == {"stock_sentiment": "neutral"}
+
+
+def test_memoized_artifact_ref_is_dropped_once_pruned(tmp_path):
+    store = ArtifactStore(str(tmp_path / "artifacts"))
+    memo = NodeMemo(str(tmp_path / "checkpoints.sqlite"))
+    ref = store.put('{"stock": "AAPL"}', "analysis", "AAPL")
+    memo.put("generate_analysis_node", "AAPL", "2025-06-30", "5d", {"stock_analysis_ref": ref})
+
+    assert memo.get("generate_analysis_node", "AAPL", "2025-06-30", "5d") == {"stock_analysis_ref": ref}
+    os.remove(ref["path"])
+    assert memo.get("generate_analysis_node", "AAPL", "2025-06-30", "5d") is None
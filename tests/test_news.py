@@ -0,0 +1,57 @@
+import threading
+import time
+
+from app.tools.core.news import NewsService
+
+
+class FakeNews:
+    def __init__(self, items, delay=0.0):
+        self.items = items
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, symbol):
+        with self._lock:
+            self.calls.append(symbol)
+        time.sleep(self.delay)
+        return list(self.items.get(symbol, []))
+
+
+def _item(id, day):
+    return {"id": id, "content": {"title": id, "pubDate": f"2025-06-{day:02d}T12:00:00Z"}}
+
+
+def test_get_returns_newest_first_and_caches():
+    fetch = FakeNews({"AAPL": [_item("a1", 1), _item("a3", 3), _item("a2", 2)]})
+    service = NewsService(ttl=60, fetch=fetch)
+
+    assert [item["id"] for item in service.get("AAPL", 2)] == ["a3", "a2"]
+    assert [item["id"] for item in service.get("AAPL", 5)] == ["a3", "a2", "a1"]
+    assert fetch.calls == ["AAPL"]
+
+    # A refetch merges by id, the repeated article is kept once
+    fetch.items["AAPL"] = [_item("a4", 4), _item("a3", 3)]
+    service.invalidate("AAPL")
+    assert [item["id"] for item in service.get("AAPL", 10)] == ["a4", "a3", "a2", "a1"]
+    assert fetch.calls == ["AAPL", "AAPL"]
+
+
+def test_get_many_fetches_each_symbol_once_concurrently():
+    symbols = [f"S{i}" for i in range(8)]
+    fetch = FakeNews({symbol: [_item(f"{symbol}-1", 1)] for symbol in symbols}, delay=0.2)
+    service = NewsService(ttl=60, max_workers=8, fetch=fetch)
+
+    start = time.perf_counter()
+    news = service.get_many(symbols + symbols[:2], last_n=1)
+    assert time.perf_counter() - start < 1.0
+    assert sorted(fetch.calls) == sorted(symbols)
+    assert news["S3"] == [_item("S3-1", 1)]
+
+    # Concurrent callers of a symbol that is not cached yet wait for one shared fetch
+    threads = [threading.Thread(target=service.get, args=("COLD",)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert fetch.calls.count("COLD") == 1
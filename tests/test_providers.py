@@ -0,0 +1,65 @@
+import json
+from datetime import date
+
+import pandas as pd
+
+from app.tools.core.market_store import MarketDataStore
+from app.tools.core.providers import RecordingProvider, ReplayProvider, slice_period
+
+
+def _record(root, symbol, closes):
+    index = pd.bdate_range("2025-03-03", periods=len(closes), tz="America/New_York", name="Date")
+    frame = pd.DataFrame({"Open": closes, "High": closes, "Low": closes, "Close": closes, "Volume": 1000.0}, index=index)
+    (root / "history").mkdir(parents=True, exist_ok=True)
+    frame.to_csv(root / "history" / f"{symbol}.csv")
+
+
+def test_slice_period():
+    index = pd.bdate_range("2025-01-01", periods=40, name="Date")
+    frame = pd.DataFrame({"Close": range(40)}, index=index)
+    assert len(slice_period(frame, "5d")) == 5
+    assert slice_period(frame, "1mo", today=date(2025, 2, 25)).index[0] == pd.Timestamp("2025-01-27")
+
+
+def test_replay_provider(tmp_path):
+    _record(tmp_path, "AAPL", [float(i) for i in range(30)])
+    _record(tmp_path, "MSFT", [float(100 - i) for i in range(30)])
+    (tmp_path / "news").mkdir()
+    (tmp_path / "news" / "AAPL.json").write_text(json.dumps([{"id": "1", "content": {"title": "hi"}}]))
+
+    provider = ReplayProvider(str(tmp_path))
+
+    panel = provider.download(["AAPL", "MSFT"], "2d")
+    assert panel["Close"]["AAPL"].tolist() == [28.0, 29.0]
+    assert panel["Close"]["MSFT"].tolist() == [72.0, 71.0]
+    assert len(provider.history("AAPL", period="5d")) == 5
+    assert provider.news("AAPL")[0]["id"] == "1"
+    assert provider.news("MSFT") == []
+
+    as_of = ReplayProvider(str(tmp_path), as_of=date(2025, 3, 7))
+    assert as_of.history("AAPL", period="5d")["Close"].tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def test_store_over_replay_provider(tmp_path):
+    _record(tmp_path / "replay", "AAPL", [float(i) for i in range(30)])
+    provider = ReplayProvider(str(tmp_path / "replay"))
+    store = MarketDataStore(
+        tmp_path / "store",
+        fetch=provider.history,
+        fetch_many=provider.download,
+    )
+
+    assert store.get("AAPL", "1mo")["Close"].iloc[-1] == 29.0
+    assert len(store.get("AAPL", "5d")) == 5
+
+
+def test_recording_provider_roundtrip(tmp_path):
+    _record(tmp_path / "source", "AAPL", [float(i) for i in range(10)])
+    recorder = RecordingProvider(ReplayProvider(str(tmp_path / "source")), str(tmp_path / "recorded"))
+
+    recorder.download(["AAPL"], "5d")
+    recorder.news("AAPL")
+
+    replay = ReplayProvider(str(tmp_path / "recorded"))
+    assert replay.history("AAPL", period="5d")["Close"].tolist() == [5.0, 6.0, 7.0, 8.0, 9.0]
+    assert replay.news("AAPL") == []
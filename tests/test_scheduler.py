@@ -0,0 +1,80 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.scheduler import CronSchedule, Scheduler, load_jobs
+
+NEW_YORK = ZoneInfo("America/New_York")
+
+
+def test_cron_next_after_weekdays_and_dst():
+    schedule = CronSchedule("15 16 * * 1-5")
+
+    # Friday after the close -> Monday
+    friday = datetime(2025, 6, 27, 16, 15, tzinfo=NEW_YORK)
+    assert schedule.next_after(friday) == datetime(2025, 6, 30, 16, 15, tzinfo=NEW_YORK)
+    assert schedule.next_after(friday - timedelta(minutes=1)) == friday
+
+    # The wall-clock time holds across the DST change: 20:15 UTC in summer, 21:15 UTC in winter
+    before_change = datetime(2025, 10, 31, 17, 0, tzinfo=NEW_YORK)
+    fire = schedule.next_after(before_change)
+    assert fire.astimezone(timezone.utc) == datetime(2025, 11, 3, 21, 15, tzinfo=timezone.utc)
+
+    # 02:30 does not exist on the spring-forward day, it fires once at the shifted instant
+    nightly = CronSchedule("30 2 * * *")
+    fire = nightly.next_after(datetime(2025, 3, 9, 0, 0, tzinfo=NEW_YORK))
+    assert fire.astimezone(timezone.utc) == datetime(2025, 3, 9, 7, 30, tzinfo=timezone.utc)
+    assert nightly.next_after(fire).date() == datetime(2025, 3, 10).date()
+
+    # Both day fields restricted: either one matches
+    either = CronSchedule("0 9 1 * 1", "UTC")
+    assert either.next_after(datetime(2025, 6, 1, 12, tzinfo=timezone.utc)).day == 2
+
+
+def test_load_jobs_validates_specs():
+    (job,) = load_jobs([{"name": "close", "cron": "*/15 9-16 * * 1-5"}])
+    assert job["graph"] == "graph_agent"
+    assert isinstance(job["schedule"], CronSchedule)
+
+    with pytest.raises(ValueError, match="unique name"):
+        load_jobs([{"name": "a", "cron": "* * * * *"}, {"name": "a", "cron": "* * * * *"}])
+    with pytest.raises(ValueError, match="Unknown graph"):
+        load_jobs([{"name": "a", "cron": "* * * * *", "graph": "nope"}])
+    with pytest.raises(ValueError, match="5 fields"):
+        load_jobs([{"name": "a", "cron": "15 16 * *"}])
+    with pytest.raises(ValueError, match="out of range"):
+        load_jobs([{"name": "a", "cron": "60 16 * * *"}])
+
+
+def test_scheduler_skips_overlapping_runs_and_bounds_concurrency():
+    release = threading.Event()
+    started, lock = [], threading.Lock()
+    active = {"now": 0, "max": 0}
+
+    def run_job(job):
+        with lock:
+            started.append(job["name"])
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+        release.wait(10)
+        with lock:
+            active["now"] -= 1
+
+    jobs = load_jobs([{"name": name, "cron": "* * * * *"} for name in ("a", "b", "c")])
+    scheduler = Scheduler(jobs, run_job, max_concurrency=2)
+    now = datetime(2025, 6, 30, 16, 15, tzinfo=timezone.utc)
+    scheduler.next_runs(now)
+
+    first = scheduler.tick(now + timedelta(minutes=1))
+    assert len(first) == 3
+    # Every job is still running or waiting for a slot, so the next minute fires nothing
+    assert scheduler.tick(now + timedelta(minutes=2)) == []
+
+    release.set()
+    for future in first:
+        future.result(timeout=10)
+    scheduler.shutdown()
+    assert sorted(started) == ["a", "b", "c"]
+    assert active["max"] == 2
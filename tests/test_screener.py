@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import config
+from app.tools.core.screener import SCREENS, get_screen, lookback_period, rank
+
+
+def _panel(days: int = 260, symbols=("AAA", "BBB", "CCC", "DDD"), seed: int = 5) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end="2025-06-30", periods=days, name="Date")
+    close = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.02, (days, len(symbols))), axis=0)), index, symbols)
+    fields = {
+        "Open": close.shift().bfill() * (1 + rng.normal(0, 0.005, close.shape)),
+        "High": close * 1.01,
+        "Low": close * 0.99,
+        "Close": close,
+        "Volume": pd.DataFrame(rng.integers(1_000, 2_000, close.shape), index, symbols).astype(float),
+    }
+    return pd.concat(fields, axis=1)
+
+
+def test_builtin_screens_score_every_symbol_at_once():
+    panel = _panel()
+    # BBB has the biggest day and a 10x volume spike
+    last = panel.index[-1]
+    panel.loc[last, ("Close", "BBB")] = panel["Close"]["BBB"].iloc[-2] * 1.2
+    panel.loc[last, ("Volume", "BBB")] = panel["Volume"]["BBB"].iloc[-21:-1].mean() * 10
+    close = panel["Close"]
+
+    gainers = rank(SCREENS["gainers"], panel, top_k=2)
+    assert [row["symbol"] for row in gainers] == close.pct_change().iloc[-1].nlargest(2).index.tolist()
+    assert gainers[0] == {"symbol": "BBB", "score": 0.2, "rank": 1, "pct": "0.20", "day": "2025-06-30", "screen": "gainers"}
+    assert rank(SCREENS["losers"], panel, top_k=1)[0]["symbol"] == close.pct_change().iloc[-1].idxmin()
+    assert rank(SCREENS["volume_spike"], panel, top_k=1)[0]["score"] == pytest.approx(10)
+
+    returns = close.pct_change().iloc[-21:]
+    expected = (returns.iloc[-1] - returns.iloc[:-1].mean()) / returns.iloc[:-1].std()
+    assert SCREENS["return_zscore"](panel).to_dict() == pytest.approx(expected.to_dict())
+    near_high = close.iloc[-1] / panel["High"].iloc[-252:].max()
+    assert SCREENS["near_52w_high"](panel).to_dict() == pytest.approx(near_high.to_dict())
+
+
+def test_composite_screen_is_weighted_sum_of_zscores(monkeypatch):
+    panel = _panel()
+    monkeypatch.setattr(config, "SCREENS", {"breakout": {"near_52w_high": 1.0, "volume_spike": 0.5}})
+
+    breakout = get_screen("breakout")
+    assert breakout.name == "breakout"
+    assert breakout.lookback == 250
+
+    def zscore(values):
+        return (values - values.mean()) / values.std()
+
+    expected = zscore(SCREENS["near_52w_high"](panel)) + 0.5 * zscore(SCREENS["volume_spike"](panel))
+    assert breakout(panel).to_dict() == pytest.approx(expected.to_dict())
+    assert rank(breakout, panel, top_k=1)[0]["symbol"] == expected.idxmax()
+
+    with pytest.raises(ValueError, match="Unknown screen"):
+        get_screen("nope")
+
+
+def test_lookback_period_covers_the_screen():
+    assert lookback_period(2) == "2d"
+    assert lookback_period(21) == "3mo"
+    assert lookback_period(250) == "1y"
+    assert lookback_period(1000) == "max"
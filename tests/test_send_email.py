@@ -1,11 +1,75 @@
+import asyncio
+import email
+
 from app.tools.core.email import send_email_by_smtp
-from app import config
+from app.tools.core.mailer import mailer
+from app import config, digest_agent
+from benchmarks.fakes import SMTPSink
+
+
+def _body(message: dict) -> str:
+    return email.message_from_string(message["data"]).get_payload(decode=True).decode().replace("\r\n", "\n").strip()
+
 
-def test_send_email():
+def test_send_email(monkeypatch):
+    monkeypatch.setenv("EMAIL_PASSWORD", "secret")
     subject = "Hello"
     body = "How are you"
     from_email = config.FROM_EMAIL
-    to_email = config.TO_EMAIL
-    smtp_server = config.SMTP_SERVER
-    
-    send_email_by_smtp(subject=subject, body=body, from_email=from_email, to_emails=to_email, smtp_server=smtp_server)
\ No newline at end of file
+    to_emails = config.TO_EMAILS
+
+    with SMTPSink() as sink:
+        result = send_email_by_smtp(
+            subject=subject,
+            body=body,
+            from_email=from_email,
+            to_emails=to_emails,
+            smtp_server=sink.host,
+            smtp_port=sink.port,
+            use_ssl=False,
+        )
+
+    assert result == "Email sent successfully."
+    # One message per recipient
+    assert len(sink.messages) == len(to_emails)
+    assert sorted(message["to"][0] for message in sink.messages) == sorted(to_emails)
+    for message in sink.messages:
+        assert message["from"] == from_email
+        assert len(message["to"]) == 1
+        assert "Subject: Hello" in message["data"]
+
+
+def test_send_email_greets_each_recipient(monkeypatch):
+    monkeypatch.setenv("EMAIL_PASSWORD", "secret")
+    to_emails = ["ann@example.com", "bob@example.com"]
+
+    with SMTPSink() as sink:
+        send_email_by_smtp(
+            subject="Hello",
+            body="How are you",
+            from_email=config.FROM_EMAIL,
+            to_emails=to_emails,
+            smtp_server=sink.host,
+            smtp_port=sink.port,
+            use_ssl=False,
+            greeting="Hi {name},",
+        )
+
+    bodies = {message["to"][0]: _body(message) for message in sink.messages}
+    assert bodies == {"ann@example.com": "Hi ann,\n\nHow are you", "bob@example.com": "Hi bob,\n\nHow are you"}
+
+
+def test_graph_emails_greet_each_recipient(offline_app):
+    to_emails = ["ann@example.com", "bob@example.com"]
+    run_config = dict(offline_app.run_config)
+    run_config["configurable"] = dict(run_config["configurable"], to_emails=to_emails, greeting="Dear {email}", top_n=2)
+
+    asyncio.run(digest_agent.build_graph().ainvoke({"messages": []}, run_config))
+    mailer.flush()
+
+    assert sorted(message["to"][0] for message in offline_app.sink.messages) == to_emails
+    for message in offline_app.sink.messages:
+        body = _body(message)
+        assert body.startswith(f"Dear {message['to'][0]}\n\n")
+    # The rest of the body is the same digest for everyone
+    assert len({_body(message).split("\n\n", 1)[1] for message in offline_app.sink.messages}) == 1
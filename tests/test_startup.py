@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Cumulative import time of `main`, in microseconds. It is ~0.3s here, the rest is headroom for slow CI machines.
+STARTUP_BUDGET_US = 1_500_000
+
+
+def _import_times(statement: str) -> dict:
+    """Cumulative import time per module of `statement`, from `python -X importtime`."""
+    env = {key: value for key, value in os.environ.items() if key not in ("OPENAI_API_KEY", "EMAIL_PASSWORD")}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, module = line.split("|")
+            if cumulative.strip().isdigit():
+                times[module.strip()] = int(cumulative)
+    return times
+
+
+def test_cli_starts_within_budget_without_graphs_or_clients():
+    times = _import_times("import main")
+
+    assert times["main"] < STARTUP_BUDGET_US
+    for heavy in ("app.graph_agent", "langgraph", "langchain_core", "pandas", "yfinance", "openai"):
+        assert heavy not in times, f"{heavy} is imported by `import main`"
+
+
+def test_graphs_import_without_creating_the_chat_model():
+    times = _import_times("from app import graph_agent, full_auto_agent, digest_agent")
+
+    for heavy in ("langchain_openai", "openai", "yfinance", "curl_cffi"):
+        assert heavy not in times, f"{heavy} is imported with the graphs"
@@ -1,4 +1,27 @@
-from app.tools.core.stock_data import get_top_nasdaq_gainer
+import pandas as pd
+import pytest
+
+from app.tools.core.providers import ReplayProvider, get_provider, set_provider
+from app.tools.core.stock_data import get_top_nasdaq_gainer, get_top_nasdaq_movers
+from app.tools.core.universe import universe_manager
 
 def test_get_top_nasdaq_gainer():
-    return get_top_nasdaq_gainer()
\ No newline at end of file
+    return get_top_nasdaq_gainer()
+
+@pytest.fixture
+def replay_universe(tmp_path, monkeypatch):
+    (tmp_path / "history").mkdir()
+    index = pd.bdate_range("2025-03-03", periods=2, tz="America/New_York", name="Date")
+    for symbol, closes in {"UP": [10.0, 12.0], "DOWN": [10.0, 8.0], "FLAT": [10.0, 10.0]}.items():
+        pd.DataFrame({"Close": closes, "Volume": 1000.0}, index=index).to_csv(tmp_path / "history" / f"{symbol}.csv")
+
+    monkeypatch.setitem(universe_manager.custom, "replay", ["UP", "DOWN", "FLAT"])
+    previous = get_provider()
+    set_provider(ReplayProvider(str(tmp_path)))
+    yield "replay"
+    set_provider(previous)
+
+def test_get_top_nasdaq_movers(replay_universe):
+    movers = get_top_nasdaq_movers(top_n=1, direction="both", universe=replay_universe)
+    assert [(m["symbol"], m["pct"], m["direction"]) for m in movers] == [("UP", "0.20", "gainers"), ("DOWN", "-0.20", "losers")]
+    assert movers[0]["day"].startswith("2025-03-04")
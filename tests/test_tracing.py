@@ -0,0 +1,63 @@
+import json
+from typing import TypedDict
+
+from langchain_core.messages import AIMessage
+from langgraph.graph import StateGraph, START, END
+
+from app.tools.core.spans import span
+from app.tracing import RunTracer, export_prometheus, load_events
+from benchmarks.fakes import ScriptedChatModel
+
+
+class _State(TypedDict):
+    answer: str
+
+
+def _build_graph(llm):
+    def ask_node(state: _State):
+        return {"answer": llm.invoke("hello").content}
+
+    def tool_node(state: _State):
+        with span("smtp.send", recipients=1):
+            pass
+        return {}
+
+    graph = StateGraph(_State)
+    graph.add_node("ask_node", ask_node)
+    graph.add_node("tool_node", tool_node)
+    graph.add_edge(START, "ask_node")
+    graph.add_edge("ask_node", "tool_node")
+    graph.add_edge("tool_node", END)
+    return graph.compile()
+
+
+def test_run_tracer_writes_events_and_prometheus(tmp_path):
+    reply = AIMessage(content="hi", usage_metadata={"input_tokens": 12, "output_tokens": 3, "total_tokens": 15})
+    llm = ScriptedChatModel(script=lambda messages, tools: reply)
+    graph = _build_graph(llm)
+
+    with span("outside"):
+        pass  # no active tracer, nothing recorded
+
+    for _ in range(2):
+        tracer = RunTracer(graph="demo", trace_dir=str(tmp_path))
+        with tracer.activate():
+            graph.invoke({"answer": ""}, {"callbacks": [tracer]})
+
+    kinds = [event["type"] for event in tracer.events]
+    assert kinds.count("node") == 2 and kinds.count("llm") == 1 and kinds.count("span") == 1 and kinds[-1] == "run"
+    llm_event = next(event for event in tracer.events if event["type"] == "llm")
+    assert (llm_event["node"], llm_event["prompt_tokens"], llm_event["completion_tokens"]) == ("ask_node", 12, 3)
+    assert set(tracer.durations("node")) == {"ask_node", "tool_node"}
+    assert next(event for event in tracer.events if event["type"] == "span")["recipients"] == 1
+
+    events = load_events(str(tmp_path))
+    assert len({event["run_id"] for event in events}) == 2
+    assert all(json.dumps(event) for event in events)
+
+    prom = (tmp_path / "stock_agent.prom").read_text()
+    assert 'stock_agent_node_latency_seconds_count{graph="demo",node="ask_node"} 2' in prom
+    assert 'stock_agent_node_latency_seconds{graph="demo",node="ask_node",quantile="0.95"}' in prom
+    assert 'stock_agent_span_latency_seconds_count{span="smtp.send"} 2' in prom
+    assert 'stock_agent_llm_tokens_total{graph="demo",node="ask_node",kind="prompt"} 24' in prom
+    assert export_prometheus(str(tmp_path), str(tmp_path / "out.prom")) == str(tmp_path / "out.prom")
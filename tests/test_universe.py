@@ -0,0 +1,52 @@
+import time
+from datetime import date
+
+import pytest
+
+from app.tools.core.universe import UniverseManager
+
+
+class FakeScrape:
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.calls = 0
+
+    def __call__(self, name):
+        self.calls += 1
+        return list(self.symbols)
+
+
+def test_seed_is_served_and_refreshed_in_background(tmp_path):
+    scrape = FakeScrape(["AAPL", "MSFT", "NVDA"])
+    manager = UniverseManager(str(tmp_path), seeds={"nasdaq100": ["AAPL", "MSFT"]}, scrape=scrape)
+
+    assert manager.get("nasdaq100") == ["AAPL", "MSFT"]
+    manager._refreshing["nasdaq100"].join()
+    assert manager.get("nasdaq100") == ["AAPL", "MSFT", "NVDA"]
+    assert manager.snapshots("nasdaq100") == [date.today()]
+
+    # A fresh manager starts from the snapshot without scraping
+    reloaded = UniverseManager(str(tmp_path), scrape=scrape)
+    assert reloaded.get("nasdaq100") == ["AAPL", "MSFT", "NVDA"]
+    assert scrape.calls == 1
+
+
+def test_historical_snapshot(tmp_path):
+    manager = UniverseManager(str(tmp_path), scrape=FakeScrape([]))
+    for day, symbols in (("2024-01-02", ["OLD"]), ("2025-01-02", ["NEW"])):
+        (tmp_path / "sp500").mkdir(exist_ok=True)
+        (tmp_path / "sp500" / f"{day}.json").write_text(
+            '{"name": "sp500", "date": "%s", "fetched_at": %f, "symbols": ["%s"]}' % (day, time.time(), symbols[0])
+        )
+
+    assert manager.get("sp500", as_of=date(2024, 6, 1)) == ["OLD"]
+    assert manager.get("sp500", as_of=date(2025, 6, 1)) == ["NEW"]
+    assert manager.get("sp500", as_of=date(2023, 6, 1)) == ["OLD"]
+    assert manager.get("sp500") == ["NEW"]
+
+
+def test_custom_universe(tmp_path):
+    manager = UniverseManager(str(tmp_path), custom={"watchlist": ["TSLA"]}, scrape=FakeScrape([]))
+    assert manager.get("watchlist") == ["TSLA"]
+    with pytest.raises(ValueError):
+        manager.get("unknown")